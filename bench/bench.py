@@ -0,0 +1,148 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Run the micro-benchmarks of the binding's hot paths.
+
+    bench.py [-r REPEAT] [-o FILE] [PATTERN...]
+    bench.py --compare OLD.json NEW.json [-t THRESHOLD]
+
+In the first form, all benchmarks whose names contain one of the
+patterns (all benchmarks if none is given) are run, and their results
+are printed and optionally stored as JSON in FILE. In the second form,
+two stored runs are compared, and benchmarks that got slower by more
+than THRESHOLD (a fraction, 0.1 by default) are flagged as
+regressions. The exit status is 1 if there are any.
+
+Benchmark modules define a ``benchmarks`` function returning or
+yielding ``(name, func, number)`` tuples, where ``func`` is called
+without arguments ``number`` times per measurement.
+"""
+
+import sys
+import os
+
+baseDir = os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[0])))
+sys.path.insert(0, baseDir)
+
+import json
+import optparse
+import platform
+import time
+import timeit
+
+
+# Benchmark modules. They are only imported when running benchmarks,
+# so that runs can be compared without the binding.
+_moduleNames = ['jsfrompy', 'pyfromjs', 'contexts', 'jsontransport']
+
+
+def measure(func, number, repeat):
+    """Return the best and median times per call of ``func``, in
+    seconds."""
+    times = sorted(t / number
+                   for t in timeit.repeat(func, number=number, repeat=repeat))
+    return times[0], times[len(times) // 2]
+
+def run(patterns=(), repeat=5):
+    """Run the selected benchmarks, print their results and return
+    them as a dictionary."""
+    results = {}
+    for moduleName in _moduleNames:
+        module = __import__(moduleName)
+        for name, func, number in module.benchmarks():
+            name = '%s: %s' % (module.__name__, name)
+            if patterns and not [p for p in patterns if p in name]:
+                continue
+            best, median = measure(func, number, repeat)
+            results[name] = {'best': best,
+                             'median': median,
+                             'number': number,
+                             'repeat': repeat,
+                             }
+            print '%-60s %12.3f us' % (name, best * 1e6)
+            sys.stdout.flush()
+
+    return {'timestamp': time.time(),
+            'python': sys.version.split()[0],
+            'platform': platform.platform(),
+            'results': results,
+            }
+
+def compare(old, new, threshold=0.1):
+    """Print the relative change of every benchmark present in both
+    runs. Return the names of the regressions."""
+    regressions = []
+    oldResults = old['results']
+    newResults = new['results']
+    for name in sorted(set(oldResults) & set(newResults)):
+        oldTime = oldResults[name]['best']
+        newTime = newResults[name]['best']
+        ratio = newTime / oldTime
+        if ratio > 1 + threshold:
+            flag = 'REGRESSION'
+            regressions.append(name)
+        elif ratio < 1 - threshold:
+            flag = 'improved'
+        else:
+            flag = ''
+        print '%-60s %10.3f %10.3f us %+7.1f%% %s' % \
+            (name, oldTime * 1e6, newTime * 1e6, (ratio - 1) * 100, flag)
+
+    for name in sorted(set(oldResults) - set(newResults)):
+        print '%-60s missing in new run' % name
+    for name in sorted(set(newResults) - set(oldResults)):
+        print '%-60s missing in old run' % name
+
+    return regressions
+
+
+def main(args=None):
+    parser = optparse.OptionParser(
+        usage='%prog [-r REPEAT] [-o FILE] [PATTERN...]\n'
+        '       %prog --compare OLD.json NEW.json [-t THRESHOLD]')
+    parser.add_option('-r', '--repeat', type='int', default=5,
+                      help='measurements per benchmark (default 5)')
+    parser.add_option('-o', '--output', metavar='FILE',
+                      help='store the results as JSON in FILE')
+    parser.add_option('-c', '--compare', action='store_true',
+                      help='compare two stored runs')
+    parser.add_option('-t', '--threshold', type='float', default=0.1,
+                      help='relative slowdown flagged as a regression '
+                      'when comparing (default 0.1)')
+    options, args = parser.parse_args(args)
+
+    if options.compare:
+        if len(args) != 2:
+            parser.error('--compare needs two result files')
+        old, new = [json.load(open(fileName)) for fileName in args]
+        regressions = compare(old, new, options.threshold)
+        if regressions:
+            print '%d regression(s)' % len(regressions)
+            return 1
+        return 0
+
+    results = run(args, options.repeat)
+    if options.output:
+        with open(options.output, 'w') as output:
+            json.dump(results, output, indent=2, sort_keys=True)
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,43 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Benchmarks for context creation and script evaluation.
+"""
+
+import javascriptcore as jscore
+
+
+def makeSource(functions):
+    return '\n'.join('function f%d(x) { var y = x * %d; return y + 1; }'
+                     % (i, i) for i in xrange(functions)) + '\n1;'
+
+def benchmarks():
+    ctx = jscore.JSContext()
+    small = '1 + 1'
+    large = makeSource(1000)
+
+    yield 'evaluateScript, %d chars' % len(small), \
+        lambda: ctx.evaluateScript(small), 10000
+    yield 'evaluateScript, %d chars' % len(large), \
+        lambda: ctx.evaluateScript(large), 20
+    yield 'context creation', jscore.JSContext, 200
+
+    group = jscore.JSContextGroup()
+    yield 'context creation in group', \
+        lambda: jscore.JSContext(group=group), 200
@@ -0,0 +1,83 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Benchmarks for using JavaScript objects from Python.
+"""
+
+import javascriptcore as jscore
+
+
+def benchmarks():
+    ctx = jscore.JSContext()
+
+    # Attribute access.
+    obj = ctx.evaluateScript('({a: 1, b: "x"})')
+
+    def getAttr():
+        obj.a
+
+    def setAttr():
+        obj.a = 2
+
+    def getItem():
+        obj['b']
+
+    yield 'JSObject get attribute', getAttr, 100000
+    yield 'JSObject set attribute', setAttr, 100000
+    yield 'JSObject get item', getItem, 100000
+
+    # Function calls by arity.
+    f = ctx.evaluateScript('(function () { return arguments.length; })')
+    for arity in (0, 1, 4, 16):
+        args = tuple(range(arity))
+        yield 'JSFunction call, %d args' % arity, \
+            lambda args=args: f(*args), 50000
+
+    method = ctx.evaluateScript('({f: function (x) { return x; }})').f
+    yield 'JSBoundMethod call, 1 arg', lambda: method(1), 50000
+
+    # Conversions, measured as a round trip through the identity
+    # function.
+    identity = ctx.evaluateScript('(function (x) { return x; })')
+    for name, value in (('int', 42), ('float', 0.5), ('bool', True),
+                        ('None', None)):
+        yield 'convert %s' % name, lambda value=value: identity(value), 50000
+    for size in (10, 1000, 100000):
+        value = u'x' * size
+        yield 'convert string, %d chars' % size, \
+            lambda value=value: identity(value), max(10, 1000000 // size)
+
+    # Sequences.
+    arr = jscore.asSeq(ctx.evaluateScript(
+        'a = []; for (var i = 0; i < 1000; i++) a.push(i); a'))
+
+    def iterate():
+        for item in arr:
+            pass
+
+    def slice():
+        arr[100:200]
+
+    def insertDelete():
+        arr.insert(500, 0)
+        del arr[500]
+
+    yield 'JSSequence iterate, 1000 items', iterate, 100
+    yield 'JSSequence slice, 100 items', slice, 10000
+    yield 'JSSequence insert and delete', insertDelete, 10000
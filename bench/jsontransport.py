@@ -0,0 +1,89 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA. 
+
+"""
+Compare the JSON transport (``loadsJSON``/``dumpsJSON``) against
+wrapper-based access for moving a document between Python and
+JavaScript.
+"""
+
+import sys
+import os
+
+baseDir = os.path.dirname(os.path.dirname(os.path.abspath(sys.argv[0])))
+sys.path.insert(0, baseDir)
+
+import json
+
+import javascriptcore as jscore
+
+
+def makeDocument(size):
+    return {'items': [{'id': i,
+                       'name': 'item %d' % i,
+                       'tags': ['a', 'b', 'c'],
+                       'price': i * 0.5}
+                      for i in xrange(size)]}
+
+def wrapperIn(ctx, doc):
+    ctx.globalObject.doc = doc
+    return ctx.evaluateScript('doc.items.length')
+
+def jsonIn(ctx, doc):
+    ctx.globalObject.doc = ctx.loadsJSON(json.dumps(doc))
+    return ctx.evaluateScript('doc.items.length')
+
+def wrapperOut(ctx):
+    doc = ctx.globalObject.doc
+    return [dict(item) for item in jscore.asSeq(doc['items'])]
+
+def jsonOut(ctx):
+    return json.loads(ctx.dumpsJSON(ctx.globalObject.doc))
+
+
+def benchmarks(sizes=(10, 1000)):
+    """Yield the benchmarks for the ``bench.py`` runner."""
+    for size in sizes:
+        doc = makeDocument(size)
+        ctx = jscore.JSContext()
+        ctx.globalObject.doc = ctx.loadsJSON(json.dumps(doc))
+        number = max(1, 10000 // size)
+
+        yield '%d items, wrapper in' % size, \
+            lambda ctx=ctx, doc=doc: wrapperIn(ctx, doc), number
+        yield '%d items, json in' % size, \
+            lambda ctx=ctx, doc=doc: jsonIn(ctx, doc), number
+
+        # Use a separate context with a native document for the "out"
+        # benchmarks.
+        ctx = jscore.JSContext()
+        ctx.globalObject.doc = ctx.loadsJSON(json.dumps(doc))
+        yield '%d items, wrapper out' % size, \
+            lambda ctx=ctx: wrapperOut(ctx), number
+        yield '%d items, json out' % size, \
+            lambda ctx=ctx: jsonOut(ctx), number
+
+
+def main():
+    """Run these benchmarks only, see ``bench.py``."""
+    import bench
+    return bench.main(['jsontransport'] + sys.argv[1:])
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,53 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+"""
+Benchmarks for using Python objects from JavaScript.
+
+Every benchmark runs a JavaScript loop of 1000 iterations, so that the
+reported times are per 1000 accesses.
+"""
+
+import javascriptcore as jscore
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+
+def loop(ctx, body):
+    return ctx.evaluateScript(
+        '(function () { for (var i = 0; i < 1000; i++) { %s } })' % body)
+
+def benchmarks():
+    ctx = jscore.JSContext()
+    ctx.globalObject.seq = range(1000)
+    ctx.globalObject.map = dict(('k%d' % i, i) for i in xrange(100))
+    ctx.globalObject.obj = Point(1, 2)
+    ctx.globalObject.f = lambda x: x
+
+    yield 'PythonSequence get item', loop(ctx, 'seq[i];'), 100
+    yield 'PythonSequence set item', loop(ctx, 'seq[i] = i;'), 100
+    yield 'PythonSequence length', loop(ctx, 'seq.length;'), 100
+    yield 'PythonMapping get item', loop(ctx, 'map.k10;'), 100
+    yield 'PythonMapping set item', loop(ctx, 'map.k10 = i;'), 100
+    yield 'PythonObject get attribute', loop(ctx, 'obj.x;'), 100
+    yield 'PythonObject set attribute', loop(ctx, 'obj.x = i;'), 100
+    yield 'Python function call', loop(ctx, 'f(i);'), 100
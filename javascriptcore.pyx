@@ -21,12 +21,30 @@
 
 """
 Two-way binding between CPython and WebKit's JavaScriptCore.
+
+The GIL is released while JavaScript code runs (in
+``JSContext.evaluateScript``, when calling JavaScript functions, etc.)
+and reacquired whenever JavaScript calls back into Python. This makes
+it possible to run JavaScript in several threads in parallel, under
+the following contract: a context group, and all contexts and objects
+belonging to it, must only be used by one thread at a time. Contexts
+created without an explicit group have a group of their own, so that
+independent contexts can be freely used from different threads.
+
+Asynchronous operations (``JSContext.evaluateAsync`` and the
+``callAsync`` method of functions) run in a separate thread for every
+context group. The group should not be used from other threads while
+they are pending.
 """
 
 import sys
+import gc
 import types
 import collections
 import weakref
+import threading
+import time
+import Queue
 
 cdef:
     ctypedef unsigned short bool
@@ -38,6 +56,8 @@ include "jscontextref.pyi"
 include "jsstringref.pyi"
 include "jsvalueref.pyi"
 include "jsobjectref.pyi"
+include "jstypedarray.pyi"
+include "jsprivate.pyi"
 
 
 #
@@ -58,6 +78,10 @@ class NullType(object):
         # As in javascript, the Null value has a false boolean value.
         return False
 
+    def __reduce__(self):
+        # Pickle the singleton by name.
+        return 'Null'
+
 # Create the actual Null singleton.
 Null = None
 Null = NullType()
@@ -70,38 +94,378 @@ Null = NullType()
 # Wrapper cache. All attempts at wrapping a single object should
 # return the same wrapper. This way, there is a one-to-one
 # relationship between wrappers and their wrapped objects. The
-# following dictionaries maintain this relationship:
+# following tables maintain this relationship.
+#
+# Since JavaScript objects can only be shared by contexts in the same
+# context group, tables are partitioned by group: every group with
+# wrappers has a ``_GroupWrappers`` object holding two open addressing
+# hash tables keyed by pointer. The first one associates JavaScript
+# objects to their Python wrappers, the second one associates Python
+# objects to their JavaScript wrappers (so that a Python object has a
+# separate wrapper in every group it is passed to). Tables don't own
+# references to the objects they contain: entries are removed when
+# Python wrappers are deallocated (see ``_JSBaseObject.__dealloc__``)
+# and when JavaScript wrappers are finalized (see ``pyObjFinalize``).
+# The partition of a group is discarded as soon as it becomes empty.
+
+ctypedef struct WrapperEntry:
+    void *key
+    void *value
+
+ctypedef struct WrapperTable:
+    WrapperEntry *entries
+    size_t size
+    size_t count
+
+# Initial size of the wrapper tables. Sizes must be powers of two.
+DEF WRAPPER_TABLE_MIN_SIZE = 16
+
+cdef inline size_t pointerHash(void *ptr):
+    cdef size_t h = <size_t>ptr
+
+    # Objects are aligned, so the lowest bits carry no information.
+    h = h >> 4
+    return h ^ (h >> 16) ^ (h * 2654435761UL)
+
+cdef void *wrapperTableGet(WrapperTable *table, void *key):
+    """Return the value stored for ``key``, or NULL."""
+    cdef size_t mask
+    cdef size_t i
+
+    if table.count == 0:
+        return NULL
+    mask = table.size - 1
+    i = pointerHash(key) & mask
+    while table.entries[i].key != NULL:
+        if table.entries[i].key == key:
+            return table.entries[i].value
+        i = (i + 1) & mask
+    return NULL
+
+cdef int wrapperTableResize(WrapperTable *table, size_t size) except -1:
+    cdef WrapperEntry *oldEntries = table.entries
+    cdef size_t oldSize = table.size
+    cdef size_t mask = size - 1
+    cdef size_t i
+    cdef size_t j
+
+    table.entries = <WrapperEntry *>calloc(size, sizeof(WrapperEntry))
+    if table.entries == NULL:
+        table.entries = oldEntries
+        raise MemoryError
+    table.size = size
+
+    for i in range(oldSize):
+        if oldEntries[i].key != NULL:
+            j = pointerHash(oldEntries[i].key) & mask
+            while table.entries[j].key != NULL:
+                j = (j + 1) & mask
+            table.entries[j] = oldEntries[i]
+    free(oldEntries)
+    return 0
+
+cdef int wrapperTablePut(WrapperTable *table, void *key,
+                         void *value) except -1:
+    """Store ``value`` for ``key``, replacing any previous value."""
+    cdef size_t mask
+    cdef size_t i
+
+    # Keep the load factor under 3/4.
+    if (table.count + 1) * 4 > table.size * 3:
+        if table.size == 0:
+            wrapperTableResize(table, WRAPPER_TABLE_MIN_SIZE)
+        else:
+            wrapperTableResize(table, table.size * 2)
+
+    mask = table.size - 1
+    i = pointerHash(key) & mask
+    while table.entries[i].key != NULL:
+        if table.entries[i].key == key:
+            table.entries[i].value = value
+            return 0
+        i = (i + 1) & mask
+    table.entries[i].key = key
+    table.entries[i].value = value
+    table.count += 1
+    return 0
+
+cdef int wrapperTableRemove(WrapperTable *table, void *key, void *value):
+    """Remove the entry for ``key`` if its value is ``value``. Return
+    whether an entry was removed."""
+    cdef size_t mask
+    cdef size_t i
+    cdef size_t j
+    cdef size_t k
+
+    if table.count == 0:
+        return 0
+    mask = table.size - 1
+    i = pointerHash(key) & mask
+    while table.entries[i].key != key:
+        if table.entries[i].key == NULL:
+            return 0
+        i = (i + 1) & mask
+    if table.entries[i].value != value:
+        return 0
+
+    # Shift back the entries following the removed one, so that no
+    # deletion markers are needed.
+    j = i
+    while True:
+        j = (j + 1) & mask
+        if table.entries[j].key == NULL:
+            break
+        k = pointerHash(table.entries[j].key) & mask
+        if (i <= j and (k <= i or k > j)) or \
+                (i > j and k <= i and k > j):
+            table.entries[i] = table.entries[j]
+            i = j
+    table.entries[i].key = NULL
+    table.entries[i].value = NULL
+    table.count -= 1
+
+    if table.count == 0:
+        free(table.entries)
+        table.entries = NULL
+        table.size = 0
+    return 1
+
+
+cdef class _GroupWrappers:
+    """The wrapper tables of a context group."""
+
+    cdef WrapperTable jsObjs
+    cdef WrapperTable pyObjs
+
+    def __dealloc__(self):
+        free(self.jsObjs.entries)
+        free(self.pyObjs.entries)
+
+
+# Wrapper table partitions, indexed by context group (cast to long).
+cdef object _groupWrappers = {}
+
+# The most recently used partition and its group.
+cdef void *_lastGroup = NULL
+cdef _GroupWrappers _lastGroupWrappers = None
+
+# Groups of the cached wrappers for Python objects, indexed by
+# wrapper. Their finalizer doesn't know the context, and uses this to
+# find the partition the wrapper is cached in.
+cdef WrapperTable _pyWrapperGroups
+
+cdef _GroupWrappers groupWrappers(JSContextRef jsCtx, int create):
+    """Return the wrapper tables of the group of ``jsCtx``. If they
+    don't exist, create them if ``create`` is true, or return
+    ``None``."""
+    global _lastGroup, _lastGroupWrappers
+    cdef void *group = <void *>JSContextGetGroup(jsCtx)
+    cdef _GroupWrappers wrappers
+
+    if group == _lastGroup:
+        return _lastGroupWrappers
+
+    wrappers = _groupWrappers.get(<long>group)
+    if wrappers is None:
+        if not create:
+            return None
+        wrappers = _GroupWrappers()
+        _groupWrappers[<long>group] = wrappers
+    _lastGroup = group
+    _lastGroupWrappers = wrappers
+    return wrappers
+
+cdef dropEmptyGroupWrappers(JSContextRef jsCtx, _GroupWrappers wrappers):
+    """Discard the wrapper tables ``wrappers`` of the group of
+    ``jsCtx`` if they are empty."""
+    global _lastGroup, _lastGroupWrappers
+
+    if wrappers.jsObjs.count > 0 or wrappers.pyObjs.count > 0:
+        return
+    _groupWrappers.pop(<long>JSContextGetGroup(jsCtx), None)
+    if wrappers is _lastGroupWrappers:
+        _lastGroup = NULL
+        _lastGroupWrappers = None
+
+
+# Boundary statistics. When enabled (see ``setBoundaryStats``), every
+# crossing of the boundary between Python and JavaScript is counted,
+# both globally and for the context it happens in. Callbacks only get
+# the execution context, so per context counters are found in
+# ``_contextStats`` through the global object.
+
+# Counter indices.
+DEF STAT_CALLS = 0
+DEF STAT_EVALUATIONS = 1
+DEF STAT_CALLBACK_GET = 2
+DEF STAT_CALLBACK_SET = 3
+DEF STAT_CALLBACK_DELETE = 4
+DEF STAT_CALLBACK_CALL = 5
+# Conversions, followed by one counter per JavaScript value type
+# (kJSTypeUndefined to kJSTypeObject).
+DEF STAT_TO_PYTHON = 6
+DEF STAT_TO_JS = 12
+DEF STAT_STRINGS_CREATED = 18
+DEF STAT_WRAPPERS_CREATED = 19
+DEF STAT_WRAPPER_HITS = 20
+DEF STAT_EXCEPTIONS_TO_PYTHON = 21
+DEF STAT_EXCEPTIONS_TO_JS = 22
+DEF STAT_COUNT = 23
+
+# Number of callback kinds, starting at STAT_CALLBACK_GET.
+DEF CALLBACK_KINDS = 4
+
+ctypedef struct BoundaryStats:
+    unsigned long long counts[STAT_COUNT]
+    # Seconds spent in callbacks, by kind.
+    double times[CALLBACK_KINDS]
+
+cdef int _statsEnabled = 0
+cdef int _statsTiming = 0
+cdef BoundaryStats _globalStats
+
+# Per context statistics, indexed by global object. The statistics
+# are owned by the ``JSContext`` objects.
+cdef WrapperTable _contextStats
+
+_statNames = ['calls', 'evaluations']
+_callbackKinds = ['get', 'set', 'delete', 'call']
+_valueTypes = ['undefined', 'null', 'boolean', 'number', 'string', 'object']
+_counterNames = ['stringsCreated', 'wrappersCreated', 'wrapperHits',
+                 'exceptionsToPython', 'exceptionsToJS']
+
+cdef double wallTime() nogil:
+    cdef timeval tv
+
+    gettimeofday(&tv, NULL)
+    return tv.tv_sec + tv.tv_usec * 1e-6
+
+cdef inline void countStat(JSContextRef jsCtx, int index):
+    cdef BoundaryStats *stats
+
+    if not _statsEnabled:
+        return
+    _globalStats.counts[index] += 1
+    if jsCtx != NULL and _contextStats.count > 0:
+        stats = <BoundaryStats *>wrapperTableGet(
+            &_contextStats, <void *>JSContextGetGlobalObject(jsCtx))
+        if stats != NULL:
+            stats.counts[index] += 1
+
+cdef inline double callbackEnter(JSContextRef jsCtx, int index):
+    """Count a callback from JavaScript. Return its start time if
+    callbacks are timed, or 0."""
+    if not _statsEnabled:
+        return 0
+    countStat(jsCtx, index)
+    if _statsTiming:
+        return wallTime()
+    return 0
+
+cdef inline void callbackLeave(JSContextRef jsCtx, int index, double start):
+    cdef BoundaryStats *stats
+    cdef double elapsed
+
+    if start == 0:
+        return
+    elapsed = wallTime() - start
+    _globalStats.times[index - STAT_CALLBACK_GET] += elapsed
+    if _contextStats.count > 0:
+        stats = <BoundaryStats *>wrapperTableGet(
+            &_contextStats, <void *>JSContextGetGlobalObject(jsCtx))
+        if stats != NULL:
+            stats.times[index - STAT_CALLBACK_GET] += elapsed
+
+cdef inline void countToJS(JSContextRef jsCtx, object pyValue):
+    """Count the conversion of ``pyValue`` into JavaScript."""
+    cdef int jsType
+
+    if not _statsEnabled:
+        return
+    if pyValue is None:
+        jsType = kJSTypeUndefined
+    elif isinstance(pyValue, NullType):
+        jsType = kJSTypeNull
+    elif isinstance(pyValue, types.BooleanType):
+        jsType = kJSTypeBoolean
+    elif isinstance(pyValue, (types.IntType, types.FloatType)):
+        # Longs are wrapped as Python objects, see pythonToJS.
+        jsType = kJSTypeNumber
+    elif isinstance(pyValue, types.StringTypes):
+        jsType = kJSTypeString
+    else:
+        jsType = kJSTypeObject
+    countStat(jsCtx, STAT_TO_JS + jsType)
 
-# A dictionary associating wrapped JavaScript objects to their Python
-# wrappers.  Keys are pointers to JavaScript objects cast to long int
-# (and converted to Python integers to store them in the
-# dictionary). Values are (weak references to) the corresponding
-# wrappers. Notice that casting to the long type is necessary because
-# pointers are larger than plain ints in 64-bit platforms.
-cdef object _pyWrappedJSObjs = weakref.WeakValueDictionary()
+cdef object boundaryStatsDict(BoundaryStats *stats, int reset):
+    cdef int i
 
-# A dictionary associating wrapped Python objects to their JavaScript
-# wrappers. Keys are ids of Python objects, as returned by the id()
-# function. Values are pointers to the corresponding JavaScript
-# wrappers enclosed in PyCObject instances. Wrappers are deleted from
-# this dictionary when they get garbage collected (see pyObjFinalize).
-cdef object _pyWrappedPyObjs = {}
+    result = {}
+    for i, name in enumerate(_statNames):
+        result[name] = stats.counts[i]
+    result['callbacks'] = dict([(kind, stats.counts[STAT_CALLBACK_GET + i])
+                                for i, kind in enumerate(_callbackKinds)])
+    result['callbackTimes'] = dict([(kind, stats.times[i])
+                                    for i, kind in enumerate(_callbackKinds)])
+    result['toPython'] = dict([(name, stats.counts[STAT_TO_PYTHON + i])
+                               for i, name in enumerate(_valueTypes)])
+    result['toJS'] = dict([(name, stats.counts[STAT_TO_JS + i])
+                           for i, name in enumerate(_valueTypes)])
+    for i, name in enumerate(_counterNames):
+        result[name] = stats.counts[STAT_STRINGS_CREATED + i]
+
+    if reset:
+        memset(stats, 0, sizeof(BoundaryStats))
+    return result
+
+def setBoundaryStats(enabled=True, timing=False):
+    """Enable or disable boundary statistics.
+
+    When enabled, calls from Python into JavaScript, callbacks from
+    JavaScript into Python, value conversions in both directions,
+    string and wrapper creation, and translated exceptions are counted
+    globally (see ``boundaryStats``) and per context (see the
+    ``boundaryStats`` method of ``JSContext``). If ``timing`` is true,
+    the time spent in callbacks is accumulated as well. Statistics are
+    disabled by default, and cost a single test per crossing when
+    disabled."""
+    global _statsEnabled, _statsTiming
+
+    _statsEnabled = 1 if enabled else 0
+    _statsTiming = 1 if enabled and timing else 0
+
+def boundaryStats(reset=False):
+    """Return the global boundary statistics.
+
+    ``calls`` and ``evaluations`` count calls and script evaluations
+    from Python, ``callbacks`` counts callbacks from JavaScript by
+    kind, and ``callbackTimes`` the seconds spent in them. ``toPython``
+    and ``toJS`` count converted values by JavaScript type. If
+    ``reset`` is true, all counters are set back to zero after
+    reading them."""
+    return boundaryStatsDict(&_globalStats, reset)
 
 
 cdef object wrapJSObject(JSContextRef jsCtx, JSValueRef jsValue):
+    cdef _GroupWrappers wrappers = groupWrappers(jsCtx, True)
+    cdef void *cached
     cdef object wrapper
 
-    try:
-        return _pyWrappedJSObjs[<long>jsValue]
-    except KeyError:
-        pass
+    cached = wrapperTableGet(&wrappers.jsObjs, <void *>jsValue)
+    if cached != NULL:
+        countStat(jsCtx, STAT_WRAPPER_HITS)
+        return <object>cached
 
+    countStat(jsCtx, STAT_WRAPPERS_CREATED)
     if JSObjectIsFunction(jsCtx, jsValue):
         wrapper = makeJSFunction(jsCtx, jsValue)
     else:
         wrapper = makeJSObject(jsCtx, jsValue)
 
-    _pyWrappedJSObjs[<long>jsValue] = wrapper
+    # Making the wrapper can run a collection that drops the emptied
+    # partition, fetch it again.
+    wrappers = groupWrappers(jsCtx, True)
+    wrapperTablePut(&wrappers.jsObjs, <void *>jsValue, <void *>wrapper)
     return wrapper
 
 cdef object jsToPython(JSContextRef jsCtx, JSValueRef jsValue):
@@ -112,6 +476,7 @@ cdef object jsToPython(JSContextRef jsCtx, JSValueRef jsValue):
     cdef double doubleVal
     cdef long intVal
 
+    countStat(jsCtx, STAT_TO_PYTHON + jsType)
     if jsType == kJSTypeUndefined:
         return None
     if jsType == kJSTypeNull:
@@ -135,7 +500,7 @@ cdef object jsToPython(JSContextRef jsCtx, JSValueRef jsValue):
                                          NULL, 0)
         finally:
             JSStringRelease(jsStr)
-    elif JSValueIsObjectOfClass(jsCtx, jsValue, pyObjectClass):
+    elif JSValueIsObjectOfClass(jsCtx, jsValue, pyWrapperClass):
         # This is a wrapped Python object. Just unwrap it.
         return <object>JSObjectGetPrivate(jsValue)
     else:
@@ -165,8 +530,46 @@ class JSException(Exception):
     def __str__(self):
         return self.message
 
+    def __reduce__(self):
+        # The wrapped JavaScript object cannot be pickled, only its
+        # name and message are preserved.
+        return (_unpickleJSException, (unicode(self.name),
+                                       unicode(self.message)))
+
+def _unpickleJSException(name, message):
+    exc = JSException(None)
+    exc.name = name
+    exc.message = message
+    return exc
+
+class JSTimeoutError(JSException):
+    """Raised when a script is terminated because it exceeded its
+    time limit or was interrupted. ``interrupted`` tells which (see
+    ``JSContext.timeout`` and ``JSContext.interrupt``)."""
+
+    def __init__(self, interrupted=False):
+        JSException.__init__(self, None)
+        self.interrupted = interrupted
+        self.name = 'TimeoutError'
+        if interrupted:
+            self.message = 'script execution interrupted'
+        else:
+            self.message = 'script execution timed out'
+
+    def __reduce__(self):
+        return (JSTimeoutError, (self.interrupted,))
+
 cdef object jsExceptionToPython(JSContextRef jsCtx, JSValueRef jsException):
     """Factory function for creating exception objects."""
+    cdef ExecutionLimitState *state
+
+    countStat(jsCtx, STAT_EXCEPTIONS_TO_PYTHON)
+    # Scripts terminated by the watchdog throw an exception that can't
+    # be told apart from others.
+    state = <ExecutionLimitState *>PyThread_get_key_value(_limitKey)
+    if state != NULL and state.terminated:
+        state.terminated = 0
+        return JSTimeoutError(state.interrupted != 0)
     return JSException(jsToPython(jsCtx, jsException))
 
 
@@ -175,32 +578,396 @@ cdef object pyStringFromJS(JSStringRef jsString):
                                  JSStringGetLength(jsString) * 2,
                                  NULL, 0)
 
+cdef object jsonFromJS(JSContextRef jsCtx, JSValueRef jsValue,
+                       unsigned indent):
+    """Serialize a JavaScript value as JSON text using the engine's
+    native serializer.
+
+    Returns ``None`` for values that have no JSON representation
+    (e.g., ``undefined`` or functions)."""
+    cdef JSValueRef jsException = NULL
+    cdef JSStringRef jsText
+
+    jsText = JSValueCreateJSONString(jsCtx, jsValue, indent, &jsException)
+    if jsException != NULL:
+        raise jsExceptionToPython(jsCtx, jsException)
+    if jsText == NULL:
+        return None
+
+    try:
+        return pyStringFromJS(jsText)
+    finally:
+        JSStringRelease(jsText)
+
+cdef JSValueRef jsonToJS(JSContextRef jsCtx, object text) except NULL:
+    """Parse JSON text using the engine's native parser."""
+    cdef JSStringRef jsText = createJSStringFromPython(text)
+    cdef JSValueRef jsValue
+
+    try:
+        jsValue = JSValueMakeFromJSONString(jsCtx, jsText)
+    finally:
+        JSStringRelease(jsText)
+
+    if jsValue == NULL:
+        raise ValueError, "invalid JSON text"
+    return jsValue
+
 cdef JSStringRef createJSStringFromPython(object pyStr):
     """Create a ``JSString`` from a Python object.
 
     This is a create function. Ownership of the result is transferred
     to the caller."""
+    countStat(NULL, STAT_STRINGS_CREATED)
     pyStr = unicode(pyStr).encode('utf-8')
     return JSStringCreateWithUTF8CString(pyStr)
 
+cdef JSValueRef pyStringToJS(JSContextRef jsCtx, object pyStr) except NULL:
+    """Convert a Python string into a JavaScript string value."""
+    cdef JSStringRef jsStr = createJSStringFromPython(pyStr)
+    cdef JSValueRef jsValue = JSValueMakeString(jsCtx, jsStr)
+
+    JSStringRelease(jsStr)
+    return jsValue
+
+
+#
+# Property name interning
+#
+
+# Property names are converted between Python and JavaScript over and
+# over again, since every property access from either side needs one
+# such conversion. The intern table caches the conversion in both
+# directions: it maps Python strings to retained ``JSString`` objects
+# and the characters of ``JSString`` objects back to Python strings.
+#
+# The table is direct-mapped: every name lives in the slot selected
+# by the hash of its UTF-16 characters, and storing a new name evicts
+# whatever name occupied its slot before. Lookups from Python go
+# through ``_internIndex``, a dictionary associating the interned
+# Python strings to their slot numbers.
+
+ctypedef struct InternEntry:
+    JSStringRef jsName
+    void *pyName
+    unsigned long hash
+
+# Names longer than this are never interned.
+DEF INTERN_MAX_NAME_LENGTH = 64
+
+# Default number of slots in the intern table.
+DEF INTERN_DEFAULT_SIZE = 1024
+
+cdef InternEntry *_internTable = NULL
+cdef unsigned long _internSize = 0
+cdef object _internIndex = {}
+
+# Hit and miss counters, see nameCacheStats.
+cdef long _internToJSHits = 0
+cdef long _internToJSMisses = 0
+cdef long _internFromJSHits = 0
+cdef long _internFromJSMisses = 0
+cdef long _internEvictions = 0
+
+
+cdef unsigned long hashJSChars(JSChar *chars, size_t length):
+    """FNV-1a hash of a UTF-16 character array."""
+    cdef unsigned long h = <unsigned long>2166136261
+    cdef size_t i
+
+    for i in range(length):
+        h = (h ^ chars[i]) * <unsigned long>16777619
+    return h
+
+cdef void internDrop(InternEntry *entry):
+    """Release the contents of an intern table entry.
+
+    The caller is responsible for removing the name from
+    ``_internIndex``."""
+    if entry.jsName != NULL:
+        JSStringRelease(entry.jsName)
+        Py_DECREF(<object>entry.pyName)
+        entry.jsName = NULL
+        entry.pyName = NULL
+        entry.hash = 0
+
+cdef int internStore(JSStringRef jsName, object pyName) except -1:
+    """Store a name in the intern table, evicting the previous
+    occupant of its slot if necessary."""
+    global _internEvictions
+    cdef size_t length = JSStringGetLength(jsName)
+    cdef unsigned long h
+    cdef unsigned long slot
+    cdef InternEntry *entry
+
+    if _internSize == 0 or length > INTERN_MAX_NAME_LENGTH:
+        return 0
+
+    h = hashJSChars(JSStringGetCharactersPtr(jsName), length)
+    slot = h % _internSize
+    entry = &_internTable[slot]
+    if entry.jsName != NULL:
+        _internEvictions += 1
+        del _internIndex[<object>entry.pyName]
+        internDrop(entry)
+
+    # Always store unicode objects, since this is what the reverse
+    # lookup must return.
+    pyName = unicode(pyName)
+    JSStringRetain(jsName)
+    Py_INCREF(pyName)
+    entry.jsName = jsName
+    entry.pyName = <void *>pyName
+    entry.hash = h
+    _internIndex[pyName] = slot
+
+    return 0
+
+cdef JSStringRef createJSNameFromPython(object pyName) except NULL:
+    """Create a ``JSString`` for a property name.
+
+    Works as ``createJSStringFromPython`` (ownership of the result is
+    transferred to the caller), but names are looked up in, and added
+    to, the intern table."""
+    global _internToJSHits, _internToJSMisses
+    cdef JSStringRef jsName
+
+    if not isinstance(pyName, types.StringTypes):
+        pyName = unicode(pyName)
+
+    slot = _internIndex.get(pyName)
+    if slot is not None:
+        _internToJSHits += 1
+        jsName = _internTable[<unsigned long>slot].jsName
+        JSStringRetain(jsName)
+        return jsName
+
+    _internToJSMisses += 1
+    jsName = createJSStringFromPython(pyName)
+    internStore(jsName, pyName)
+    return jsName
+
+cdef object pyNameFromJS(JSStringRef jsName):
+    """Convert a property name to a Python string, using the intern
+    table."""
+    global _internFromJSHits, _internFromJSMisses
+    cdef size_t length = JSStringGetLength(jsName)
+    cdef unsigned long h
+    cdef InternEntry *entry
+
+    if _internSize == 0 or length > INTERN_MAX_NAME_LENGTH:
+        return pyStringFromJS(jsName)
+
+    h = hashJSChars(JSStringGetCharactersPtr(jsName), length)
+    entry = &_internTable[h % _internSize]
+    if entry.jsName != NULL and entry.hash == h and \
+            JSStringIsEqual(entry.jsName, jsName):
+        _internFromJSHits += 1
+        return <object>entry.pyName
+
+    _internFromJSMisses += 1
+    pyName = pyStringFromJS(jsName)
+    internStore(jsName, pyName)
+    return pyName
+
+def setNameCacheSize(size):
+    """Set the number of slots in the property name intern table.
+
+    The current contents of the table are discarded. A size of zero
+    disables interning altogether."""
+    global _internTable, _internSize
+    cdef unsigned long i
+    cdef InternEntry *newTable = NULL
+
+    if size < 0:
+        raise ValueError, "intern table size must not be negative"
+
+    if size > 0:
+        newTable = <InternEntry *>malloc(size * sizeof(InternEntry))
+        if newTable == NULL:
+            raise MemoryError
+        for i in range(size):
+            newTable[i].jsName = NULL
+            newTable[i].pyName = NULL
+            newTable[i].hash = 0
+
+    for i in range(_internSize):
+        internDrop(&_internTable[i])
+    free(_internTable)
+    _internIndex.clear()
+
+    _internTable = newTable
+    _internSize = size
+
+def nameCacheStats(reset=False):
+    """Return statistics about the property name intern table.
+
+    ``toJSHits`` and ``toJSMisses`` count conversions of Python names
+    into JavaScript strings, ``fromJSHits`` and ``fromJSMisses`` count
+    conversions in the opposite direction. If ``reset`` is true, all
+    counters are set back to zero after reading them."""
+    global _internToJSHits, _internToJSMisses, _internFromJSHits, \
+        _internFromJSMisses, _internEvictions
+
+    stats = {'size': _internSize,
+             'count': len(_internIndex),
+             'toJSHits': _internToJSHits,
+             'toJSMisses': _internToJSMisses,
+             'fromJSHits': _internFromJSHits,
+             'fromJSMisses': _internFromJSMisses,
+             'evictions': _internEvictions,
+             }
+    if reset:
+        _internToJSHits = _internToJSMisses = 0
+        _internFromJSHits = _internFromJSMisses = 0
+        _internEvictions = 0
+    return stats
+
+setNameCacheSize(INTERN_DEFAULT_SIZE)
+
 cdef JSObjectRef wrapPyObject(JSContextRef jsCtx, object pyValue):
+    cdef _GroupWrappers wrappers = groupWrappers(jsCtx, True)
     cdef JSObjectRef wrapper
 
-    try:
-        return <JSObjectRef>PyCObject_AsVoidPtr(_pyWrappedPyObjs[id(pyValue)])
-    except KeyError:
-        pass
+    wrapper = <JSObjectRef>wrapperTableGet(&wrappers.pyObjs,
+                                           <void *>pyValue)
+    if wrapper != NULL:
+        countStat(jsCtx, STAT_WRAPPER_HITS)
+        return wrapper
 
+    countStat(jsCtx, STAT_WRAPPERS_CREATED)
     wrapper = makePyObject(jsCtx, pyValue)
-    _pyWrappedPyObjs[id(pyValue)] = PyCObject_FromVoidPtr(wrapper, NULL)
+    # See wrapJSObject.
+    wrappers = groupWrappers(jsCtx, True)
+    wrapperTablePut(&wrappers.pyObjs, <void *>pyValue, <void *>wrapper)
+    wrapperTablePut(&_pyWrapperGroups, <void *>wrapper,
+                    <void *>JSContextGetGroup(jsCtx))
     return wrapper
 
-cdef JSValueRef pythonToJS(JSContextRef jsCtx, object pyValue):
+# Default maximum depth for copying Python containers into
+# JavaScript.
+DEF COPY_DEFAULT_MAX_DEPTH = 100
+
+# Global objects (cast to long) of the contexts that copy Python
+# lists, tuples and dictionaries by value instead of wrapping them. See
+# the ``copyContainers`` property of ``JSContext``.
+cdef object _copyContainersCtxs = set()
+
+
+cdef class _ByValue:
+    """A Python container marked to be passed to JavaScript by value.
+
+    Instances are created by the ``toJS`` function."""
+
+    cdef object value
+    cdef int maxDepth
+
+
+def toJS(value, copy=True, maxDepth=COPY_DEFAULT_MAX_DEPTH):
+    """Mark a Python value to be passed to JavaScript by value.
+
+    When the result of this function is passed to JavaScript (e.g., as
+    an argument to a function or as the value of a property), Python
+    sequences and mappings in ``value`` are copied into native
+    JavaScript arrays and objects, recursively down to ``maxDepth``
+    levels (``None`` means no limit), instead of being wrapped. Other
+    values are converted as usual. A ``ValueError`` is raised when
+    copying a cyclic structure.
+
+    If ``copy`` is false, ``value`` is returned unchanged, so that it
+    is wrapped as usual."""
+    cdef _ByValue result
+
+    if not copy:
+        return value
+
+    result = _ByValue()
+    result.value = value
+    if maxDepth is None:
+        result.maxDepth = -1
+    else:
+        result.maxDepth = maxDepth
+    return result
+
+cdef JSValueRef pythonToJSCopy(JSContextRef jsCtx, object pyValue,
+                               int maxDepth, int depth,
+                               object active) except NULL:
+    """Convert a Python value into a JavaScript value, copying
+    sequences and mappings into native arrays and objects.
+
+    ``active`` is the set of the ids of the containers being
+    currently copied, used to detect cycles."""
+    cdef JSObjectRef jsResult
+    cdef JSStringRef jsName
+    cdef JSValueRef jsException = NULL
+    cdef unsigned i
+
+    if isinstance(pyValue, types.StringTypes) or \
+            isinstance(pyValue, _JSBaseObject):
+        return pythonToJS(jsCtx, pyValue)
+
+    isSeq = isinstance(pyValue, collections.Sequence)
+    if not isSeq and not isinstance(pyValue, collections.Mapping):
+        return pythonToJS(jsCtx, pyValue)
+
+    if maxDepth >= 0 and depth >= maxDepth:
+        return wrapPyObject(jsCtx, pyValue)
+
+    key = id(pyValue)
+    if key in active:
+        raise ValueError, "cannot copy cyclic Python data structure"
+    active.add(key)
+    try:
+        if isSeq:
+            jsResult = JSObjectMakeArray(jsCtx, 0, NULL, &jsException)
+            if jsException != NULL:
+                raise jsExceptionToPython(jsCtx, jsException)
+
+            i = 0
+            for pyElem in pyValue:
+                JSObjectSetPropertyAtIndex(
+                    jsCtx, jsResult, i,
+                    pythonToJSCopy(jsCtx, pyElem, maxDepth, depth + 1,
+                                   active),
+                    &jsException)
+                if jsException != NULL:
+                    raise jsExceptionToPython(jsCtx, jsException)
+                i += 1
+        else:
+            jsResult = JSObjectMake(jsCtx, NULL, NULL)
+
+            for pyKey, pyElem in pyValue.iteritems():
+                jsName = createJSNameFromPython(pyKey)
+                try:
+                    JSObjectSetProperty(
+                        jsCtx, jsResult, jsName,
+                        pythonToJSCopy(jsCtx, pyElem, maxDepth, depth + 1,
+                                       active),
+                        kJSPropertyAttributeNone, &jsException)
+                finally:
+                    JSStringRelease(jsName)
+                if jsException != NULL:
+                    raise jsExceptionToPython(jsCtx, jsException)
+    finally:
+        active.remove(key)
+
+    return jsResult
+
+cdef JSValueRef pythonToJS(JSContextRef jsCtx, object pyValue) except NULL:
     """Convert a Python value into a JavaScript value.
 
     The returned value belongs to the specified context, and must be
     protected if it is going to be permanently stored (e.g., inside an
     object)."""
+    cdef object pyType = type(pyValue)
+
+    countToJS(jsCtx, pyValue)
+
+    # Check the most frequent exact types first.
+    if pyType is float or pyType is int:
+        return JSValueMakeNumber(jsCtx, pyValue)
+    elif pyType is unicode or pyType is str:
+        return pyStringToJS(jsCtx, pyValue)
 
     if isinstance(pyValue, types.NoneType):
         return JSValueMakeUndefined(jsCtx)
@@ -211,15 +978,237 @@ cdef JSValueRef pythonToJS(JSContextRef jsCtx, object pyValue):
     elif isinstance(pyValue, (types.IntType, types.FloatType)):
         return JSValueMakeNumber(jsCtx, pyValue)
     elif isinstance(pyValue, types.StringTypes):
-        return JSValueMakeString(jsCtx, createJSStringFromPython(pyValue))
+        return pyStringToJS(jsCtx, pyValue)
     elif isinstance(pyValue, _JSBaseObject):
-        # This is a wrapped JavaScript object, just unwrap it.
+        # This is a wrapped JavaScript object, just unwrap it. Objects
+        # can only be shared by contexts in the same group.
+        if _releasedCtx != NULL and \
+                (<_JSBaseObject>pyValue).jsCtx == _releasedCtx:
+            raise ReferenceError, "JavaScript object released at the " \
+                "end of its scope"
+        if (<_JSBaseObject>pyValue).jsCtx != jsCtx and \
+                JSContextGetGroup((<_JSBaseObject>pyValue).jsCtx) != \
+                JSContextGetGroup(jsCtx):
+            raise ValueError, "JavaScript objects cannot be passed " \
+                "between contexts in different context groups"
         return (<_JSObject>pyValue).jsObject
+    elif isinstance(pyValue, _BufferView):
+        return pyBufferToJS(jsCtx, (<_BufferView>pyValue).value,
+                            (<_BufferView>pyValue).arrayType)
+    elif isinstance(pyValue, _ByValue):
+        return pythonToJSCopy(jsCtx, (<_ByValue>pyValue).value,
+                              (<_ByValue>pyValue).maxDepth, 0, set())
+    elif _copyContainersCtxs and \
+            isinstance(pyValue, (types.ListType, types.TupleType,
+                                 types.DictType)) and \
+            <long>JSContextGetGlobalObject(jsCtx) in _copyContainersCtxs:
+        return pythonToJSCopy(jsCtx, pyValue, COPY_DEFAULT_MAX_DEPTH, 0,
+                              set())
     else:
         # Wrap all other Python objects into a generic wrapper.
         return wrapPyObject(jsCtx, pyValue)
 
 
+#
+# Typed arrays
+#
+
+# Typed array types by name. Values are (type code, item size, Python
+# buffer format) tuples.
+_typedArrayTypes = {
+    'Int8Array': (kJSTypedArrayTypeInt8Array, 1, 'b'),
+    'Uint8Array': (kJSTypedArrayTypeUint8Array, 1, 'B'),
+    'Uint8ClampedArray': (kJSTypedArrayTypeUint8ClampedArray, 1, 'B'),
+    'Int16Array': (kJSTypedArrayTypeInt16Array, 2, 'h'),
+    'Uint16Array': (kJSTypedArrayTypeUint16Array, 2, 'H'),
+    'Int32Array': (kJSTypedArrayTypeInt32Array, 4, 'i'),
+    'Uint32Array': (kJSTypedArrayTypeUint32Array, 4, 'I'),
+    'Float32Array': (kJSTypedArrayTypeFloat32Array, 4, 'f'),
+    'Float64Array': (kJSTypedArrayTypeFloat64Array, 8, 'd'),
+    'ArrayBuffer': (kJSTypedArrayTypeArrayBuffer, 1, 'B'),
+    }
+
+# The same information indexed by type code.
+_typedArrayCodes = dict([(code, (name, itemSize, fmt))
+                         for name, (code, itemSize, fmt)
+                         in _typedArrayTypes.items()])
+
+# Typed array types for Python buffer formats. Keys are (format, item
+# size) pairs. Buffers with other formats are exposed as Uint8Array.
+_formatTypedArrays = {
+    ('b', 1): 'Int8Array',
+    ('B', 1): 'Uint8Array',
+    ('c', 1): 'Uint8Array',
+    ('h', 2): 'Int16Array',
+    ('H', 2): 'Uint16Array',
+    ('i', 4): 'Int32Array',
+    ('I', 4): 'Uint32Array',
+    ('l', 4): 'Int32Array',
+    ('L', 4): 'Uint32Array',
+    ('f', 4): 'Float32Array',
+    ('d', 8): 'Float64Array',
+    }
+
+
+cdef int getPyBuffer(object obj, Py_buffer *view, int flags) except -1:
+    """Get a buffer for ``obj`` like ``PyObject_GetBuffer``, falling
+    back to the old buffer protocol for objects that only support it
+    (e.g. ``array.array``). Return 1 if the old protocol was used, 0
+    otherwise. The view keeps a reference to ``obj`` in both cases."""
+    cdef void *buf
+    cdef Py_ssize_t length
+    cdef int readonly = 0
+
+    if PyObject_CheckBuffer(obj):
+        PyObject_GetBuffer(obj, view, flags)
+        return 0
+
+    try:
+        PyObject_AsWriteBuffer(obj, &buf, &length)
+    except TypeError:
+        PyObject_AsReadBuffer(obj, &buf, &length)
+        readonly = 1
+    PyBuffer_FillInfo(view, obj, buf, length, readonly, flags)
+    return 1
+
+
+cdef class _BufferView:
+    """A Python buffer marked to be passed to JavaScript as a typed
+    array.
+
+    Instances are created by the ``asTypedArray`` function."""
+
+    cdef object value
+    cdef object arrayType
+
+
+def asTypedArray(value, arrayType=None):
+    """Mark an object supporting the buffer protocol (or the old
+    buffer protocol, like ``array.array``) to be passed to JavaScript
+    as a typed array.
+
+    When the result of this function is passed to JavaScript, the
+    memory of ``value`` is exposed as a typed array (or as an
+    ``ArrayBuffer``) without copying it. ``arrayType`` is the name of
+    the JavaScript type (e.g. ``'Float64Array'``); by default it is
+    derived from the format of the buffer. The buffer is held until
+    the JavaScript object is garbage collected. Read-only buffers
+    (e.g. ``str`` objects) are copied instead.
+
+    Typed arrays in the opposite direction support the buffer
+    protocol, so that ``memoryview(jsTypedArray)`` accesses their
+    memory without copying it.
+
+    A ``NotImplementedError`` is raised if the JavaScriptCore version
+    used does not support typed arrays."""
+    cdef _BufferView result
+    cdef Py_buffer view
+    cdef Py_ssize_t itemSize
+
+    if not PYJSC_HAVE_TYPED_ARRAYS:
+        raise NotImplementedError, \
+            "typed arrays are not supported by this JavaScriptCore version"
+    if arrayType is not None:
+        if arrayType not in _typedArrayTypes:
+            raise ValueError, "unknown typed array type '%s'" % arrayType
+        itemSize = _typedArrayTypes[arrayType][1]
+        getPyBuffer(value, &view, PyBUF_C_CONTIGUOUS)
+        try:
+            if view.len % itemSize != 0:
+                raise ValueError, "buffer size is not a multiple of " \
+                    "the %s element size" % arrayType
+        finally:
+            PyBuffer_Release(&view)
+
+    result = _BufferView()
+    result.value = value
+    result.arrayType = arrayType
+    return result
+
+cdef void releasePyBuffer(void *bytes, void *view) with gil:
+    """Deallocator for array buffers created by ``pyBufferToJS``."""
+    PyBuffer_Release(<Py_buffer *>view)
+    free(view)
+
+cdef JSValueRef pyBufferToJS(JSContextRef jsCtx, object pyValue,
+                             object arrayType) except NULL:
+    """Make a typed array exposing the memory of a Python object
+    supporting the buffer protocol."""
+    cdef Py_buffer *view
+    cdef JSValueRef jsException = NULL
+    cdef JSObjectRef jsBuffer
+    cdef JSObjectRef jsResult
+    cdef int typeCode
+    cdef int oldBuffer
+    cdef Py_ssize_t itemSize
+
+    view = <Py_buffer *>malloc(sizeof(Py_buffer))
+    if view == NULL:
+        raise MemoryError
+    try:
+        oldBuffer = getPyBuffer(pyValue, view,
+                                PyBUF_FORMAT | PyBUF_C_CONTIGUOUS)
+    except:
+        free(view)
+        raise
+
+    try:
+        if arrayType is None:
+            if oldBuffer:
+                # Old buffers are plain bytes, but arrays tell their
+                # element type.
+                fmt = getattr(pyValue, 'typecode', 'B')
+                itemSize = getattr(pyValue, 'itemsize', 1)
+            elif view.format == NULL:
+                fmt = 'B'
+                itemSize = view.itemsize
+            else:
+                fmt = view.format
+                itemSize = view.itemsize
+            arrayType = _formatTypedArrays.get((fmt.lstrip('@='),
+                                                itemSize),
+                                               'Uint8Array')
+        typeCode, itemSize, fmt = _typedArrayTypes[arrayType]
+        if view.len % itemSize != 0:
+            raise ValueError, "buffer size is not a multiple of " \
+                "the %s element size" % arrayType
+    except:
+        PyBuffer_Release(view)
+        free(view)
+        raise
+
+    if view.readonly:
+        # JavaScript could write to the memory, make a copy.
+        try:
+            jsResult = JSObjectMakeTypedArray(jsCtx,
+                                              kJSTypedArrayTypeUint8Array,
+                                              view.len, &jsException)
+            if jsException != NULL:
+                raise jsExceptionToPython(jsCtx, jsException)
+            memcpy(JSObjectGetTypedArrayBytesPtr(jsCtx, jsResult, NULL),
+                   view.buf, view.len)
+            jsBuffer = JSObjectGetTypedArrayBuffer(jsCtx, jsResult, NULL)
+        finally:
+            PyBuffer_Release(view)
+            free(view)
+    else:
+        # From here on, the view is owned by the array buffer and
+        # released by its deallocator.
+        jsBuffer = JSObjectMakeArrayBufferWithBytesNoCopy(
+            jsCtx, view.buf, view.len, releasePyBuffer, view, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(jsCtx, jsException)
+
+    if typeCode == kJSTypedArrayTypeArrayBuffer:
+        return jsBuffer
+
+    jsResult = JSObjectMakeTypedArrayWithArrayBuffer(
+        jsCtx, <JSTypedArrayType>typeCode, jsBuffer, &jsException)
+    if jsException != NULL:
+        raise jsExceptionToPython(jsCtx, jsException)
+    return jsResult
+
+
 #
 # Python Wrappers for JavaScript objects
 #
@@ -227,6 +1216,21 @@ cdef JSValueRef pythonToJS(JSContextRef jsCtx, object pyValue):
 # The name of the length array property.
 cdef JSStringRef jsLengthName = JSStringCreateWithUTF8CString("length")
 
+# The name of the global Array constructor.
+cdef JSStringRef jsArrayName = JSStringCreateWithUTF8CString("Array")
+
+# Names of the Array properties used to manipulate arrays natively.
+cdef JSStringRef jsPrototypeName = JSStringCreateWithUTF8CString("prototype")
+cdef JSStringRef jsSpliceName = JSStringCreateWithUTF8CString("splice")
+cdef JSStringRef jsPushName = JSStringCreateWithUTF8CString("push")
+cdef JSStringRef jsIndexOfName = JSStringCreateWithUTF8CString("indexOf")
+cdef JSStringRef jsSortName = JSStringCreateWithUTF8CString("sort")
+cdef JSStringRef jsReverseName = JSStringCreateWithUTF8CString("reverse")
+
+# Maximum number of elements passed in a single call to an Array
+# method.
+DEF ARRAY_CALL_MAX_ARGS = 4096
+
 
 cdef class _JSBaseObject:
     """Base class for all Python wrappers for JavaScript objects.
@@ -254,9 +1258,75 @@ cdef class _JSBaseObject:
         self.jsObject = jsObject
         JSValueProtect(self.jsCtx, self.jsObject)
 
+        if _activeScopes > 0:
+            recordScopedWrapper(self)
+
+    cdef release(self):
+        """Release the JavaScript object and context before this
+        wrapper is deallocated (see ``JSScope``). The wrapper is left
+        pointing to the released object."""
+        cdef _GroupWrappers wrappers
+
+        wrappers = groupWrappers(self.jsCtx, False)
+        if wrappers is not None and \
+                wrapperTableRemove(&wrappers.jsObjs, <void *>self.jsObject,
+                                   <void *>self):
+            dropEmptyGroupWrappers(self.jsCtx, wrappers)
+
+        # Unprotecting and releasing take the VM lock, and releasing
+        # the last reference may run finalizers, so don't hold the GIL
+        # meanwhile.
+        with nogil:
+            JSValueUnprotect(self.jsCtx, self.jsObject)
+        countRelease(self.jsCtx)
+        with nogil:
+            JSGlobalContextRelease(self.jsCtx)
+            self.jsCtx = _releasedCtx
+            JSGlobalContextRetain(self.jsCtx)
+            self.jsObject = _releasedObj
+            JSValueProtect(self.jsCtx, self.jsObject)
+
     def __dealloc__(self):
-        JSValueUnprotect(self.jsCtx, self.jsObject)
-        JSGlobalContextRelease(self.jsCtx)
+        cdef _GroupWrappers wrappers
+
+        if self.jsCtx == NULL:
+            return
+
+        # Remove this object from the wrapper cache, if it is there.
+        wrappers = groupWrappers(self.jsCtx, False)
+        if wrappers is not None and \
+                wrapperTableRemove(&wrappers.jsObjs, <void *>self.jsObject,
+                                   <void *>self):
+            dropEmptyGroupWrappers(self.jsCtx, wrappers)
+
+        with nogil:
+            JSValueUnprotect(self.jsCtx, self.jsObject)
+        countRelease(self.jsCtx)
+        with nogil:
+            JSGlobalContextRelease(self.jsCtx)
+
+
+cdef JSValueRef compareNumbers(JSContextRef jsCtx,
+                               JSObjectRef jsFunction,
+                               JSObjectRef jsThisObj,
+                               size_t argumentCount,
+                               JSValueRef jsArgs[],
+                               JSValueRef* jsExc) nogil:
+    """Comparison function used to sort arrays of numbers, called
+    from JavaScript without acquiring the GIL."""
+    cdef double a
+    cdef double b
+
+    if argumentCount < 2:
+        return JSValueMakeNumber(jsCtx, 0)
+    a = JSValueToNumber(jsCtx, jsArgs[0], NULL)
+    b = JSValueToNumber(jsCtx, jsArgs[1], NULL)
+    if a < b:
+        return JSValueMakeNumber(jsCtx, -1)
+    elif a > b:
+        return JSValueMakeNumber(jsCtx, 1)
+    else:
+        return JSValueMakeNumber(jsCtx, 0)
 
 
 cdef class _JSSequence(_JSBaseObject):
@@ -270,6 +1340,145 @@ cdef class _JSSequence(_JSBaseObject):
     ``JSSequence`` as a standard Python class that mixes in
     ``MutableMapping`` from the ``collections`` module."""
 
+    # Whether the object is a native JavaScript array (1) or not (0),
+    # -1 if not known yet.
+    cdef int isArray
+
+    def __init__(self):
+        _JSBaseObject.__init__(self)
+        self.isArray = -1
+
+    cdef JSObjectRef arrayMethod(self, JSStringRef jsName):
+        """Return the ``Array.prototype`` method named ``jsName`` if
+        this object is a native JavaScript array, NULL otherwise."""
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef JSValueRef jsValue
+        cdef JSObjectRef jsArrayCtor
+
+        jsValue = JSObjectGetProperty(jsCtx, JSContextGetGlobalObject(jsCtx),
+                                      jsArrayName, NULL)
+        if jsValue == NULL or not JSValueIsObject(jsCtx, jsValue):
+            return NULL
+        jsArrayCtor = <JSObjectRef>jsValue
+
+        if self.isArray < 0:
+            self.isArray = JSValueIsInstanceOfConstructor(
+                jsCtx, self.jsObject, jsArrayCtor, NULL)
+        if not self.isArray:
+            return NULL
+
+        jsValue = JSObjectGetProperty(jsCtx, jsArrayCtor, jsPrototypeName,
+                                      NULL)
+        if jsValue == NULL or not JSValueIsObject(jsCtx, jsValue):
+            return NULL
+        jsValue = JSObjectGetProperty(jsCtx, <JSObjectRef>jsValue, jsName,
+                                      NULL)
+        if jsValue == NULL or not JSValueIsObject(jsCtx, jsValue) or \
+                not JSObjectIsFunction(jsCtx, <JSObjectRef>jsValue):
+            return NULL
+        return <JSObjectRef>jsValue
+
+    cdef JSValueRef callMethod(self, JSObjectRef jsMethod, size_t argCount,
+                               JSValueRef *jsArgs) except NULL:
+        """Call ``jsMethod`` on this object with already converted
+        arguments."""
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef JSObjectRef jsObject = self.jsObject
+        cdef JSValueRef jsResult
+        cdef JSValueRef jsError = NULL
+        cdef _ExecutionLimit limit
+
+        countStat(jsCtx, STAT_CALLS)
+        limit = enterLimit(jsCtx, None)
+        try:
+            with nogil:
+                jsResult = JSObjectCallAsFunction(jsCtx, jsMethod, jsObject,
+                                                  argCount, jsArgs, &jsError)
+            if jsError != NULL:
+                raise jsExceptionToPython(self.jsCtx, jsError)
+        finally:
+            if limit is not None:
+                limit.leave()
+            gcSafePoint(jsCtx)
+        return jsResult
+
+    cdef int elementType(self, int length) except? -2:
+        """Return the common type of the elements of this object
+        (``kJSTypeNumber``, ``kJSTypeString``, etc.) or -1 if they
+        have different types."""
+        cdef int jsType = -1
+        cdef int i
+
+        for i in range(length):
+            if i == 0:
+                jsType = JSValueGetType(self.jsCtx, self.getItem(i))
+            elif JSValueGetType(self.jsCtx, self.getItem(i)) != jsType:
+                return -1
+        return jsType
+
+    cdef int findItem(self, object pyItem, JSValueRef jsItem, int start,
+                      int stop) except -2:
+        """Return the index of the first element in ``[start, stop)``
+        equal to the item, or -1 if there is none.
+
+        ``pyItem`` and ``jsItem`` are the item in Python and converted
+        to JavaScript. Wrapped Python objects are compared according to
+        Python rules, everything else is compared according to
+        JavaScript rules (strict equality, holes being undefined).
+
+        The engine's ``indexOf`` finds the first strictly equal
+        element, only the elements before it are checked one by one
+        for wrapped Python objects and holes."""
+        cdef JSObjectRef jsIndexOf
+        cdef JSValueRef jsArgs[2]
+        cdef JSValueRef jsElem
+        cdef double index
+        cdef int found = -1
+        cdef int i
+
+        if start >= stop:
+            return -1
+
+        if not JSValueIsObjectOfClass(self.jsCtx, jsItem, pyWrapperClass):
+            jsIndexOf = self.arrayMethod(jsIndexOfName)
+            if jsIndexOf != NULL:
+                # Let the engine search for the value.
+                jsArgs[0] = jsItem
+                jsArgs[1] = JSValueMakeNumber(self.jsCtx, start)
+                index = JSValueToNumber(
+                    self.jsCtx, self.callMethod(jsIndexOf, 2, jsArgs), NULL)
+                if index >= 0 and index < stop:
+                    found = <int>index
+                    stop = found
+
+        for i in range(start, stop):
+            jsElem = self.getItem(i)
+            if JSValueIsObjectOfClass(self.jsCtx, jsElem, pyWrapperClass):
+                if <object>JSObjectGetPrivate(<JSObjectRef>jsElem) == pyItem:
+                    return i
+            elif JSValueIsStrictEqual(self.jsCtx, jsItem, jsElem):
+                return i
+        return found
+
+    cdef JSValueRef splice(self, JSObjectRef jsSplice, int start,
+                           int deleteCount, list pyValues) except NULL:
+        """Call the ``splice`` method of this array, inserting the
+        elements of ``pyValues``. Return the array of deleted
+        elements."""
+        cdef JSValueRef jsRemoved
+        cdef int count = len(pyValues)
+
+        # Insert the values in chunks, to keep the argument count of
+        # each call within limits.
+        jsRemoved = callJSFunctionRaw(
+            self.jsCtx, jsSplice, self.jsObject,
+            [start, deleteCount] + pyValues[:ARRAY_CALL_MAX_ARGS])
+        for i in range(ARRAY_CALL_MAX_ARGS, count, ARRAY_CALL_MAX_ARGS):
+            callJSFunctionRaw(self.jsCtx, jsSplice, self.jsObject,
+                              [start + i, 0] +
+                              pyValues[i:i + ARRAY_CALL_MAX_ARGS])
+        return jsRemoved
+
     cdef int getLength(self) except -1:
         cdef JSValueRef jsException = NULL
         cdef JSValueRef jsResult
@@ -336,22 +1545,112 @@ cdef class _JSSequence(_JSBaseObject):
 
         return 0
 
+    cdef list getRange(self, int start, int end):
+        """Convert the elements in ``[start, end)`` into a Python
+        list."""
+        cdef list result = []
+        cdef int i
+
+        for i in range(start, end):
+            result.append(jsToPython(self.jsCtx, self.getItem(i)))
+        return result
+
+    def tolist(self):
+        """Return a Python list with the (converted) elements of this
+        sequence.
+
+        This is equivalent to ``list(seq)``, but the length of the
+        sequence is read only once and all elements are converted in
+        a single loop."""
+        return self.getRange(0, self.getLength())
+
+    def iterSnapshot(self, chunkSize=256):
+        """Return an iterator over the current contents of this
+        sequence.
+
+        Contrary to the standard iterator, the length of the sequence
+        is read only once, when the iterator is created, and elements
+        are fetched and converted ``chunkSize`` at a time. Elements
+        removed from the sequence while iterating are returned as
+        ``None``; elements added are not returned at all."""
+        return _JSSeqSnapshotIterator(self, chunkSize)
+
     def __contains__(self, pyItem):
         cdef JSValueRef jsItem = pythonToJS(self.jsCtx, pyItem)
-        cdef JSValueRef jsElem
 
-        for i in range(self.getLength()):
-            jsElem = self.getItem(i)
-            if JSValueIsObjectOfClass(self.jsCtx, jsElem, pyObjectClass):
-                # This is a wrapped Python object, compare according
-                # to Python rules.
-                if <object>JSObjectGetPrivate(jsElem) == pyItem:
-                    return True
-            else:
-                # Compare according to JavaScript rules.
-                if JSValueIsStrictEqual(self.jsCtx, jsItem, jsElem):
-                    return True
-        return False
+        return self.findItem(pyItem, jsItem, 0, self.getLength()) >= 0
+
+    def index(self, pyItem, start=0, stop=None):
+        cdef JSValueRef jsItem = pythonToJS(self.jsCtx, pyItem)
+        cdef int length = self.getLength()
+        cdef int index
+
+        start, stop, step = slice(start, stop).indices(length)
+        index = self.findItem(pyItem, jsItem, start, stop)
+        if index < 0:
+            raise ValueError, "%r is not in list" % (pyItem,)
+        return index
+
+    def count(self, pyItem):
+        cdef JSValueRef jsItem = pythonToJS(self.jsCtx, pyItem)
+        cdef int length = self.getLength()
+        cdef int count = 0
+        cdef int index
+
+        index = self.findItem(pyItem, jsItem, 0, length)
+        while index >= 0:
+            count += 1
+            index = self.findItem(pyItem, jsItem, index + 1, length)
+        return count
+
+    def reverse(self):
+        cdef JSObjectRef jsReverse = self.arrayMethod(jsReverseName)
+        cdef int length
+        cdef JSValueRef jsFirst
+        cdef int i
+
+        if jsReverse != NULL:
+            self.callMethod(jsReverse, 0, NULL)
+            return
+
+        length = self.getLength()
+        for i in range(length / 2):
+            jsFirst = self.getItem(i)
+            self.setItem(i, self.getItem(length - 1 - i))
+            self.setItem(length - 1 - i, jsFirst)
+
+    def sort(self, key=None, reverse=False):
+        """Sort the sequence in place.
+
+        Arrays of numbers or strings sorted without a key function
+        are sorted by the engine, everything else is converted to
+        Python and sorted by Python."""
+        cdef JSObjectRef jsSort
+        cdef JSValueRef jsArgs[1]
+        cdef int jsType
+
+        if key is None:
+            jsSort = self.arrayMethod(jsSortName)
+            if jsSort != NULL:
+                jsType = self.elementType(self.getLength())
+                if jsType == kJSTypeNumber:
+                    jsArgs[0] = JSObjectMakeFunctionWithCallback(
+                        self.jsCtx, NULL, compareNumbers)
+                    self.callMethod(jsSort, 1, jsArgs)
+                elif jsType == kJSTypeString:
+                    # The default order sorts strings by code unit.
+                    self.callMethod(jsSort, 0, NULL)
+                else:
+                    jsSort = NULL
+
+                if jsSort != NULL:
+                    if reverse:
+                        self.reverse()
+                    return
+
+        pyValues = self.tolist()
+        pyValues.sort(key=key, reverse=reverse)
+        self[:] = pyValues
 
     def __len__(self):
         return self.getLength()
@@ -392,6 +1691,7 @@ cdef class _JSSequence(_JSBaseObject):
         cdef int valueLength
         cdef int sliceSize
         cdef int i
+        cdef JSObjectRef jsSplice
 
         if isinstance(pyIndex, int) or isinstance(pyIndex, long):
             index = pyIndex
@@ -411,12 +1711,21 @@ cdef class _JSSequence(_JSBaseObject):
             valueLength = len(pyValueList)
 
             if step == 1:
+                if end < start:
+                    end = start
+
+                jsSplice = self.arrayMethod(jsSpliceName)
+                if jsSplice != NULL:
+                    # Replace the slice in a single operation.
+                    self.splice(jsSplice, start, end - start, pyValueList)
+                    return
+
                 # Move the elements after the slice to their final
                 # position.
                 self.copyBlock(end, length, start + valueLength)
 
-                if end - start > valueLength:
-                    # Truncate the list to its new length.
+                if end - start != valueLength:
+                    # Set the list to its new length.
                     self.setLength(length - (end - start) + valueLength)
             else:
                 # Calculate the size of the extended slice.
@@ -443,6 +1752,7 @@ cdef class _JSSequence(_JSBaseObject):
         cdef int length = self.getLength()
         cdef int start, end, step
         cdef int frm, dest, nextDel
+        cdef JSObjectRef jsSplice = self.arrayMethod(jsSpliceName)
 
         if isinstance(pyIndex, int) or isinstance(pyIndex, long):
             index = pyIndex
@@ -455,12 +1765,22 @@ cdef class _JSSequence(_JSBaseObject):
             if index < 0 or index >= length:
                 raise IndexError, "list index out of range"
 
-            self.copyBlock(index + 1, length, index)
-            self.setLength(length - 1)
+            if jsSplice != NULL:
+                self.splice(jsSplice, index, 1, [])
+            else:
+                self.copyBlock(index + 1, length, index)
+                self.setLength(length - 1)
         elif isinstance(pyIndex, slice):
             start, end, step = pyIndex.indices(length)
 
             if step == 1:
+                if end <= start:
+                    return
+
+                if jsSplice != NULL:
+                    self.splice(jsSplice, start, end - start, [])
+                    return
+
                 # Move the elements after the slice to their final
                 # position.
                 self.copyBlock(end, length, start)
@@ -494,6 +1814,7 @@ cdef class _JSSequence(_JSBaseObject):
     def insert(self, pyIndex, pyValue):
         cdef int index
         cdef int length = self.getLength()
+        cdef JSObjectRef jsSplice
 
         if not isinstance(pyIndex, int) and not isinstance(pyIndex, long):
             raise TypeError, "list indices must be integers, not %s" % \
@@ -513,8 +1834,73 @@ cdef class _JSSequence(_JSBaseObject):
         elif index > length:
             index = length
 
-        self.copyBlock(index, length, index + 1)
-        self.setItem(index, pythonToJS(self.jsCtx, pyValue))
+        jsSplice = self.arrayMethod(jsSpliceName)
+        if jsSplice != NULL:
+            self.splice(jsSplice, index, 0, [pyValue])
+        else:
+            self.copyBlock(index, length, index + 1)
+            self.setItem(index, pythonToJS(self.jsCtx, pyValue))
+            self.setLength(length + 1)
+
+    def append(self, pyValue):
+        cdef JSObjectRef jsPush = self.arrayMethod(jsPushName)
+        cdef int length
+
+        if jsPush != NULL:
+            callJSFunctionRaw(self.jsCtx, jsPush, self.jsObject, (pyValue,))
+        else:
+            length = self.getLength()
+            self.setItem(length, pythonToJS(self.jsCtx, pyValue))
+            self.setLength(length + 1)
+
+    def extend(self, pyValues):
+        cdef JSObjectRef jsPush = self.arrayMethod(jsPushName)
+        cdef int length
+        cdef int count
+        cdef int i
+
+        # Take a copy first, in case pyValues is this sequence.
+        pyValueList = list(pyValues)
+        count = len(pyValueList)
+
+        if jsPush != NULL:
+            for i in range(0, count, ARRAY_CALL_MAX_ARGS):
+                callJSFunctionRaw(self.jsCtx, jsPush, self.jsObject,
+                                  pyValueList[i:i + ARRAY_CALL_MAX_ARGS])
+        else:
+            length = self.getLength()
+            for i in range(count):
+                self.setItem(length + i,
+                             pythonToJS(self.jsCtx, pyValueList[i]))
+            self.setLength(length + count)
+
+    def pop(self, pyIndex=-1):
+        cdef int index
+        cdef int length = self.getLength()
+        cdef JSObjectRef jsSplice
+        cdef JSValueRef jsRemoved
+
+        if length == 0:
+            raise IndexError, "pop from empty list"
+        if not isinstance(pyIndex, int) and not isinstance(pyIndex, long):
+            raise TypeError, "list indices must be integers, not %s" % \
+                pyIndex.__class__.__name__
+
+        index = pyIndex
+        if index < 0:
+            index += length
+        if index < 0 or index >= length:
+            raise IndexError, "pop index out of range"
+
+        jsSplice = self.arrayMethod(jsSpliceName)
+        if jsSplice != NULL:
+            jsRemoved = self.splice(jsSplice, index, 1, [])
+            return jsToPython(self.jsCtx, JSObjectGetPropertyAtIndex(
+                    self.jsCtx, <JSObjectRef>jsRemoved, 0, NULL))
+
+        pyValue = jsToPython(self.jsCtx, self.getItem(index))
+        del self[index]
+        return pyValue
 
 
 class JSSequence(_JSSequence, collections.MutableSequence):
@@ -537,7 +1923,8 @@ cdef class _JSSeqIterator:
 
     def __next__(self):
         if self.index < self.pySeq.getLength():
-            value = self.pySeq[self.index]
+            value = jsToPython(self.pySeq.jsCtx,
+                               self.pySeq.getItem(self.index))
             self.index += 1
             return value
         else:
@@ -549,6 +1936,60 @@ cdef class _JSSeqIterator:
         return self.__next__()
 
 
+cdef class _JSSeqSnapshotIterator:
+    """Chunked iterator class for JavaScript array-like objects.
+
+    See ``_JSSequence.iterSnapshot``."""
+
+    cdef _JSSequence pySeq
+    cdef int length
+    cdef int index
+    cdef int chunkSize
+    cdef list chunk
+    cdef int chunkPos
+
+    def __init__(self, _JSSequence pySeq, int chunkSize):
+        if chunkSize < 1:
+            raise ValueError, "chunk size must be positive"
+
+        self.pySeq = pySeq
+        self.length = pySeq.getLength()
+        self.index = 0
+        self.chunkSize = chunkSize
+        self.chunk = []
+        self.chunkPos = 0
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        cdef int end
+
+        if self.chunkPos >= len(self.chunk):
+            if self.index >= self.length:
+                raise StopIteration
+
+            end = self.index + self.chunkSize
+            if end > self.length:
+                end = self.length
+            self.chunk = self.pySeq.getRange(self.index, end)
+            self.index = end
+            self.chunkPos = 0
+
+        value = self.chunk[self.chunkPos]
+        self.chunkPos += 1
+        return value
+
+    def next(self):
+        """Wrap the ``__next__`` method for backwards compatibility.
+        """
+        return self.__next__()
+
+
+# Marker for missing values, used as default argument value.
+cdef object _noValue = object()
+
+
 cdef class _JSObject(_JSBaseObject):
     """Wrapper class to make JavaScript objects accessible from
     Python.
@@ -568,6 +2009,13 @@ cdef class _JSObject(_JSBaseObject):
     # Sequence view of this object.
     cdef _JSSequence seqView
 
+    # Shape of the buffers exported by __getbuffer__.
+    cdef Py_ssize_t bufferShape[1]
+
+    # Number of buffers exported by __getbuffer__ and not yet
+    # released. Scopes don't release objects with exported buffers.
+    cdef int bufferExports
+
     def __init__(self):
         _JSBaseObject.__init__(self)
         self.seqView = None
@@ -577,7 +2025,7 @@ cdef class _JSObject(_JSBaseObject):
         cdef JSValueRef jsException = NULL
         cdef JSValueRef jsResult
 
-        jsName = createJSStringFromPython(pyName)
+        jsName = createJSNameFromPython(pyName)
         try:
             jsResult = JSObjectGetProperty(self.jsCtx, self.jsObject,
                                            jsName, &jsException)
@@ -595,7 +2043,7 @@ cdef class _JSObject(_JSBaseObject):
                     raise AttributeError, \
                         "JavaScript object has no property '%s'" % pyName
             elif not JSValueIsObjectOfClass(self.jsCtx, jsResult,
-                                          pyObjectClass) and \
+                                          pyWrapperClass) and \
                   JSValueIsObject(self.jsCtx, jsResult) and \
                   JSObjectIsFunction(self.jsCtx, jsResult):                  
                 # This is a native JavaScript function, we mimic
@@ -612,7 +2060,7 @@ cdef class _JSObject(_JSBaseObject):
         cdef JSStringRef jsName
         cdef JSValueRef jsException = NULL
 
-        jsName = createJSStringFromPython(pyName)
+        jsName = createJSNameFromPython(pyName)
         try:
             JSObjectSetProperty(self.jsCtx, self.jsObject, jsName,
                                 pythonToJS(self.jsCtx, pyValue),
@@ -626,7 +2074,7 @@ cdef class _JSObject(_JSBaseObject):
         cdef JSStringRef jsName
         cdef JSValueRef jsException = NULL
 
-        jsName = createJSStringFromPython(pyName)
+        jsName = createJSNameFromPython(pyName)
         try:
             if not JSObjectHasProperty(self.jsCtx, self.jsObject, jsName):
                 # Use Python behavior for inexisting properties.
@@ -666,70 +2114,303 @@ cdef class _JSObject(_JSBaseObject):
         return self.seqView
 
 
+    def __getbuffer__(self, Py_buffer *buffer, int flags):
+        """Export the memory of JavaScript typed arrays and array
+        buffers through Python's buffer protocol."""
+        cdef JSTypedArrayType typeCode
+        cdef JSObjectRef jsBuffer
+        cdef char *bytes
+        cdef size_t byteLength
+
+        typeCode = JSValueGetTypedArrayType(self.jsCtx, self.jsObject, NULL)
+        if typeCode == kJSTypedArrayTypeNone:
+            raise TypeError, "JavaScript object is not a typed array " \
+                "or array buffer"
+
+        if typeCode == kJSTypedArrayTypeArrayBuffer:
+            bytes = <char *>JSObjectGetArrayBufferBytesPtr(
+                self.jsCtx, self.jsObject, NULL)
+            byteLength = JSObjectGetArrayBufferByteLength(
+                self.jsCtx, self.jsObject, NULL)
+        else:
+            # Depending on the version, JSObjectGetTypedArrayBytesPtr
+            # may or may not include the byte offset, so start from
+            # the underlying array buffer.
+            jsBuffer = JSObjectGetTypedArrayBuffer(self.jsCtx,
+                                                   self.jsObject, NULL)
+            bytes = <char *>JSObjectGetArrayBufferBytesPtr(
+                self.jsCtx, jsBuffer, NULL) + \
+                JSObjectGetTypedArrayByteOffset(self.jsCtx, self.jsObject,
+                                                NULL)
+            byteLength = JSObjectGetTypedArrayByteLength(
+                self.jsCtx, self.jsObject, NULL)
+        name, itemSize, fmt = _typedArrayCodes[typeCode]
+
+        self.bufferShape[0] = byteLength / itemSize
+
+        buffer.buf = bytes
+        buffer.obj = self
+        buffer.len = byteLength
+        buffer.readonly = 0
+        buffer.itemsize = itemSize
+        if flags & PyBUF_FORMAT:
+            buffer.format = PyString_AsString(fmt)
+        else:
+            buffer.format = NULL
+        buffer.ndim = 1
+        if flags & PyBUF_ND:
+            buffer.shape = self.bufferShape
+        else:
+            buffer.shape = NULL
+        buffer.strides = NULL
+        buffer.suboffsets = NULL
+        buffer.internal = NULL
+        self.bufferExports += 1
+
+    def __releasebuffer__(self, Py_buffer *buffer):
+        self.bufferExports -= 1
+
     #
     # Methods implementing the mutable mapping protocol
     #
 
-    def __len__(self):
+    #
+    # The methods below are also provided by ``MutableMapping``, in
+    # terms of the basic operations above. They are implemented
+    # natively here, so that each of them copies the property names at
+    # most once and handles missing properties without raising and
+    # catching exceptions.
+
+    cdef object getProperty(self, JSStringRef jsKey, object default):
+        """Return the value of property ``jsKey``, or ``default`` if
+        the property doesn't exist."""
+        cdef JSValueRef jsException = NULL
+        cdef JSValueRef jsResult
+
+        jsResult = JSObjectGetProperty(self.jsCtx, self.jsObject,
+                                       jsKey, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(self.jsCtx, jsException)
+
+        # An undefined value may be a property with an undefined
+        # value, or no property at all.
+        if JSValueIsUndefined(self.jsCtx, jsResult) and \
+                not JSObjectHasProperty(self.jsCtx, self.jsObject, jsKey):
+            return default
+        return jsToPython(self.jsCtx, jsResult)
+
+    cdef int setProperty(self, JSStringRef jsKey,
+                         object pyValue) except -1:
+        cdef JSValueRef jsException = NULL
+
+        JSObjectSetProperty(self.jsCtx, self.jsObject, jsKey,
+                            pythonToJS(self.jsCtx, pyValue),
+                            kJSPropertyAttributeNone, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(self.jsCtx, jsException)
+        return 0
+
+    cdef int deleteProperty(self, JSStringRef jsKey) except -1:
+        """Delete property ``jsKey`` and return whether it could be
+        deleted."""
+        cdef JSValueRef jsException = NULL
+        cdef bool deleted
+
+        deleted = JSObjectDeleteProperty(self.jsCtx, self.jsObject,
+                                         jsKey, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(self.jsCtx, jsException)
+        return deleted
+
+    cdef list collect(self, int names, int values):
+        """Return a list with the names, the values or the (name,
+        value) pairs of the enumerable properties of this object."""
         cdef JSPropertyNameArrayRef nameArray
+        cdef JSStringRef jsName
+        cdef size_t count
+        cdef size_t i
+        cdef list result = []
 
         nameArray = JSObjectCopyPropertyNames(self.jsCtx, self.jsObject)
         try:
-            return JSPropertyNameArrayGetCount(nameArray)
+            count = JSPropertyNameArrayGetCount(nameArray)
+            for i in range(count):
+                jsName = JSPropertyNameArrayGetNameAtIndex(nameArray, i)
+                if not values:
+                    result.append(pyNameFromJS(jsName))
+                elif not names:
+                    result.append(self.getProperty(jsName, None))
+                else:
+                    result.append((pyNameFromJS(jsName),
+                                   self.getProperty(jsName, None)))
         finally:
             JSPropertyNameArrayRelease(nameArray)
+        return result
 
-    def __iter__(self):
-        return _JSObjectIterator(self)
+    cdef size_t propertyCount(self):
+        cdef JSPropertyNameArrayRef nameArray
+        cdef size_t count
 
-    def __contains__(self, pyKey):
+        # The API provides no way to count the properties without
+        # copying their names.
+        nameArray = JSObjectCopyPropertyNames(self.jsCtx, self.jsObject)
+        count = JSPropertyNameArrayGetCount(nameArray)
+        JSPropertyNameArrayRelease(nameArray)
+        return count
+
+    def __len__(self):
+        return self.propertyCount()
+
+    def __nonzero__(self):
+        return self.propertyCount() > 0
+
+    def get(self, pyKey, default=None):
         cdef JSStringRef jsKey
 
-        jsKey = createJSStringFromPython(pyKey)
+        jsKey = createJSNameFromPython(pyKey)
         try:
-            return JSObjectHasProperty(self.jsCtx, self.jsObject,
-                                       jsKey) != 0
+            return self.getProperty(jsKey, default)
         finally:
             JSStringRelease(jsKey)
 
-    def __getitem__(self, pyKey):
+    def getMany(self, pyKeys, default=None):
+        """Return a list with the values of the properties named in
+        ``pyKeys``, with ``default`` in place of the missing ones."""
         cdef JSStringRef jsKey
-        cdef JSValueRef jsException = NULL
-        cdef JSValueRef jsResult
+        cdef list result = []
+
+        for pyKey in pyKeys:
+            jsKey = createJSNameFromPython(pyKey)
+            try:
+                result.append(self.getProperty(jsKey, default))
+            finally:
+                JSStringRelease(jsKey)
+        return result
 
-        jsKey = createJSStringFromPython(pyKey)
-        try:
-            jsResult = JSObjectGetProperty(self.jsCtx, self.jsObject,
-                                           jsKey, &jsException)
-            if jsException != NULL:
-                raise jsExceptionToPython(self.jsCtx, jsException)
+    def setMany(self, pyItems):
+        """Set several properties at once. ``pyItems`` is either a
+        mapping or an iterable of (name, value) pairs."""
+        cdef JSStringRef jsKey
 
-            if JSValueIsUndefined(self.jsCtx, jsResult):
-                # This may be a property with an undefined value, or
-                # no property at all.
-                if JSObjectHasProperty(self.jsCtx, self.jsObject, jsKey):
-                    return jsToPython(self.jsCtx, jsResult)
-                else:
-                    # For inexisting properties, we use Python
-                    # behavior.
+        if isinstance(pyItems, _JSObject):
+            pyItems = (<_JSObject>pyItems).collect(True, True)
+        elif isinstance(pyItems, dict):
+            pyItems = pyItems.iteritems()
+        elif hasattr(pyItems, 'keys'):
+            pyItems = [(pyKey, pyItems[pyKey]) for pyKey in pyItems.keys()]
+
+        for pyKey, pyValue in pyItems:
+            jsKey = createJSNameFromPython(pyKey)
+            try:
+                self.setProperty(jsKey, pyValue)
+            finally:
+                JSStringRelease(jsKey)
+
+    def keys(self):
+        return self.collect(True, False)
+
+    def values(self):
+        return self.collect(False, True)
+
+    def items(self):
+        return self.collect(True, True)
+
+    def itervalues(self):
+        return iter(self.collect(False, True))
+
+    def iteritems(self):
+        return iter(self.collect(True, True))
+
+    def update(self, *args, **kwds):
+        if len(args) > 1:
+            raise TypeError, \
+                "update expected at most 1 arguments, got %d" % len(args)
+        if args:
+            self.setMany(args[0])
+        if kwds:
+            self.setMany(kwds)
+
+    def clear(self):
+        """Delete all enumerable properties of this object. Properties
+        that cannot be deleted are left in place."""
+        cdef JSPropertyNameArrayRef nameArray
+        cdef size_t count
+        cdef size_t i
+
+        nameArray = JSObjectCopyPropertyNames(self.jsCtx, self.jsObject)
+        try:
+            count = JSPropertyNameArrayGetCount(nameArray)
+            for i in range(count):
+                self.deleteProperty(
+                    JSPropertyNameArrayGetNameAtIndex(nameArray, i))
+        finally:
+            JSPropertyNameArrayRelease(nameArray)
+
+    def pop(self, pyKey, default=_noValue):
+        cdef JSStringRef jsKey
+
+        jsKey = createJSNameFromPython(pyKey)
+        try:
+            pyValue = self.getProperty(jsKey, _noValue)
+            if pyValue is _noValue:
+                if default is _noValue:
                     raise KeyError, \
                         "JavaScript object has no property '%s'" % pyKey
-            else:
-                return jsToPython(self.jsCtx, jsResult)
+                return default
+            if not self.deleteProperty(jsKey):
+                raise KeyError, \
+                    "property '%s' of JavaScript object cannot " \
+                    "be deleted" % pyKey
+            return pyValue
+        finally:
+            JSStringRelease(jsKey)
+
+    def setdefault(self, pyKey, default=None):
+        cdef JSStringRef jsKey
+
+        jsKey = createJSNameFromPython(pyKey)
+        try:
+            pyValue = self.getProperty(jsKey, _noValue)
+            if pyValue is _noValue:
+                self.setProperty(jsKey, default)
+                pyValue = default
+            return pyValue
         finally:
             JSStringRelease(jsKey)
 
+    def __iter__(self):
+        return _JSObjectIterator(self)
+
+    def __contains__(self, pyKey):
+        cdef JSStringRef jsKey
+
+        jsKey = createJSNameFromPython(pyKey)
+        try:
+            return JSObjectHasProperty(self.jsCtx, self.jsObject,
+                                       jsKey) != 0
+        finally:
+            JSStringRelease(jsKey)
+
+    def __getitem__(self, pyKey):
+        cdef JSStringRef jsKey
+
+        jsKey = createJSNameFromPython(pyKey)
+        try:
+            pyValue = self.getProperty(jsKey, _noValue)
+        finally:
+            JSStringRelease(jsKey)
+        if pyValue is _noValue:
+            # For inexisting properties, we use Python behavior.
+            raise KeyError, \
+                "JavaScript object has no property '%s'" % pyKey
+        return pyValue
+
     def __setitem__(self, pyKey, pyValue):
         cdef JSStringRef jsKey
-        cdef JSValueRef jsException = NULL
 
-        jsKey = createJSStringFromPython(pyKey)
+        jsKey = createJSNameFromPython(pyKey)
         try:
-            JSObjectSetProperty(self.jsCtx, self.jsObject, jsKey,
-                                pythonToJS(self.jsCtx, pyValue),
-                                kJSPropertyAttributeNone, &jsException)
-            if jsException != NULL:
-                raise jsExceptionToPython(self.jsCtx, jsException)
+            self.setProperty(jsKey, pyValue)
         finally:
             JSStringRelease(jsKey)
 
@@ -737,7 +2418,7 @@ cdef class _JSObject(_JSBaseObject):
         cdef JSStringRef jsKey
         cdef JSValueRef jsException = NULL
 
-        jsKey = createJSStringFromPython(pyKey)
+        jsKey = createJSNameFromPython(pyKey)
         try:
             if not JSObjectHasProperty(self.jsCtx, self.jsObject, jsKey):
                 # Use Python behavior for inexisting properties.
@@ -778,7 +2459,7 @@ cdef class _JSObjectIterator:
 
     def __next__(self):
         if self.index < JSPropertyNameArrayGetCount(self.nameArray):
-            pyPropName = pyStringFromJS(JSPropertyNameArrayGetNameAtIndex(
+            pyPropName = pyNameFromJS(JSPropertyNameArrayGetNameAtIndex(
                     self.nameArray, self.index))
             self.index += 1
             return pyPropName
@@ -799,6 +2480,163 @@ def asSeq(pyObject):
     return pyObject.__asSeq__()
 
 
+cdef class _JSDeepConverter:
+    """Convert a JavaScript object graph into plain Python values.
+
+    See the ``toPython`` function for details."""
+
+    cdef JSContextRef jsCtx
+    cdef JSObjectRef jsArrayCtor
+    cdef int maxDepth
+    cdef int arraysAsTuples
+    cdef int keepFunctions
+
+    # Addresses of the objects being currently converted. Used to
+    # detect cycles.
+    cdef object active
+
+    cdef setup(self, JSContextRef jsCtx, int maxDepth, int arraysAsTuples,
+               int keepFunctions):
+        cdef JSValueRef jsArrayCtor
+
+        self.jsCtx = jsCtx
+        self.maxDepth = maxDepth
+        self.arraysAsTuples = arraysAsTuples
+        self.keepFunctions = keepFunctions
+        self.active = set()
+
+        jsArrayCtor = JSObjectGetProperty(jsCtx,
+                                          JSContextGetGlobalObject(jsCtx),
+                                          jsArrayName, NULL)
+        if jsArrayCtor != NULL and JSValueIsObject(jsCtx, jsArrayCtor):
+            self.jsArrayCtor = <JSObjectRef>jsArrayCtor
+        else:
+            self.jsArrayCtor = NULL
+
+    cdef int isFunction(self, JSValueRef jsValue):
+        return JSValueIsObject(self.jsCtx, jsValue) and \
+            not JSValueIsObjectOfClass(self.jsCtx, jsValue, pyWrapperClass) and \
+            JSObjectIsFunction(self.jsCtx, jsValue)
+
+    cdef object convert(self, JSValueRef jsValue, int depth):
+        if not JSValueIsObject(self.jsCtx, jsValue) or \
+                JSValueIsObjectOfClass(self.jsCtx, jsValue, pyWrapperClass) or \
+                JSObjectIsFunction(self.jsCtx, jsValue) or \
+                (self.maxDepth >= 0 and depth >= self.maxDepth):
+            return jsToPython(self.jsCtx, jsValue)
+
+        key = <long>jsValue
+        if key in self.active:
+            raise ValueError, "cannot convert cyclic JavaScript object graph"
+        self.active.add(key)
+        try:
+            if self.jsArrayCtor != NULL and \
+                    JSValueIsInstanceOfConstructor(self.jsCtx, jsValue,
+                                                   self.jsArrayCtor, NULL):
+                return self.convertArray(jsValue, depth)
+            else:
+                return self.convertObject(jsValue, depth)
+        finally:
+            self.active.remove(key)
+
+    cdef object convertArray(self, JSObjectRef jsArray, int depth):
+        cdef JSValueRef jsException = NULL
+        cdef JSValueRef jsElem
+        cdef list result = []
+        cdef unsigned length
+        cdef unsigned i
+
+        jsElem = JSObjectGetProperty(self.jsCtx, jsArray, jsLengthName,
+                                     &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(self.jsCtx, jsException)
+        length = <unsigned>JSValueToNumber(self.jsCtx, jsElem, NULL)
+
+        for i in range(length):
+            jsElem = JSObjectGetPropertyAtIndex(self.jsCtx, jsArray, i,
+                                                &jsException)
+            if jsException != NULL:
+                raise jsExceptionToPython(self.jsCtx, jsException)
+
+            if not self.keepFunctions and self.isFunction(jsElem):
+                # Behave as JSON.stringify does.
+                result.append(None)
+            else:
+                result.append(self.convert(jsElem, depth + 1))
+
+        if self.arraysAsTuples:
+            return tuple(result)
+        return result
+
+    cdef object convertObject(self, JSObjectRef jsObject, int depth):
+        cdef JSPropertyNameArrayRef nameArray
+        cdef JSStringRef jsName
+        cdef JSValueRef jsException = NULL
+        cdef JSValueRef jsElem
+        cdef size_t count
+        cdef size_t i
+        cdef dict result = {}
+
+        nameArray = JSObjectCopyPropertyNames(self.jsCtx, jsObject)
+        try:
+            count = JSPropertyNameArrayGetCount(nameArray)
+            for i in range(count):
+                jsName = JSPropertyNameArrayGetNameAtIndex(nameArray, i)
+                jsElem = JSObjectGetProperty(self.jsCtx, jsObject, jsName,
+                                             &jsException)
+                if jsException != NULL:
+                    raise jsExceptionToPython(self.jsCtx, jsException)
+
+                if not self.keepFunctions and self.isFunction(jsElem):
+                    continue
+                result[pyNameFromJS(jsName)] = self.convert(jsElem,
+                                                            depth + 1)
+        finally:
+            JSPropertyNameArrayRelease(nameArray)
+
+        return result
+
+
+def toPython(value, deep=True, maxDepth=100, arrays='list',
+             keepFunctions=True):
+    """Convert a wrapped JavaScript value into plain Python values.
+
+    JavaScript arrays are converted into Python lists (or tuples if
+    ``arrays`` is ``'tuple'``) and other JavaScript objects into
+    dictionaries of their enumerable properties, recursively, down to
+    ``maxDepth`` levels (``None`` means no limit). Objects below that
+    level are returned as the usual wrappers. If ``deep`` is false,
+    only the top level object is converted.
+
+    Functions are kept as wrappers, unless ``keepFunctions`` is false,
+    in which case they are left out of objects and replaced by
+    ``None`` in arrays, as ``JSON.stringify`` does. A ``ValueError``
+    is raised if the object graph contains cycles.
+
+    Values that aren't wrapped JavaScript objects are returned
+    unchanged."""
+    cdef _JSBaseObject pyObject
+    cdef _JSDeepConverter converter
+
+    if not isinstance(value, _JSBaseObject):
+        return value
+    pyObject = value
+    if JSObjectIsFunction(pyObject.jsCtx, pyObject.jsObject):
+        return value
+
+    if arrays not in ('list', 'tuple'):
+        raise ValueError, "invalid value for arrays: %r" % (arrays,)
+    if not deep:
+        maxDepth = 1
+    elif maxDepth is None:
+        maxDepth = -1
+
+    converter = _JSDeepConverter()
+    converter.setup(pyObject.jsCtx, maxDepth, arrays == 'tuple',
+                    keepFunctions)
+    return converter.convert(pyObject.jsObject, 0)
+
+
 cdef makeJSObject(JSContextRef jsCtx, JSObjectRef jsObject):
     """Factory function for 'JSObject' instances."""
     cdef _JSObject obj = JSObject()
@@ -806,6 +2644,265 @@ cdef makeJSObject(JSContextRef jsCtx, JSObjectRef jsObject):
     return obj
 
 
+# Calls with up to this number of arguments don't allocate memory
+# for them.
+DEF CALL_STACK_ARGS = 8
+
+cdef JSValueRef callJSFunctionRaw(JSContextRef jsCtx,
+                                  JSObjectRef jsFunction,
+                                  JSObjectRef jsThisObject,
+                                  object args,
+                                  object timeout=None) except NULL:
+    """Call a JavaScript function with a sequence of Python arguments
+    and return the unconverted result. ``timeout`` is passed to
+    ``enterLimit``.
+
+    The GIL is released while the function runs."""
+    cdef size_t argCount = len(args)
+    cdef JSValueRef stackArgs[CALL_STACK_ARGS]
+    cdef JSValueRef *jsArgs = stackArgs
+    cdef JSValueRef jsResult
+    cdef JSValueRef jsError = NULL
+    cdef _ExecutionLimit limit = None
+    cdef size_t i
+
+    if argCount > CALL_STACK_ARGS:
+        jsArgs = <JSValueRef *>malloc(argCount * sizeof(JSValueRef))
+        if jsArgs == NULL:
+            raise MemoryError
+    try:
+        for i in range(argCount):
+            jsArgs[i] = pythonToJS(jsCtx, args[i])
+        countStat(jsCtx, STAT_CALLS)
+        limit = enterLimit(jsCtx, timeout)
+        with nogil:
+            jsResult = JSObjectCallAsFunction(jsCtx, jsFunction,
+                                              jsThisObject, argCount,
+                                              jsArgs, &jsError)
+        if jsError != NULL:
+            raise jsExceptionToPython(jsCtx, jsError)
+    finally:
+        if limit is not None:
+            limit.leave()
+        gcSafePoint(jsCtx)
+        if jsArgs != stackArgs:
+            free(jsArgs)
+
+    return jsResult
+
+
+cdef object callJSFunction(JSContextRef jsCtx, JSObjectRef jsFunction,
+                           JSObjectRef jsThisObject, object args):
+    """Call a JavaScript function with a tuple of Python arguments.
+
+    The GIL is released while the function runs."""
+    return jsToPython(jsCtx, callJSFunctionRaw(jsCtx, jsFunction,
+                                               jsThisObject, args))
+
+
+# Argument types for prepared calls.
+DEF ARG_ANY = 0
+DEF ARG_NUMBER = 1
+DEF ARG_STRING = 2
+DEF ARG_BOOLEAN = 3
+DEF ARG_OBJECT = 4
+
+# Maximum number of arguments of a prepared call.
+DEF PREPARED_MAX_ARGS = 16
+
+# Argument types accepted by ``prepare``, by name or Python type.
+_preparedArgTypes = {
+    None: ARG_ANY,
+    'any': ARG_ANY,
+    object: ARG_ANY,
+    'number': ARG_NUMBER,
+    int: ARG_NUMBER,
+    long: ARG_NUMBER,
+    float: ARG_NUMBER,
+    'string': ARG_STRING,
+    str: ARG_STRING,
+    unicode: ARG_STRING,
+    'boolean': ARG_BOOLEAN,
+    types.BooleanType: ARG_BOOLEAN,
+    'object': ARG_OBJECT,
+    }
+
+cdef class _PreparedCall:
+    """A JavaScript function prepared to be called with a fixed
+    argument signature. See the ``prepare`` method of
+    ``JSFunction``."""
+
+    # The wrapper of the function, which keeps it alive.
+    cdef object pyFunction
+
+    cdef JSContextRef jsCtx
+    cdef JSObjectRef jsFunction
+    cdef JSObjectRef jsThisObj
+    cdef int argCount
+    cdef int argTypes[PREPARED_MAX_ARGS]
+
+    cdef setup(self, _JSObject pyFunction, JSObjectRef jsThisObj,
+               object argTypes):
+        cdef int i
+
+        argTypes = list(argTypes)
+        if len(argTypes) > PREPARED_MAX_ARGS:
+            raise ValueError, "prepared calls take at most %d arguments" % \
+                PREPARED_MAX_ARGS
+        for i, argType in enumerate(argTypes):
+            try:
+                self.argTypes[i] = _preparedArgTypes[argType]
+            except (KeyError, TypeError):
+                raise ValueError, "invalid argument type %r" % (argType,)
+
+        self.pyFunction = pyFunction
+        self.jsCtx = pyFunction.jsCtx
+        self.jsFunction = pyFunction.jsObject
+        self.jsThisObj = jsThisObj
+        self.argCount = len(argTypes)
+
+    cdef JSValueRef convert(self, int i, object pyValue) except NULL:
+        cdef int argType = self.argTypes[i]
+
+        if argType == ARG_NUMBER:
+            return JSValueMakeNumber(self.jsCtx, pyValue)
+        elif argType == ARG_STRING:
+            return pyStringToJS(self.jsCtx, pyValue)
+        elif argType == ARG_BOOLEAN:
+            return JSValueMakeBoolean(self.jsCtx, pyValue)
+        elif argType == ARG_OBJECT:
+            if not isinstance(pyValue, _JSBaseObject):
+                raise TypeError, "argument %d must be a JavaScript " \
+                    "object" % (i + 1)
+            return pythonToJS(self.jsCtx, pyValue)
+        else:
+            return pythonToJS(self.jsCtx, pyValue)
+
+    def __call__(self, *args):
+        cdef JSValueRef jsArgs[PREPARED_MAX_ARGS]
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef JSObjectRef jsFunction = self.jsFunction
+        cdef JSObjectRef jsThisObj = self.jsThisObj
+        cdef size_t argCount = self.argCount
+        cdef JSValueRef jsResult
+        cdef JSValueRef jsError = NULL
+        cdef _ExecutionLimit limit
+        cdef int i
+
+        if len(args) != self.argCount:
+            raise TypeError, "prepared function takes exactly %d " \
+                "arguments (%d given)" % (self.argCount, len(args))
+        if (<_JSBaseObject>self.pyFunction).jsObject != jsFunction:
+            raise ReferenceError, "function released at the end of its scope"
+        for i in range(self.argCount):
+            jsArgs[i] = self.convert(i, args[i])
+
+        countStat(jsCtx, STAT_CALLS)
+        limit = enterLimit(jsCtx, None)
+        try:
+            with nogil:
+                jsResult = JSObjectCallAsFunction(jsCtx, jsFunction,
+                                                  jsThisObj, argCount,
+                                                  jsArgs, &jsError)
+            if jsError != NULL:
+                raise jsExceptionToPython(jsCtx, jsError)
+        finally:
+            if limit is not None:
+                limit.leave()
+            gcSafePoint(jsCtx)
+        return jsToPython(jsCtx, jsResult)
+
+
+cdef class _CallManyIterator:
+    """Call a JavaScript function once per row of arguments. See the
+    ``callMany`` method of ``JSFunction``."""
+
+    # The wrapper of the function, which keeps it alive.
+    cdef object pyFunction
+
+    cdef JSContextRef jsCtx
+    cdef JSObjectRef jsFunction
+    cdef JSObjectRef jsThisObj
+    cdef object rows
+    # Whether rows are single arguments instead of argument sequences.
+    cdef int single
+    cdef long chunk
+    cdef long rowIndex
+    cdef list results
+    cdef long position
+
+    cdef setup(self, _JSObject pyFunction, JSObjectRef jsThisObj,
+               object rows, int single, long chunk):
+        if chunk <= 0:
+            raise ValueError, "chunk size must be positive"
+        self.pyFunction = pyFunction
+        self.jsCtx = pyFunction.jsCtx
+        self.jsFunction = pyFunction.jsObject
+        self.jsThisObj = jsThisObj
+        self.rows = iter(rows)
+        self.single = single
+        self.chunk = chunk
+        self.rowIndex = 0
+        self.results = []
+        self.position = 0
+
+    cdef list callRows(self, long count):
+        """Call the function for the next ``count`` rows (all
+        remaining rows if ``count`` is negative) and return the list
+        of results.
+
+        Exceptions get a ``rowIndex`` attribute with the index of the
+        failing row."""
+        cdef list results = []
+
+        if count == 0:
+            return results
+        if (<_JSBaseObject>self.pyFunction).jsObject != self.jsFunction:
+            raise ReferenceError, "function released at the end of its scope"
+        for row in self.rows:
+            if self.single:
+                row = (row,)
+            try:
+                results.append(jsToPython(self.jsCtx, callJSFunctionRaw(
+                            self.jsCtx, self.jsFunction, self.jsThisObj,
+                            row)))
+            except Exception, e:
+                e.rowIndex = self.rowIndex
+                raise
+            self.rowIndex += 1
+            if len(results) == count:
+                break
+        return results
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        if self.position >= len(self.results):
+            self.results = self.callRows(self.chunk)
+            self.position = 0
+            if not self.results:
+                raise StopIteration
+        self.position += 1
+        return self.results[self.position - 1]
+
+    def next(self):
+        """Wrap the ``__next__`` method for backwards compatibility.
+        """
+        return self.__next__()
+
+
+cdef object callFunctionMany(_JSObject pyFunction, JSObjectRef jsThisObj,
+                             object rows, int single, object chunk):
+    cdef _CallManyIterator calls = _CallManyIterator()
+
+    if chunk is None:
+        calls.setup(pyFunction, jsThisObj, rows, single, 1)
+        return calls.callRows(-1)
+    calls.setup(pyFunction, jsThisObj, rows, single, chunk)
+    return calls
+
+
 cdef class _JSFunction(_JSObject):
     """Specialized wrapper class to make JavaScript functions callable
     from Python.
@@ -814,24 +2911,111 @@ cdef class _JSFunction(_JSObject):
     ``JSFunction`` class."""
 
     def __call__(self, *args):
-        cdef JSValueRef *jsArgs
-        cdef JSValueRef result
-        cdef JSObjectRef jsThisObject
+        return callJSFunction(self.jsCtx, self.jsObject, NULL, args)
+
+    def callWithTimeout(self, timeout, *args):
+        """Call this function, terminating it with a
+        ``JSTimeoutError`` if it runs for more than ``timeout``
+        seconds (see ``JSContext.timeout``)."""
+        return jsToPython(self.jsCtx, callJSFunctionRaw(
+                self.jsCtx, self.jsObject, NULL, args, timeout))
+
+    def callMany(self, rows, chunk=None):
+        """Call this function once for every sequence of arguments in
+        ``rows``.
+
+        The whole loop runs inside the extension module. If ``chunk``
+        is ``None`` the list of results is returned. Otherwise an
+        iterator is returned, which calls the function ``chunk`` rows
+        at a time as results are requested. If a call fails, the
+        exception raised has a ``rowIndex`` attribute with the index of
+        the failing row."""
+        return callFunctionMany(self, NULL, rows, False, chunk)
+
+    def map(self, iterable, chunk=None):
+        """Call this function once for every element of ``iterable``,
+        passed as only argument. See ``callMany``."""
+        return callFunctionMany(self, NULL, iterable, True, chunk)
+
+    def prepare(self, argTypes):
+        """Return a callable that calls this function with arguments
+        of the types in ``argTypes``.
+
+        Types are given as ``'number'``, ``'string'``, ``'boolean'``,
+        ``'object'`` (a wrapped JavaScript object) or ``'any'``, or as
+        the equivalent Python types. Since every argument is converted
+        directly according to its type, the returned callable has much
+        less overhead per call than the function itself. It accepts
+        exactly ``len(argTypes)`` arguments."""
+        cdef _PreparedCall call = _PreparedCall()
+        call.setup(self, NULL, argTypes)
+        return call
+
+    def callAsync(self, *args):
+        """Call this function in the executor thread of its context
+        group and return a ``JSFuture`` for the result (see
+        ``JSContext.evaluateAsync``)."""
+        return groupExecutor(self.jsCtx).submit(self, *args)
+
+    def callJSON(self, jsonArgs, indent=0):
+        """Call this function with arguments given as JSON text, and
+        return the result as JSON text.
+
+        ``jsonArgs`` must be the JSON representation of an array
+        containing the arguments. Both the arguments and the result
+        are handled by the engine's native JSON parser and serializer,
+        so that large documents cross the Python/JavaScript boundary
+        as a single string. ``None`` is returned if the result has no
+        JSON representation."""
+        cdef JSValueRef jsArgList
+        cdef JSValueRef jsArrayCtor
+        cdef JSValueRef *jsArgs = NULL
+        cdef JSValueRef jsResult
         cdef JSValueRef jsError = NULL
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef JSObjectRef jsObject = self.jsObject
+        cdef _ExecutionLimit limit = None
+        cdef unsigned argCount
+        cdef unsigned i
+
+        jsArgList = jsonToJS(self.jsCtx, jsonArgs)
+        jsArrayCtor = JSObjectGetProperty(jsCtx,
+                                          JSContextGetGlobalObject(jsCtx),
+                                          jsArrayName, NULL)
+        if not JSValueIsObject(jsCtx, jsArgList) or \
+                jsArrayCtor == NULL or \
+                not JSValueIsObject(jsCtx, jsArrayCtor) or \
+                not JSValueIsInstanceOfConstructor(
+                    jsCtx, jsArgList, <JSObjectRef>jsArrayCtor, NULL):
+            raise ValueError, "JSON arguments must be an array"
+        argCount = <unsigned>JSValueToNumber(
+            self.jsCtx,
+            JSObjectGetProperty(self.jsCtx, jsArgList, jsLengthName, NULL),
+            NULL)
+
+        if argCount > 0:
+            jsArgs = <JSValueRef *>malloc(argCount * sizeof(JSValueRef))
+            if jsArgs == NULL:
+                raise MemoryError
+        try:
+            for i in range(argCount):
+                jsArgs[i] = JSObjectGetPropertyAtIndex(self.jsCtx, jsArgList,
+                                                       i, NULL)
+            countStat(jsCtx, STAT_CALLS)
+            limit = enterLimit(jsCtx, None)
+            with nogil:
+                jsResult = JSObjectCallAsFunction(jsCtx, jsObject, NULL,
+                                                  argCount, jsArgs,
+                                                  &jsError)
+            if jsError != NULL:
+                raise jsExceptionToPython(self.jsCtx, jsError)
+        finally:
+            if limit is not None:
+                limit.leave()
+            gcSafePoint(jsCtx)
+            free(jsArgs)
 
-        if len(args):
-            jsArgs = <JSValueRef *>malloc(len(args) * sizeof(JSValueRef))
-        else:
-            jsArgs = NULL
-        for i, arg in enumerate(args):
-            jsArgs[i] = pythonToJS(self.jsCtx, arg)
-        result = JSObjectCallAsFunction(self.jsCtx, self.jsObject,
-                                        NULL, len(args), jsArgs,
-                                        &jsError)
-        free(jsArgs)
-        if jsError != NULL:
-            raise jsExceptionToPython(self.jsCtx, jsError)
-        return jsToPython(self.jsCtx, result)
+        return jsonFromJS(self.jsCtx, jsResult, indent)
 
 
 class JSFunction(_JSFunction, collections.MutableMapping):
@@ -868,26 +3052,50 @@ cdef class _JSBoundMethod(_JSObject):
         self.jsThisObj = jsThisObj
 
     def __call__(self, *args):
-        cdef JSValueRef *jsArgs
-        cdef JSValueRef result
-        cdef JSValueRef jsError = NULL
-
-        if len(args):
-            jsArgs = <JSValueRef *>malloc(len(args) * sizeof(JSValueRef))
-        else:
-            jsArgs = NULL
-        for i, arg in enumerate(args):
-            jsArgs[i] = pythonToJS(self.jsCtx, arg)
-        result = JSObjectCallAsFunction(self.jsCtx, self.jsObject,
-                                        self.jsThisObj, len(args), jsArgs,
-                                        &jsError)
-        free(jsArgs)
-        if jsError != NULL:
-            raise jsExceptionToPython(self.jsCtx, jsError)
-        return jsToPython(self.jsCtx, result)
+        return callJSFunction(self.jsCtx, self.jsObject, self.jsThisObj,
+                              args)
+
+    def callWithTimeout(self, timeout, *args):
+        """Call this method, terminating it with a ``JSTimeoutError``
+        if it runs for more than ``timeout`` seconds (see
+        ``JSContext.timeout``)."""
+        return jsToPython(self.jsCtx, callJSFunctionRaw(
+                self.jsCtx, self.jsObject, self.jsThisObj, args, timeout))
+
+    def callMany(self, rows, chunk=None):
+        """Call this method once for every sequence of arguments in
+        ``rows`` (see ``JSFunction.callMany``)."""
+        return callFunctionMany(self, self.jsThisObj, rows, False, chunk)
+
+    def map(self, iterable, chunk=None):
+        """Call this method once for every element of ``iterable``
+        (see ``JSFunction.map``)."""
+        return callFunctionMany(self, self.jsThisObj, iterable, True, chunk)
+
+    def prepare(self, argTypes):
+        """Return a callable that calls this method with arguments of
+        the types in ``argTypes`` (see ``JSFunction.prepare``)."""
+        cdef _PreparedCall call = _PreparedCall()
+        call.setup(self, self.jsThisObj, argTypes)
+        return call
+
+    def callAsync(self, *args):
+        """Call this method in the executor thread of its context
+        group and return a ``JSFuture`` for the result (see
+        ``JSContext.evaluateAsync``)."""
+        return groupExecutor(self.jsCtx).submit(self, *args)
+
+    cdef release(self):
+        with nogil:
+            JSValueUnprotect(self.jsCtx, self.jsThisObj)
+        _JSObject.release(self)
+        self.jsThisObj = _releasedObj
+        with nogil:
+            JSValueProtect(self.jsCtx, self.jsThisObj)
 
     def __dealloc__(self):
-        JSValueUnprotect(self.jsCtx, self.jsThisObj)
+        with nogil:
+            JSValueUnprotect(self.jsCtx, self.jsThisObj)
 
 
 class JSBoundMethod(_JSBoundMethod, collections.MutableMapping):
@@ -903,6 +3111,314 @@ cdef makeJSBoundMethod(JSContextRef jsCtx, JSObjectRef jsObject,
     return obj
 
 
+cdef class JSScript:
+    """A JavaScript program that can be run repeatedly.
+
+    Scripts are obtained through the ``compile`` method of
+    ``JSContext``. Their syntax is checked once when they are created,
+    and the source text is converted into a JavaScript string only
+    once, no matter how many times the script is run. Call the script
+    object to run it.
+    """
+
+    cdef JSContextRef jsCtx
+    cdef JSStringRef jsScript
+    cdef JSStringRef jsSourceURL
+    cdef int startingLineNumber
+
+    def __init__(self):
+        self.jsCtx = NULL
+        self.jsScript = NULL
+        self.jsSourceURL = NULL
+
+    cdef setup(self, JSContextRef jsCtx, object source, object sourceURL,
+               int startingLineNumber):
+        cdef JSValueRef jsException = NULL
+
+        self.jsCtx = jsCtx
+        JSGlobalContextRetain(self.jsCtx)
+        self.jsScript = createJSStringFromPython(source)
+        if sourceURL is not None:
+            self.jsSourceURL = createJSStringFromPython(sourceURL)
+        self.startingLineNumber = startingLineNumber
+
+        if not JSCheckScriptSyntax(self.jsCtx, self.jsScript,
+                                   self.jsSourceURL, startingLineNumber,
+                                   &jsException):
+            raise jsExceptionToPython(self.jsCtx, jsException)
+
+    def __call__(self, thisObject=None, timeout=None):
+        cdef JSValueRef jsException = NULL
+        cdef JSObjectRef jsThisObject = NULL
+        cdef JSValueRef jsValue
+        cdef _ExecutionLimit limit
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef JSStringRef jsScript = self.jsScript
+        cdef JSStringRef jsSourceURL = self.jsSourceURL
+        cdef int startingLineNumber = self.startingLineNumber
+
+        if thisObject is not None:
+            jsThisObject = JSValueToObject(self.jsCtx,
+                                           pythonToJS(self.jsCtx, thisObject),
+                                           &jsException)
+            if jsException != NULL:
+                raise jsExceptionToPython(self.jsCtx, jsException)
+
+        countStat(jsCtx, STAT_EVALUATIONS)
+        limit = enterLimit(jsCtx, timeout)
+        try:
+            with nogil:
+                jsValue = JSEvaluateScript(jsCtx, jsScript, jsThisObject,
+                                           jsSourceURL, startingLineNumber,
+                                           &jsException)
+            if jsException != NULL:
+                raise jsExceptionToPython(self.jsCtx, jsException)
+        finally:
+            if limit is not None:
+                limit.leave()
+            gcSafePoint(jsCtx)
+
+        return jsToPython(self.jsCtx, jsValue)
+
+    def __dealloc__(self):
+        if self.jsScript != NULL:
+            JSStringRelease(self.jsScript)
+        if self.jsSourceURL != NULL:
+            JSStringRelease(self.jsSourceURL)
+        if self.jsCtx != NULL:
+            with nogil:
+                JSGlobalContextRelease(self.jsCtx)
+
+
+#
+# Execution time limits
+#
+
+# Time limits are enforced with the watchdog of the context groups:
+# while a group runs JavaScript, ``shouldTerminate`` is called every
+# WATCHDOG_PERIOD seconds on the thread running it, and terminates the
+# script when the deadline of that thread has passed or its call has
+# been interrupted. Limits are kept per thread, because contexts in a
+# group can be used from several threads, and only one of them runs
+# JavaScript at any time. The watchdog is installed by a
+# ``_GroupWatchdog`` object, which exists as long as some context in
+# the group has a default timeout or a limited call is running.
+
+# Seconds between watchdog checks.
+DEF WATCHDOG_PERIOD = 0.02
+
+ctypedef struct ExecutionLimitState:
+    # Absolute deadline of the running call, 0 for none.
+    double deadline
+    int interrupted
+    # Whether the watchdog terminated the script.
+    int terminated
+
+# Default timeouts of the contexts, indexed by global object (cast to
+# long). A timeout of 0 marks interruptible contexts without a time
+# limit.
+cdef object _ctxTimeouts = {}
+
+# Watchdogs of the context groups, indexed by group (cast to long).
+cdef object _groupWatchdogs = weakref.WeakValueDictionary()
+cdef object _groupWatchdogsLock = threading.Lock()
+
+# Thread-local key holding the state of the limited call running in
+# the current thread, if any.
+cdef int _limitKey = PyThread_create_key()
+
+# Per thread execution limits, see ``threadLimit``.
+cdef object _threadLimits = threading.local()
+
+cdef bool shouldTerminate(JSContextRef jsCtx, void *context) nogil:
+    """Watchdog callback, called from JavaScript without acquiring
+    the GIL."""
+    cdef ExecutionLimitState *state
+
+    state = <ExecutionLimitState *>PyThread_get_key_value(_limitKey)
+    if state == NULL:
+        return False
+    if state.interrupted or \
+            (state.deadline > 0 and wallTime() >= state.deadline):
+        state.terminated = 1
+        return True
+    return False
+
+
+cdef class _GroupWatchdog:
+    """The watchdog of a context group."""
+
+    # Make it possible to have weak references to this object.
+    cdef object __weakref__
+
+    cdef JSContextGroupRef jsGroup
+    # Limited calls running in the group, in all threads.
+    cdef list calls
+
+    cdef setup(self, JSContextRef jsCtx):
+        cdef JSContextGroupRef jsGroup
+
+        if not PyJSC_HaveExecutionTimeLimit():
+            raise NotImplementedError, "execution time limits are not " \
+                "supported by this version of JavaScriptCore"
+        jsGroup = JSContextGroupRetain(JSContextGetGroup(jsCtx))
+        self.jsGroup = jsGroup
+        self.calls = []
+        with nogil:
+            PyJSC_ContextGroupSetExecutionTimeLimit(
+                jsGroup, WATCHDOG_PERIOD, shouldTerminate, NULL)
+
+    def __dealloc__(self):
+        cdef JSContextGroupRef jsGroup = self.jsGroup
+
+        if jsGroup == NULL:
+            return
+        with nogil:
+            PyJSC_ContextGroupClearExecutionTimeLimit(jsGroup)
+            JSContextGroupRelease(jsGroup)
+
+
+cdef class _LimitedCall:
+    """A limited call running in some thread."""
+
+    # Execution limit of the thread, and watchdog of the group.
+    cdef _ExecutionLimit limit
+    cdef _GroupWatchdog watchdog
+    # Deadline of the enclosing calls.
+    cdef double savedDeadline
+    # Whether this call was interrupted.
+    cdef int interrupted
+
+
+cdef class _ExecutionLimit:
+    """The execution limit of a thread."""
+
+    cdef ExecutionLimitState state
+    # Limited calls running in this thread, innermost last.
+    cdef list calls
+
+    cdef enter(self, _GroupWatchdog watchdog, double timeout):
+        """Start a limited call. A ``timeout`` of 0 means no time
+        limit. Nested calls can't extend the deadline of the calls
+        they run in."""
+        cdef _LimitedCall call = _LimitedCall()
+        cdef double deadline
+
+        if not self.calls:
+            self.state.deadline = 0
+            self.state.interrupted = 0
+            self.state.terminated = 0
+            PyThread_delete_key_value(_limitKey)
+            PyThread_set_key_value(_limitKey, &self.state)
+        call.limit = self
+        call.watchdog = watchdog
+        call.savedDeadline = self.state.deadline
+        if timeout > 0:
+            deadline = wallTime() + timeout
+            if self.state.deadline == 0 or deadline < self.state.deadline:
+                self.state.deadline = deadline
+        self.calls.append(call)
+        watchdog.calls.append(call)
+
+    cdef leave(self):
+        """End a limited call."""
+        cdef _LimitedCall call = self.calls.pop()
+
+        call.watchdog.calls.remove(call)
+        self.state.deadline = call.savedDeadline
+        if not self.calls:
+            PyThread_delete_key_value(_limitKey)
+            self.state.interrupted = 0
+            self.state.terminated = 0
+            return
+
+        # Interrupting an inner call (possibly in another group) must
+        # not terminate the calls it runs in.
+        self.state.interrupted = 0
+        for call in self.calls:
+            if call.interrupted:
+                self.state.interrupted = 1
+                break
+
+    cdef interrupt(self, _LimitedCall call):
+        """Interrupt ``call``, and the calls running inside it."""
+        call.interrupted = 1
+        self.state.interrupted = 1
+
+
+cdef _GroupWatchdog groupWatchdog(JSContextRef jsCtx):
+    """Return the watchdog of the group of ``jsCtx``, installing it if
+    necessary."""
+    cdef _GroupWatchdog watchdog
+
+    key = <long>JSContextGetGroup(jsCtx)
+    with _groupWatchdogsLock:
+        watchdog = _groupWatchdogs.get(key)
+        if watchdog is None:
+            watchdog = _GroupWatchdog()
+            watchdog.setup(jsCtx)
+            _groupWatchdogs[key] = watchdog
+    return watchdog
+
+cdef _ExecutionLimit threadLimit():
+    """Return the execution limit of the current thread."""
+    cdef _ExecutionLimit limit
+
+    try:
+        return _threadLimits.limit
+    except AttributeError:
+        limit = _ExecutionLimit()
+        limit.calls = []
+        _threadLimits.limit = limit
+        return limit
+
+cdef _ExecutionLimit enterLimit(JSContextRef jsCtx, object timeout):
+    """Prepare a call into JavaScript in context ``jsCtx`` limited to
+    ``timeout`` seconds (``None`` for the default of the context).
+
+    Return the execution limit of the thread, whose ``leave`` method
+    must be called when the call ends, or ``None`` if the call is not
+    limited."""
+    cdef _ExecutionLimit limit
+
+    if timeout is None:
+        if not _ctxTimeouts:
+            return None
+        timeout = _ctxTimeouts.get(<long>JSContextGetGlobalObject(jsCtx))
+        if timeout is None:
+            return None
+    elif timeout <= 0:
+        raise ValueError, "timeout must be positive"
+
+    limit = threadLimit()
+    limit.enter(groupWatchdog(jsCtx), timeout)
+    return limit
+
+
+# Default number of functions cached by JSContext.function.
+DEF FUNCTION_CACHE_DEFAULT_SIZE = 128
+
+
+cdef class JSContextGroup:
+    """Wrapper class for JavaScriptCore context groups.
+
+    Contexts in the same group share a single virtual machine and
+    heap, so that JavaScript objects can be passed directly from one
+    to another. Pass a group as the ``group`` argument of the
+    ``JSContext`` constructor to create a context in it. Contexts
+    created without a group get a group of their own.
+    """
+
+    cdef JSContextGroupRef jsGroup
+
+    def __cinit__(self):
+        self.jsGroup = JSContextGroupCreate()
+
+    def __dealloc__(self):
+        with nogil:
+            JSContextGroupRelease(self.jsGroup)
+
+
 cdef class JSContext:
     """Wrapper class for JavaScriptCore context objects.
 
@@ -915,23 +3431,82 @@ cdef class JSContext:
     full access to it from Python.
     """
 
+    # Make it possible to have weak references to this object.
+    cdef object __weakref__
+
     cdef JSContextRef jsCtx
     cdef object pyCtxExtern
+    cdef JSContextGroup pyGroup
+
+    # Cache for the ``function`` method. Keys are (parameters, body)
+    # pairs, values are the corresponding function wrappers. The
+    # dictionary is kept in least recently used order.
+    cdef object functionCache
+    cdef public int functionCacheSize
+    cdef long functionCacheHits
+    cdef long functionCacheMisses
+
+    # Executor for asynchronous operations, kept alive as long as the
+    # context exists.
+    cdef object executor
+
+    # Watchdog of the group, kept alive while this context has a
+    # default timeout or is interruptible.
+    cdef _GroupWatchdog watchdog
+
+    # Boundary statistics for this context, also registered in
+    # ``_contextStats``.
+    cdef BoundaryStats *stats
+
+    def __cinit__(self, pyCtxExtern=None, group=None):
+        self.functionCache = collections.OrderedDict()
+        self.functionCacheSize = FUNCTION_CACHE_DEFAULT_SIZE
+        self.functionCacheHits = 0
+        self.functionCacheMisses = 0
 
-    def __cinit__(self, pyCtxExtern=None):
         if pyCtxExtern is None:
-            # Create a new context.
-            self.jsCtx = JSGlobalContextCreate(NULL)
+            if group is None:
+                # Create a new context.
+                self.jsCtx = JSGlobalContextCreate(NULL)
+            else:
+                # Create a new context in the given group.
+                self.jsCtx = JSGlobalContextCreateInGroup(
+                    (<JSContextGroup?>group).jsGroup, NULL)
             self.pyCtxExtern = None
+            self.pyGroup = group
         else:
+            if group is not None:
+                raise ValueError, "a group cannot be specified for " \
+                    "an external context"
+
             # Extract the actual context object.
             self.jsCtx = <JSContextRef>PyCObject_AsVoidPtr(pyCtxExtern)
             JSGlobalContextRetain(self.jsCtx)
             self.pyCtxExtern = pyCtxExtern
 
-    def __init__(self, pyCtxExtern=None):
+        self.stats = <BoundaryStats *>calloc(1, sizeof(BoundaryStats))
+        if self.stats == NULL:
+            raise MemoryError
+        wrapperTablePut(&_contextStats,
+                        <void *>JSContextGetGlobalObject(self.jsCtx),
+                        <void *>self.stats)
+        _liveContexts[id(self)] = self
+
+    def __init__(self, pyCtxExtern=None, group=None):
         pass
 
+    property group:
+        """The context group this context was created in, or ``None``
+        if no group was specified."""
+
+        def __get__(self):
+            return self.pyGroup
+
+    def sameGroup(self, JSContext other):
+        """Return whether this context and ``other`` belong to the
+        same context group, and can thus share JavaScript objects."""
+        return JSContextGetGroup(self.jsCtx) == JSContextGetGroup(other.jsCtx)
+
     property globalObject:
         """Global object for this context."""
 
@@ -939,30 +3514,762 @@ cdef class JSContext:
             return jsToPython(self.jsCtx,
                               JSContextGetGlobalObject(self.jsCtx))
 
+    def loadsJSON(self, text):
+        """Parse the JSON document ``text`` in this context and return
+        the result.
+
+        The text is passed as a single string to the engine's native
+        JSON parser, and the result is returned as usual (objects and
+        arrays as wrappers, see also ``toPython``). A ``ValueError`` is
+        raised if ``text`` is not valid JSON."""
+        return jsToPython(self.jsCtx, jsonToJS(self.jsCtx, text))
+
+    def dumpsJSON(self, value, indent=0):
+        """Serialize ``value`` as JSON text using the engine's native
+        serializer.
+
+        ``value`` is typically a wrapped JavaScript object, but any
+        Python value is accepted and converted as usual first (see
+        also ``toJS``). ``None`` is returned for values without a JSON
+        representation."""
+        return jsonFromJS(self.jsCtx, pythonToJS(self.jsCtx, value), indent)
+
+    property copyContainers:
+        """Whether Python lists, tuples and dictionaries are copied
+        into native JavaScript arrays and objects (instead of being
+        wrapped) when they are passed to this context.
+
+        See also the ``toJS`` function."""
+
+        def __get__(self):
+            return <long>JSContextGetGlobalObject(self.jsCtx) in \
+                _copyContainersCtxs
+
+        def __set__(self, value):
+            if value:
+                _copyContainersCtxs.add(
+                    <long>JSContextGetGlobalObject(self.jsCtx))
+            else:
+                _copyContainersCtxs.discard(
+                    <long>JSContextGetGlobalObject(self.jsCtx))
+
     def evaluateScript(self, script, thisObject=None, sourceURL=None,
-                       startingLineNumber=1):
+                       startingLineNumber=1, timeout=None):
         cdef JSValueRef jsException = NULL
         cdef JSValueRef jsValue
+        cdef JSContextRef jsCtx = self.jsCtx
+        cdef int lineNumber = startingLineNumber
+        cdef _ExecutionLimit limit = None
 
         cdef JSStringRef jsScript = createJSStringFromPython(script)
         try:
-            jsValue = JSEvaluateScript(self.jsCtx, jsScript,
-                                       <JSObjectRef>NULL,
-                                       <JSStringRef>NULL,
-                                       startingLineNumber,
-                                       &jsException)
+            countStat(jsCtx, STAT_EVALUATIONS)
+            limit = enterLimit(jsCtx, timeout)
+            with nogil:
+                jsValue = JSEvaluateScript(jsCtx, jsScript,
+                                           <JSObjectRef>NULL,
+                                           <JSStringRef>NULL,
+                                           lineNumber,
+                                           &jsException)
             if jsException != NULL:
                 raise jsExceptionToPython(self.jsCtx, jsException)
         finally:
+            if limit is not None:
+                limit.leave()
+            gcSafePoint(jsCtx)
             JSStringRelease(jsScript)
 
         return jsToPython(self.jsCtx, jsValue)
 
+    def evaluateAsync(self, script, sourceURL=None, startingLineNumber=1):
+        """Evaluate ``script`` asynchronously and return a
+        ``JSFuture`` for the result.
+
+        Asynchronous operations run one after the other in a thread
+        shared by all contexts in the same context group, so that they
+        don't block the calling thread. If the result is a promise,
+        the future is settled only when the promise is."""
+        if self.executor is None:
+            self.executor = groupExecutor(self.jsCtx)
+        return self.executor.submit(self.evaluateScript, script, None,
+                                    sourceURL, startingLineNumber)
+
+    def exportFunction(self, name, pyFunction, argConverters=None):
+        """Make the Python callable ``pyFunction`` available to
+        JavaScript as a global function called ``name``, and return the
+        function.
+
+        Contrary to callables passed as values (which are wrapped
+        into generic ``PythonObject`` proxies), the function is a
+        native JavaScript function: it has no Python properties and it
+        passes its arguments straight to the callable.
+
+        ``argConverters`` optionally specifies how leading arguments
+        are converted: one entry per argument, either the name of an
+        argument type as accepted by ``JSFunction.prepare`` (e.g.
+        ``'number'``, so that JavaScript values are converted to
+        numbers as by the JavaScript ``Number`` function), ``None``
+        for the default conversion, or a callable applied to the
+        argument after the default conversion. Python types are
+        callables here, ``int`` truncates numbers for instance,
+        whereas ``prepare`` maps them to argument types. If ``name`` is ``None``
+        the function is only returned."""
+        cdef JSObjectRef jsFunction
+        cdef JSStringRef jsName
+
+        jsFunction = makeExportedFunction(self.jsCtx, name, pyFunction,
+                                          argConverters)
+        if name is not None:
+            jsName = createJSNameFromPython(name)
+            try:
+                JSObjectSetProperty(self.jsCtx,
+                                    JSContextGetGlobalObject(self.jsCtx),
+                                    jsName, jsFunction,
+                                    kJSPropertyAttributeNone, NULL)
+            finally:
+                JSStringRelease(jsName)
+        return jsToPython(self.jsCtx, jsFunction)
+
+    def compile(self, source, sourceURL=None, startingLineNumber=1):
+        """Check the syntax of ``source`` and return it as a
+        ``JSScript`` object.
+
+        A ``JSException`` is raised if the source contains syntax
+        errors."""
+        cdef JSScript script = JSScript()
+        script.setup(self.jsCtx, source, sourceURL, startingLineNumber)
+        return script
+
+    def function(self, params, body):
+        """Return a JavaScript function with parameters ``params``
+        and body ``body``.
+
+        ``params`` is either a sequence of parameter names or a string
+        with comma-separated names. Functions are kept in a least
+        recently used cache of ``functionCacheSize`` entries, so that
+        requesting the same function again does not parse it again.
+        """
+        if isinstance(params, types.StringTypes):
+            paramList = params
+        else:
+            paramList = ', '.join(params)
+        key = (paramList, body)
+
+        try:
+            fn = self.functionCache.pop(key)
+            self.functionCacheHits += 1
+        except KeyError:
+            self.functionCacheMisses += 1
+            fn = self.evaluateScript('(function (%s) {\n%s\n})' %
+                                     (paramList, body))
+            while self.functionCache and \
+                    len(self.functionCache) >= self.functionCacheSize:
+                self.functionCache.popitem(last=False)
+
+        if self.functionCacheSize > 0:
+            self.functionCache[key] = fn
+        return fn
+
+    def evaluate(self, expr, **bindings):
+        """Evaluate the JavaScript expression ``expr`` with the
+        keyword arguments available as variables.
+
+        The expression is wrapped into a function taking the binding
+        names as parameters (see the ``function`` method), and the
+        values are passed as arguments to it. This way, evaluating the
+        same expression with different values parses it only once."""
+        names = sorted(bindings)
+        # The newline ends any comment at the end of the expression.
+        fn = self.function(names, 'return (%s\n);' % expr)
+        return fn(*[bindings[name] for name in names])
+
+    def functionCacheStats(self):
+        """Return statistics about the cache used by the ``function``
+        and ``evaluate`` methods."""
+        return {'size': self.functionCacheSize,
+                'count': len(self.functionCache),
+                'hits': self.functionCacheHits,
+                'misses': self.functionCacheMisses,
+                }
+
+    def boundaryStats(self, reset=False):
+        """Return the boundary statistics of this context. See the
+        ``boundaryStats`` function for a description of the counters.
+
+        Strings are created independently of any context, so that
+        ``stringsCreated`` is only counted globally."""
+        return boundaryStatsDict(self.stats, reset)
+
+    def collectGarbage(self):
+        """Run the JavaScript garbage collector on the heap of this
+        context's group.
+
+        The engine may treat this as a hint and defer part of the
+        work. See also ``setGCPolicy``."""
+        collectGarbage(self.jsCtx)
+
+    def heapStats(self):
+        """Return statistics about the JavaScript heap of this
+        context's group.
+
+        ``wrappedJSObjects`` and ``wrappedPyObjects`` are the numbers
+        of cached wrappers in the group, ``exportedFunctions`` is the
+        number of live functions created by ``exportFunction`` and
+        ``collections`` is the number of collections requested by
+        this module, both in all groups.
+        When the engine exports its memory usage statistics, they are
+        included as well (``heapSize``, ``heapCapacity``,
+        ``objectCount``, ``protectedObjectCount``, etc.)."""
+        cdef _GroupWrappers wrappers = groupWrappers(self.jsCtx, False)
+        cdef JSObjectRef jsStats
+
+        stats = {'wrappedJSObjects': 0,
+                 'wrappedPyObjects': 0,
+                 'exportedFunctions': _exportedFunctions.count,
+                 'collections': _gcCollections,
+                 }
+        if wrappers is not None:
+            stats['wrappedJSObjects'] = wrappers.jsObjs.count
+            stats['wrappedPyObjects'] = wrappers.pyObjs.count
+
+        jsStats = PyJSC_GetMemoryUsageStatistics(self.jsCtx)
+        if jsStats != NULL:
+            for name, value in jsToPython(self.jsCtx, jsStats).items():
+                if isinstance(value, (int, long, float)):
+                    stats[name] = value
+                elif isinstance(value, _JSObject):
+                    stats[name] = dict(value.items())
+        return stats
+
+    property timeout:
+        """Default time limit, in seconds, for scripts evaluated in this
+        context and calls to its functions, or ``None`` for no limit.
+
+        Scripts exceeding their limit are terminated, and a
+        ``JSTimeoutError`` is raised. The limit can be overridden
+        with the ``timeout`` argument of ``evaluateScript`` and
+        ``JSScript`` calls, and the ``callWithTimeout`` method of
+        functions. Limits are checked every few milliseconds, and
+        time spent in Python callbacks counts as well.
+
+        Time limits rely on a private JavaScriptCore function. A
+        ``NotImplementedError`` is raised if it isn't available."""
+
+        def __get__(self):
+            return _ctxTimeouts.get(
+                <long>JSContextGetGlobalObject(self.jsCtx)) or None
+
+        def __set__(self, value):
+            key = <long>JSContextGetGlobalObject(self.jsCtx)
+            if value is None:
+                if _ctxTimeouts.get(key):
+                    del _ctxTimeouts[key]
+                    self.watchdog = None
+                return
+            if value <= 0:
+                raise ValueError, "timeout must be positive"
+            self.watchdog = groupWatchdog(self.jsCtx)
+            _ctxTimeouts[key] = float(value)
+
+    property interruptible:
+        """Whether scripts evaluated in this context and calls to its
+        functions can be terminated with ``interrupt``, even if they
+        have no time limit. Calls with a time limit are always
+        interruptible."""
+
+        def __get__(self):
+            return <long>JSContextGetGlobalObject(self.jsCtx) in _ctxTimeouts
+
+        def __set__(self, value):
+            key = <long>JSContextGetGlobalObject(self.jsCtx)
+            if value:
+                self.watchdog = groupWatchdog(self.jsCtx)
+                _ctxTimeouts.setdefault(key, 0)
+            elif _ctxTimeouts.get(key) == 0:
+                del _ctxTimeouts[key]
+                self.watchdog = None
+
+    def interrupt(self):
+        """Terminate the scripts currently running in this context's
+        group that were started with a time limit or in an
+        interruptible context (see ``timeout`` and
+        ``interruptible``). ``JSTimeoutError`` is raised in the threads
+        running them, with its ``interrupted`` attribute set.
+
+        Scripts can only be interrupted if they were started that way,
+        a ``ValueError`` is raised if this context isn't interruptible
+        and no limited call is running in its group.
+
+        This method can be called from any thread, and doesn't wait
+        for the scripts to end."""
+        cdef _GroupWatchdog watchdog
+        cdef _LimitedCall call
+
+        watchdog = _groupWatchdogs.get(<long>JSContextGetGroup(self.jsCtx))
+        if watchdog is None or not watchdog.calls:
+            if <long>JSContextGetGlobalObject(self.jsCtx) not in \
+                    _ctxTimeouts:
+                raise ValueError, "context is not interruptible, set " \
+                    "its interruptible or timeout property first"
+            return
+        for call in list(watchdog.calls):
+            call.limit.interrupt(call)
+
+    def scope(self):
+        """Return a new handle scope for this context, to be used in a
+        ``with`` statement. See ``JSScope``."""
+        cdef JSScope scope = JSScope()
+        scope.setup(self)
+        return scope
+
     def getCtx(self):
         return self.pyCtxExtern
 
     def __dealloc__(self):
-        JSGlobalContextRelease(self.jsCtx)
+        if self.stats != NULL:
+            if self.jsCtx != NULL:
+                wrapperTableRemove(&_contextStats,
+                                   <void *>JSContextGetGlobalObject(self.jsCtx),
+                                   <void *>self.stats)
+            free(self.stats)
+        if self.jsCtx == NULL:
+            return
+        _copyContainersCtxs.discard(<long>JSContextGetGlobalObject(self.jsCtx))
+        _ctxTimeouts.pop(<long>JSContextGetGlobalObject(self.jsCtx), None)
+        with nogil:
+            JSGlobalContextRelease(self.jsCtx)
+
+
+#
+# Handle scopes
+#
+
+# Wrappers keep their JavaScript objects protected, and their contexts
+# retained, until they are deallocated. Scopes record the wrappers
+# created while they are active and release them all when they end,
+# so that large numbers of temporary objects don't have to wait for
+# the Python garbage collector. Released wrappers are left pointing to
+# an object in a separate context, which throws a ReferenceError on
+# any access.
+
+# Number of active scopes, in all threads.
+cdef int _activeScopes = 0
+
+# Stacks of active scopes, per thread.
+_scopeStacks = threading.local()
+
+# Replacement context and object for released wrappers, created when
+# the first scope is entered, and the exception thrown by the object.
+cdef JSContextRef _releasedCtx = NULL
+cdef JSObjectRef _releasedObj = NULL
+cdef JSValueRef _releasedError = NULL
+
+_releasedErrorScript = u"""
+new ReferenceError('JavaScript object released at the end of its scope')
+"""
+
+# Callbacks of the replacement object, which all throw
+# ``_releasedError``. They are called from JavaScript without acquiring
+# the GIL, and must not use any Python objects.
+
+cdef JSValueRef releasedGetProperty(JSContextRef jsCtx,
+                                    JSObjectRef jsObj,
+                                    JSStringRef jsPropertyName,
+                                    JSValueRef* jsExc) nogil:
+    jsExc[0] = _releasedError
+    return NULL
+
+cdef bool releasedSetProperty(JSContextRef jsCtx,
+                              JSObjectRef jsObj,
+                              JSStringRef jsPropertyName,
+                              JSValueRef jsValue,
+                              JSValueRef* jsExc) nogil:
+    jsExc[0] = _releasedError
+    return False
+
+cdef bool releasedDeleteProperty(JSContextRef jsCtx,
+                                 JSObjectRef jsObj,
+                                 JSStringRef jsPropertyName,
+                                 JSValueRef* jsExc) nogil:
+    jsExc[0] = _releasedError
+    return False
+
+cdef JSValueRef releasedCallAsFunction(JSContextRef jsCtx,
+                                       JSObjectRef jsObj,
+                                       JSObjectRef jsThisObj,
+                                       size_t argumentCount,
+                                       JSValueRef jsArgs[],
+                                       JSValueRef* jsExc) nogil:
+    jsExc[0] = _releasedError
+    return NULL
+
+cdef JSObjectRef releasedCallAsConstructor(JSContextRef jsCtx,
+                                           JSObjectRef jsObj,
+                                           size_t argumentCount,
+                                           JSValueRef jsArgs[],
+                                           JSValueRef* jsExc) nogil:
+    jsExc[0] = _releasedError
+    return NULL
+
+# Class definition structure for the replacement object.
+cdef JSClassDefinition releasedClassDef = kJSClassDefinitionEmpty
+releasedClassDef.className = 'ReleasedObject'
+releasedClassDef.getProperty = releasedGetProperty
+releasedClassDef.setProperty = releasedSetProperty
+releasedClassDef.deleteProperty = releasedDeleteProperty
+releasedClassDef.callAsFunction = releasedCallAsFunction
+releasedClassDef.callAsConstructor = releasedCallAsConstructor
+
+cdef JSClassRef releasedClass = JSClassCreate(&releasedClassDef)
+
+cdef int setupReleasedObject() except -1:
+    global _releasedCtx, _releasedObj, _releasedError
+    cdef JSStringRef jsScript
+
+    if _releasedCtx != NULL:
+        return 0
+
+    _releasedCtx = JSGlobalContextCreate(NULL)
+    jsScript = createJSStringFromPython(_releasedErrorScript)
+    _releasedError = JSEvaluateScript(_releasedCtx, jsScript, NULL, NULL, 1,
+                                      NULL)
+    JSStringRelease(jsScript)
+    JSValueProtect(_releasedCtx, _releasedError)
+    _releasedObj = JSObjectMake(_releasedCtx, releasedClass, NULL)
+    JSValueProtect(_releasedCtx, _releasedObj)
+    return 0
+
+cdef recordScopedWrapper(_JSBaseObject wrapper):
+    """Record ``wrapper`` in the innermost active scope of the
+    current thread for its context group."""
+    cdef JSScope scope
+    cdef long group
+    cdef int i
+
+    stack = getattr(_scopeStacks, 'stack', None)
+    if not stack:
+        return
+    group = <long>JSContextGetGroup(wrapper.jsCtx)
+    for i in range(len(stack) - 1, -1, -1):
+        scope = stack[i]
+        if scope.group == group:
+            scope.wrappers[id(wrapper)] = weakref.ref(wrapper)
+            return
+
+
+cdef class JSScope:
+    """A handle scope, obtained from the ``scope`` method of
+    ``JSContext``.
+
+    Scopes are used in ``with`` statements. Wrappers for JavaScript
+    objects created in the block (in the same thread, and for contexts
+    in the same context group) release their objects when the block
+    ends, even if the wrappers are still referenced. Using a released
+    wrapper raises an exception. Wrappers that must outlive the block
+    are passed to ``promote``.
+
+    Scopes can be nested. Wrappers are recorded in the innermost
+    scope, and promoting them moves them to the enclosing scope for
+    the same group, if any."""
+
+    cdef JSContext pyCtx
+    cdef long group
+    # Weak references to the recorded wrappers, indexed by their id.
+    cdef object wrappers
+    # The stack of scopes this scope is in while it is active.
+    cdef list stack
+
+    cdef setup(self, JSContext pyCtx):
+        self.pyCtx = pyCtx
+        self.group = <long>JSContextGetGroup(pyCtx.jsCtx)
+        self.wrappers = {}
+
+    def __len__(self):
+        """Return the number of live wrappers recorded in this
+        scope."""
+        return len([ref for ref in self.wrappers.itervalues()
+                    if ref() is not None])
+
+    def __enter__(self):
+        global _activeScopes
+
+        if self.stack is not None:
+            raise ValueError, "scope is already active"
+        setupReleasedObject()
+
+        stack = getattr(_scopeStacks, 'stack', None)
+        if stack is None:
+            stack = _scopeStacks.stack = []
+        stack.append(self)
+        self.stack = stack
+        _activeScopes += 1
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        global _activeScopes
+        cdef _JSBaseObject wrapper
+        cdef JSScope outer
+
+        if self.stack is None:
+            return False
+        outer = self.enclosing()
+        self.stack.remove(self)
+        self.stack = None
+        _activeScopes -= 1
+
+        wrappers = self.wrappers
+        self.wrappers = {}
+        for key, ref in wrappers.iteritems():
+            wrapper = ref()
+            if wrapper is None or wrapper.jsCtx == _releasedCtx:
+                continue
+            if isinstance(wrapper, _JSObject) and \
+                    (<_JSObject>wrapper).bufferExports > 0:
+                # Python still uses its memory, promote it instead.
+                if outer is not None:
+                    outer.wrappers[key] = ref
+            else:
+                wrapper.release()
+        return False
+
+    cdef JSScope enclosing(self):
+        """Return the enclosing active scope for the same context
+        group, or None."""
+        cdef JSScope scope
+        cdef int i
+
+        for i in range(self.stack.index(self) - 1, -1, -1):
+            scope = self.stack[i]
+            if scope.group == self.group:
+                return scope
+        return None
+
+    def promote(self, value):
+        """Keep ``value``, a wrapper recorded in this scope, from being
+        released when the scope ends, and return it.
+
+        The wrapper is moved to the enclosing scope for the same
+        context group, if any. Other values are returned unchanged."""
+        cdef JSScope scope
+
+        if not isinstance(value, _JSBaseObject):
+            return value
+        ref = self.wrappers.pop(id(value), None)
+        if ref is None or ref() is not value or self.stack is None:
+            return value
+
+        scope = self.enclosing()
+        if scope is not None:
+            scope.wrappers[id(value)] = ref
+        return value
+
+
+#
+# Garbage collection
+#
+
+# Python wrappers release their JavaScript objects when they are
+# deallocated, but the engine decides by itself when to collect them.
+# The policy set with ``setGCPolicy`` requests collections explicitly,
+# after a number of wrapper releases and/or in step with Python's own
+# garbage collector. Wrappers are often released while the engine is
+# collecting, and Python collections can start anywhere, so requested
+# collections are only run at the next safe point, when a script or a
+# function call returns (see ``gcSafePoint``).
+
+# Number of wrapper releases between collections, 0 for no limit.
+cdef long _gcReleases = 0
+cdef long _gcReleaseCount = 0
+
+# Groups with wrapper releases since their last collection by the
+# release policy, indexed by group (cast to long). They are retained
+# until they are collected.
+cdef object _gcReleasedGroups = {}
+
+# Python generation followed by the policy, -1 for none, and number
+# of Python collections (of any generation) per collection of that
+# generation.
+cdef int _gcGeneration = -1
+cdef long _gcStep = 1
+cdef long _gcPyCollections = 0
+
+# Number of collections requested by this module.
+cdef long _gcCollections = 0
+
+# Pending collections, a combination of GC_PENDING_RELEASED for the
+# groups in ``_gcReleasedGroups`` and GC_PENDING_ALL for the groups of
+# all live contexts.
+DEF GC_PENDING_RELEASED = 1
+DEF GC_PENDING_ALL = 2
+cdef int _gcPending = 0
+
+# Live contexts, indexed by id.
+_liveContexts = weakref.WeakValueDictionary()
+
+cdef void collectGarbage(JSContextRef jsCtx):
+    global _gcCollections
+
+    _gcCollections += 1
+    with nogil:
+        JSGarbageCollect(jsCtx)
+
+cdef inline void countRelease(JSContextRef jsCtx):
+    """Count a wrapper release in the group of ``jsCtx``, and request
+    a collection of the groups with releases if the policy asks for
+    it."""
+    global _gcReleaseCount, _gcPending
+    cdef JSContextGroupRef jsGroup
+
+    if _gcReleases == 0:
+        return
+    jsGroup = JSContextGetGroup(jsCtx)
+    key = <long>jsGroup
+    if key not in _gcReleasedGroups:
+        JSContextGroupRetain(jsGroup)
+        _gcReleasedGroups[key] = True
+    _gcReleaseCount += 1
+    if _gcReleaseCount >= _gcReleases:
+        _gcReleaseCount = 0
+        _gcPending |= GC_PENDING_RELEASED
+
+cdef inline gcSafePoint(JSContextRef jsCtx):
+    """Run the pending collection, if any. Called when a script or
+    function call in ``jsCtx`` returns."""
+    if _gcPending != 0:
+        runPendingCollection(jsCtx)
+
+cdef runPendingCollection(JSContextRef jsCtx):
+    global _gcPending
+
+    pending = _gcPending
+    _gcPending = 0
+    if pending & GC_PENDING_ALL:
+        collectAllGroups()
+    if pending & GC_PENDING_RELEASED:
+        collectReleasedGroups(jsCtx)
+
+cdef collectReleasedGroups(JSContextRef jsCtx):
+    """Collect garbage in the groups in ``_gcReleasedGroups``, and
+    forget them. ``jsCtx`` is used for its own group, other groups get
+    a temporary context."""
+    global _gcReleasedGroups
+    cdef JSContextGroupRef jsGroup
+    cdef JSGlobalContextRef jsTmpCtx
+
+    groups = _gcReleasedGroups
+    _gcReleasedGroups = {}
+    for key in groups:
+        jsGroup = <JSContextGroupRef><long>key
+        if jsCtx != NULL and JSContextGetGroup(jsCtx) == jsGroup:
+            collectGarbage(jsCtx)
+        else:
+            jsTmpCtx = JSGlobalContextCreateInGroup(jsGroup, NULL)
+            collectGarbage(jsTmpCtx)
+            with nogil:
+                JSGlobalContextRelease(jsTmpCtx)
+        with nogil:
+            JSContextGroupRelease(jsGroup)
+
+cdef forgetReleasedGroups():
+    """Empty ``_gcReleasedGroups`` without collecting."""
+    global _gcReleasedGroups
+
+    groups = _gcReleasedGroups
+    _gcReleasedGroups = {}
+    for key in groups:
+        JSContextGroupRelease(<JSContextGroupRef><long>key)
+
+cdef collectAllGroups():
+    """Collect garbage in the groups of all live contexts."""
+    cdef JSContext pyCtx
+
+    groups = set()
+    for pyCtx in _liveContexts.values():
+        group = <long>JSContextGetGroup(pyCtx.jsCtx)
+        if group not in groups:
+            groups.add(group)
+            collectGarbage(pyCtx.jsCtx)
+
+
+class _GCSentinel(object):
+    """Cyclic garbage signaling Python collections.
+
+    Every Python collection collects the youngest generation, so that
+    a sentinel in a reference cycle is collected by the first
+    collection after its creation. A weak reference reports it, and
+    a new sentinel is created."""
+
+    pass
+
+# Weak reference to the current sentinel.
+_gcSentinelRef = None
+
+def _gcSentinelCollected(ref):
+    global _gcPyCollections, _gcSentinelRef, _gcPending
+
+    _gcSentinelRef = None
+    if _gcGeneration < 0:
+        return
+    _gcPyCollections += 1
+    if _gcPyCollections >= _gcStep:
+        _gcPyCollections = 0
+        _gcPending = GC_PENDING_ALL
+    makeGCSentinel()
+
+cdef makeGCSentinel():
+    global _gcSentinelRef
+
+    sentinel = _GCSentinel()
+    sentinel.cycle = sentinel
+    _gcSentinelRef = weakref.ref(sentinel, _gcSentinelCollected)
+
+def setGCPolicy(releases=None, generation=None):
+    """Set the policy for requesting JavaScript garbage collections.
+
+    If ``releases`` is a positive number, the heap of a context group
+    is collected every time that many Python wrappers for JavaScript
+    objects have been released (in all groups). If ``generation`` is
+    0, 1 or 2, the heaps of the groups of all live contexts are
+    collected whenever Python's garbage collector collects that
+    generation. Python doesn't report its collections, so they are
+    detected with a sentinel object and the collections of older
+    generations are estimated from ``gc.get_threshold()``.
+
+    Collections are requested when a script or function call returns,
+    since the conditions above can be met at times where collecting
+    isn't safe.
+
+    ``None`` disables the corresponding part of the policy. Both are
+    disabled by default."""
+    global _gcReleases, _gcReleaseCount, _gcGeneration, _gcStep, \
+        _gcPyCollections, _gcPending
+
+    if releases is not None and releases <= 0:
+        raise ValueError, "releases must be positive"
+    if generation is not None and generation not in (0, 1, 2):
+        raise ValueError, "generation must be 0, 1 or 2"
+
+    _gcReleases = releases or 0
+    _gcReleaseCount = 0
+    _gcPending &= ~GC_PENDING_RELEASED
+    forgetReleasedGroups()
+
+    if generation is None:
+        _gcGeneration = -1
+        return
+    _gcStep = 1
+    for threshold in gc.get_threshold()[1:generation + 1]:
+        _gcStep *= max(threshold, 1)
+    _gcGeneration = generation
+    _gcPyCollections = 0
+    if _gcSentinelRef is None:
+        makeGCSentinel()
+
+def getGCPolicy():
+    """Return the current garbage collection policy as a
+    ``(releases, generation)`` pair, see ``setGCPolicy``."""
+    return (_gcReleases or None,
+            _gcGeneration if _gcGeneration >= 0 else None)
 
 
 #
@@ -977,6 +4284,8 @@ cdef JSValueRef pyExceptionToJS(JSContextRef jsCtx, object exc):
     cdef JSStringRef jsMsgStr
     cdef JSValueRef jsMsg
 
+    countStat(jsCtx, STAT_EXCEPTIONS_TO_JS)
+
     # Make a string from the exception object (the unicode conversion
     # in createJSStringFromPython takes care of extracting the
     # message).
@@ -1002,8 +4311,9 @@ cdef JSValueRef pyObjGetProperty(JSContextRef jsCtx,
                                  JSObjectRef jsObj,
                                  JSStringRef jsPropertyName,
                                  JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_GET)
     cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         return pythonToJS(jsCtx, getattr(pyObj, pyPropertyName))
@@ -1013,14 +4323,17 @@ cdef JSValueRef pyObjGetProperty(JSContextRef jsCtx,
         return NULL
     except BaseException, e:
         jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_GET, start)
 
 cdef bool pyObjSetProperty(JSContextRef jsCtx,
                            JSObjectRef jsObj,
                            JSStringRef jsPropertyName,
                            JSValueRef jsValue,
                            JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_SET)
     cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
     cdef object pyValue = jsToPython(jsCtx, jsValue)
 
     try:
@@ -1028,13 +4341,16 @@ cdef bool pyObjSetProperty(JSContextRef jsCtx,
         return True
     except BaseException, e:
         jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_SET, start)
 
 cdef bool pyObjDeleteProperty(JSContextRef jsCtx,
                               JSObjectRef jsObj,
                               JSStringRef jsPropertyName,
                               JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_DELETE)
     cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         delattr(pyObj, pyPropertyName)
@@ -1044,7 +4360,9 @@ cdef bool pyObjDeleteProperty(JSContextRef jsCtx,
         # attributes can't be found.
         return False
     except BaseException, e:
-        jsExc[0] = pyExceptionToJS(jsCtx, e)    
+        jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_DELETE, start)
 
 cdef JSValueRef pyObjCallAsFunction(JSContextRef jsCtx,
                                     JSObjectRef jsObj,
@@ -1053,6 +4371,7 @@ cdef JSValueRef pyObjCallAsFunction(JSContextRef jsCtx,
                                     JSValueRef jsArgs[],
                                     JSValueRef* jsExc) with gil:
     """Invoked when a wrapped object is called as a function."""
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_CALL)
     cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
     cdef int i
 
@@ -1062,24 +4381,51 @@ cdef JSValueRef pyObjCallAsFunction(JSContextRef jsCtx,
         return pythonToJS(jsCtx, pyObj(*args))
     except BaseException, e:
         jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_CALL, start)
 
 cdef void pyObjFinalize(JSObjectRef jsObj) with gil:
+    global _lastGroup, _lastGroupWrappers
     cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
-
-    # Remove this wrapper from the wrapper cache.
-    del _pyWrappedPyObjs[id(pyObj)]
+    cdef void *group
+    cdef _GroupWrappers wrappers
+
+    # Remove this wrapper from the wrapper cache of its group, if it
+    # is there.
+    group = wrapperTableGet(&_pyWrapperGroups, <void *>jsObj)
+    if group != NULL:
+        wrapperTableRemove(&_pyWrapperGroups, <void *>jsObj, group)
+        wrappers = _groupWrappers.get(<long>group)
+        if wrappers is not None and \
+                wrapperTableRemove(&wrappers.pyObjs, <void *>pyObj,
+                                   <void *>jsObj) and \
+                wrappers.jsObjs.count == 0 and wrappers.pyObjs.count == 0:
+            del _groupWrappers[<long>group]
+            if wrappers is _lastGroupWrappers:
+                _lastGroup = NULL
+                _lastGroupWrappers = None
 
     Py_DECREF(pyObj)
 
+# Class definition structure for PythonWrapper, the base class of all
+# wrappers for Python objects. It only manages the reference to the
+# wrapped object.
+cdef JSClassDefinition pyWrapperClassDef = kJSClassDefinitionEmpty
+pyWrapperClassDef.className = 'PythonWrapper'
+pyWrapperClassDef.initialize = pyObjInitialize
+pyWrapperClassDef.finalize = pyObjFinalize
+
+# PythonWrapper class.
+cdef JSClassRef pyWrapperClass = JSClassCreate(&pyWrapperClassDef)
+
 # Class definition structure for PythonObject.
 cdef JSClassDefinition pyObjectClassDef = kJSClassDefinitionEmpty
 pyObjectClassDef.className = 'PythonObject'
-pyObjectClassDef.initialize = pyObjInitialize
+pyObjectClassDef.parentClass = pyWrapperClass
 pyObjectClassDef.getProperty = pyObjGetProperty
 pyObjectClassDef.setProperty = pyObjSetProperty
 pyObjectClassDef.deleteProperty = pyObjDeleteProperty
 pyObjectClassDef.callAsFunction = pyObjCallAsFunction
-pyObjectClassDef.finalize = pyObjFinalize
 
 # PythonObject class.
 cdef JSClassRef pyObjectClass = JSClassCreate(&pyObjectClassDef)
@@ -1103,7 +4449,7 @@ cdef bool pySeqHasProperty(JSContextRef jsCtx,
                            JSObjectRef jsSeq,
                            JSStringRef jsPropertyName) with gil:
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         return 0 <= makePyIndex(pyPropertyName) < len(pySeq)
@@ -1114,21 +4460,25 @@ cdef JSValueRef pySeqGetProperty(JSContextRef jsCtx,
                                  JSObjectRef jsSeq,
                                  JSStringRef jsPropertyName,
                                  JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_GET)
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         return pythonToJS(jsCtx, pySeq[makePyIndex(pyPropertyName)])
     except:
         return NULL
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_GET, start)
 
 cdef bool pySeqSetProperty(JSContextRef jsCtx,
                            JSObjectRef jsSeq,
                            JSStringRef jsPropertyName,
                            JSValueRef jsValue,
                            JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_SET)
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
     cdef object pyValue = jsToPython(jsCtx, jsValue)
     cdef object pyIndex
 
@@ -1144,13 +4494,16 @@ cdef bool pySeqSetProperty(JSContextRef jsCtx,
         return True
     except:
         return False
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_SET, start)
 
 cdef bool pySeqDeleteProperty(JSContextRef jsCtx,
                               JSObjectRef jsSeq,
                               JSStringRef jsPropertyName,
                               JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_DELETE)
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         # Delete behaves differently in JavaScript.
@@ -1158,6 +4511,8 @@ cdef bool pySeqDeleteProperty(JSContextRef jsCtx,
         return True
     except:
         return False
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_DELETE, start)
 
 # Static properties.
 
@@ -1167,18 +4522,22 @@ cdef JSValueRef pySeqGetLength(JSContextRef jsCtx,
                                JSObjectRef jsSeq,
                                JSStringRef jsPropertyName,
                                JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_GET)
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
 
     try:
         return pythonToJS(jsCtx, len(pySeq))
     except BaseException, e:
         jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_GET, start)
 
 cdef bool pySeqSetLength(JSContextRef jsCtx,
                          JSObjectRef jsSeq,
                          JSStringRef jsPropertyName,
                          JSValueRef jsValue,
                          JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_SET)
     cdef object pySeq = <object>JSObjectGetPrivate(jsSeq)
     cdef object pyLength
 
@@ -1196,6 +4555,8 @@ cdef bool pySeqSetLength(JSContextRef jsCtx,
     except BaseException, e:
         jsExc[0] = pyExceptionToJS(jsCtx, e)
         return False
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_SET, start)
     
 
 pySeqStaticProps[0].name = "length"
@@ -1235,7 +4596,7 @@ cdef void pyMapGetPropertyNames(JSContextRef jsCtx,
     cdef JSStringRef jsName
 
     for pyName in pyMap:
-        jsName = createJSStringFromPython(pyName)
+        jsName = createJSNameFromPython(pyName)
         try:
             JSPropertyNameAccumulatorAddName(jsPropertyNames, jsName)
         finally:
@@ -1245,21 +4606,25 @@ cdef JSValueRef pyMapGetProperty(JSContextRef jsCtx,
                                  JSObjectRef jsMap,
                                  JSStringRef jsPropertyName,
                                  JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_GET)
     cdef object pyMap = <object>JSObjectGetPrivate(jsMap)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         return pythonToJS(jsCtx, pyMap[pyPropertyName])
     except:
         return NULL
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_GET, start)
 
 cdef bool pyMapSetProperty(JSContextRef jsCtx,
                            JSObjectRef jsMap,
                            JSStringRef jsPropertyName,
                            JSValueRef jsValue,
                            JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_SET)
     cdef object pyMap = <object>JSObjectGetPrivate(jsMap)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
     cdef object pyValue = jsToPython(jsCtx, jsValue)
 
     try:
@@ -1267,19 +4632,24 @@ cdef bool pyMapSetProperty(JSContextRef jsCtx,
         return True
     except:
         return False
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_SET, start)
 
 cdef bool pyMapDeleteProperty(JSContextRef jsCtx,
                               JSObjectRef jsMap,
                               JSStringRef jsPropertyName,
                               JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_DELETE)
     cdef object pyMap = <object>JSObjectGetPrivate(jsMap)
-    cdef object pyPropertyName = pyStringFromJS(jsPropertyName)
+    cdef object pyPropertyName = pyNameFromJS(jsPropertyName)
 
     try:
         del pyMap[pyPropertyName]
         return True
     except:
         return False
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_DELETE, start)
 
 # Class definition structure for PythonMapping.
 cdef JSClassDefinition pyMapClassDef = kJSClassDefinitionEmpty
@@ -1297,6 +4667,13 @@ cdef JSClassRef pyMapClass = JSClassCreate(&pyMapClassDef)
 # Wrap a Python object into the appropriate JavaScript class instance.
 cdef JSObjectRef makePyObject(JSContextRef jsCtx, object pyObj):
     """Wrap a Python object for use in JavaScript."""
+    cdef _ExportedClass exported
+
+    if _exportedClasses:
+        exported = _exportedClasses.get(type(pyObj))
+        if exported is not None:
+            return JSObjectMake(jsCtx, exported.jsClass, <void *>pyObj)
+
     if isinstance(pyObj, collections.Sequence):
         return JSObjectMake(jsCtx, pySeqClass, <void *>pyObj)
     elif isinstance(pyObj, collections.Mapping):
@@ -1305,12 +4682,909 @@ cdef JSObjectRef makePyObject(JSContextRef jsCtx, object pyObj):
         return JSObjectMake(jsCtx, pyObjectClass, <void *>pyObj)
 
 
+#
+# Exported Python classes
+#
+
+# Instances of the classes exported through ``exportClass`` are
+# wrapped into instances of a JavaScript class generated for their
+# Python class. Exported attributes and methods are static values and
+# functions of the JavaScript class, resolved by the engine without
+# calling back into Python. Other properties are plain JavaScript
+# properties of the wrapper.
+
+cdef class _ExportedClass:
+    """A JavaScript class generated for a Python class."""
+
+    cdef JSClassRef jsClass
+    cdef object attrs
+    cdef object methods
+
+    def __dealloc__(self):
+        if self.jsClass != NULL:
+            JSClassRelease(self.jsClass)
+
+# Exported classes, indexed by Python class.
+cdef object _exportedClasses = {}
+
+# Name of the function name property.
+cdef JSStringRef jsNameName = JSStringCreateWithUTF8CString("name")
+
+cdef JSValueRef exportedGetAttr(JSContextRef jsCtx,
+                                JSObjectRef jsObj,
+                                JSStringRef jsPropertyName,
+                                JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_GET)
+    cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
+
+    try:
+        return pythonToJS(jsCtx, getattr(pyObj,
+                                         pyNameFromJS(jsPropertyName)))
+    except BaseException, e:
+        jsExc[0] = pyExceptionToJS(jsCtx, e)
+        return JSValueMakeUndefined(jsCtx)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_GET, start)
+
+cdef bool exportedSetAttr(JSContextRef jsCtx,
+                          JSObjectRef jsObj,
+                          JSStringRef jsPropertyName,
+                          JSValueRef jsValue,
+                          JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_SET)
+    cdef object pyObj = <object>JSObjectGetPrivate(jsObj)
+
+    try:
+        setattr(pyObj, pyNameFromJS(jsPropertyName),
+                jsToPython(jsCtx, jsValue))
+    except BaseException, e:
+        jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_SET, start)
+    return True
+
+cdef JSValueRef exportedCallMethod(JSContextRef jsCtx,
+                                   JSObjectRef jsFunction,
+                                   JSObjectRef jsThisObj,
+                                   size_t argumentCount,
+                                   JSValueRef jsArgs[],
+                                   JSValueRef* jsExc) with gil:
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_CALL)
+    cdef _ExportedClass exported
+    cdef JSValueRef jsName
+    cdef JSStringRef jsNameStr
+    cdef size_t i
+
+    try:
+        if jsThisObj == NULL or \
+                not JSValueIsObjectOfClass(jsCtx, jsThisObj, pyWrapperClass):
+            raise TypeError, "method called on an incompatible object"
+        pyObj = <object>JSObjectGetPrivate(jsThisObj)
+
+        # Static functions are created by the engine with the name of
+        # the method.
+        jsName = JSObjectGetProperty(jsCtx, jsFunction, jsNameName, NULL)
+        jsNameStr = JSValueToStringCopy(jsCtx, jsName, NULL)
+        try:
+            pyName = pyNameFromJS(jsNameStr)
+        finally:
+            JSStringRelease(jsNameStr)
+
+        # The method may have been taken from an instance of another
+        # class, only call methods exported for this object's class.
+        exported = _exportedClasses.get(type(pyObj))
+        if exported is None or \
+                unicode(pyName).encode('utf-8') not in exported.methods:
+            raise TypeError, "method called on an incompatible object"
+
+        args = PyTuple_New(argumentCount)
+        for i in range(argumentCount):
+            arg = jsToPython(jsCtx, jsArgs[i])
+            Py_INCREF(arg)
+            PyTuple_SET_ITEM(args, i, arg)
+        return pythonToJS(jsCtx, getattr(pyObj, pyName)(*args))
+    except BaseException, e:
+        jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_CALL, start)
+
+def exportClass(pyType, attrs=(), methods=()):
+    """Export the instances of Python class ``pyType`` to JavaScript
+    with a fixed set of attributes and methods.
+
+    Instances of ``pyType`` (but not of its subclasses) passed to
+    JavaScript from now on are wrapped into objects of a JavaScript
+    class generated for it, with the attributes named in ``attrs``
+    and the methods named in ``methods``. The engine resolves these
+    names itself, so that accessing them is much faster than with the
+    generic Python object wrappers. On the other hand, other
+    attributes of the Python object are not visible from JavaScript,
+    and the wrappers don't behave as sequences, mappings or callables.
+
+    Exporting a class again replaces its previous definition for new
+    wrappers. ``exportClass(pyType, None)`` cancels the export."""
+    cdef _ExportedClass exported
+    cdef JSClassDefinition classDef = kJSClassDefinitionEmpty
+    cdef JSStaticValueNC *staticValues
+    cdef JSStaticFunctionNC *staticFunctions
+    cdef int i
+
+    if not isinstance(pyType, (type, types.ClassType)):
+        raise TypeError, "a class is required"
+    if attrs is None:
+        _exportedClasses.pop(pyType, None)
+        return
+
+    exported = _ExportedClass()
+    # Keep the names as UTF-8 byte strings, the engine copies them
+    # when the class is created.
+    exported.attrs = [unicode(name).encode('utf-8') for name in attrs]
+    exported.methods = [unicode(name).encode('utf-8') for name in methods]
+    className = unicode(pyType.__name__).encode('utf-8')
+
+    staticValues = <JSStaticValueNC *>malloc(
+        (len(exported.attrs) + 1) * sizeof(JSStaticValueNC))
+    staticFunctions = <JSStaticFunctionNC *>malloc(
+        (len(exported.methods) + 1) * sizeof(JSStaticFunctionNC))
+    if staticValues == NULL or staticFunctions == NULL:
+        free(staticValues)
+        free(staticFunctions)
+        raise MemoryError
+    try:
+        for i, name in enumerate(exported.attrs):
+            staticValues[i].name = name
+            staticValues[i].getProperty = exportedGetAttr
+            staticValues[i].setProperty = exportedSetAttr
+            staticValues[i].attributes = kJSPropertyAttributeDontDelete
+        staticValues[len(exported.attrs)].name = NULL
+        for i, name in enumerate(exported.methods):
+            staticFunctions[i].name = name
+            staticFunctions[i].callAsFunction = exportedCallMethod
+            staticFunctions[i].attributes = \
+                kJSPropertyAttributeDontDelete | kJSPropertyAttributeDontEnum
+        staticFunctions[len(exported.methods)].name = NULL
+
+        classDef.className = className
+        classDef.parentClass = pyWrapperClass
+        classDef.staticValues = <JSStaticValue *>staticValues
+        classDef.staticFunctions = <JSStaticFunction *>staticFunctions
+        exported.jsClass = JSClassCreate(&classDef)
+    finally:
+        free(staticValues)
+        free(staticFunctions)
+
+    _exportedClasses[pyType] = exported
+
+
+#
+# Exported Python functions
+#
+
+# Python callables exported through ``JSContext.exportFunction``
+# become native JavaScript functions created with
+# ``JSObjectMakeFunctionWithCallback``. Such functions cannot hold
+# private data, so the callable is found through a table keyed by the
+# function object. Every exported function also gets a hidden property
+# holding a ``PythonExport`` object, whose finalizer removes the table
+# entry when the function is garbage collected.
+
+cdef class _ExportedFunction:
+    """A Python callable exported as a native JavaScript function."""
+
+    cdef object pyFunction
+    # Argument converters: tuple of argument type codes (see
+    # ``prepare``) or callables.
+    cdef tuple converters
+    cdef JSObjectRef jsFunction
+
+# Exported functions, indexed by JavaScript function object.
+cdef WrapperTable _exportedFunctions
+
+# Name of the property holding the PythonExport object.
+cdef JSStringRef jsExportName = \
+    JSStringCreateWithUTF8CString("__pythonExport__")
+
+cdef object convertExportedArg(JSContextRef jsCtx, object converter,
+                               JSValueRef jsValue):
+    cdef JSValueRef jsException = NULL
+    cdef JSStringRef jsStr
+    cdef double number
+
+    if converter == ARG_ANY:
+        return jsToPython(jsCtx, jsValue)
+    elif converter == ARG_NUMBER:
+        number = JSValueToNumber(jsCtx, jsValue, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(jsCtx, jsException)
+        return number
+    elif converter == ARG_STRING:
+        jsStr = JSValueToStringCopy(jsCtx, jsValue, &jsException)
+        if jsException != NULL:
+            raise jsExceptionToPython(jsCtx, jsException)
+        try:
+            return pyStringFromJS(jsStr)
+        finally:
+            JSStringRelease(jsStr)
+    elif converter == ARG_BOOLEAN:
+        return JSValueToBoolean(jsCtx, jsValue) != 0
+    elif converter == ARG_OBJECT:
+        if not JSValueIsObject(jsCtx, jsValue):
+            raise TypeError, "JavaScript object expected"
+        return jsToPython(jsCtx, jsValue)
+    else:
+        return converter(jsToPython(jsCtx, jsValue))
+
+cdef JSValueRef exportedFunctionCall(JSContextRef jsCtx,
+                                     JSObjectRef jsFunction,
+                                     JSObjectRef jsThisObj,
+                                     size_t argumentCount,
+                                     JSValueRef jsArgs[],
+                                     JSValueRef* jsExc) with gil:
+    """Invoked when an exported function is called."""
+    cdef double start = callbackEnter(jsCtx, STAT_CALLBACK_CALL)
+    cdef void *record = wrapperTableGet(&_exportedFunctions,
+                                        <void *>jsFunction)
+    cdef _ExportedFunction exported
+    cdef size_t converterCount
+    cdef size_t i
+
+    if record == NULL:
+        return JSValueMakeUndefined(jsCtx)
+    exported = <_ExportedFunction><object>record
+
+    try:
+        args = PyTuple_New(argumentCount)
+        if exported.converters is None:
+            for i in range(argumentCount):
+                arg = jsToPython(jsCtx, jsArgs[i])
+                Py_INCREF(arg)
+                PyTuple_SET_ITEM(args, i, arg)
+        else:
+            converterCount = len(exported.converters)
+            for i in range(argumentCount):
+                if i < converterCount:
+                    arg = convertExportedArg(jsCtx, exported.converters[i],
+                                             jsArgs[i])
+                else:
+                    arg = jsToPython(jsCtx, jsArgs[i])
+                Py_INCREF(arg)
+                PyTuple_SET_ITEM(args, i, arg)
+        return pythonToJS(jsCtx, exported.pyFunction(*args))
+    except BaseException, e:
+        jsExc[0] = pyExceptionToJS(jsCtx, e)
+    finally:
+        callbackLeave(jsCtx, STAT_CALLBACK_CALL, start)
+
+cdef void exportHolderFinalize(JSObjectRef jsObj) with gil:
+    cdef _ExportedFunction exported = \
+        <_ExportedFunction><object>JSObjectGetPrivate(jsObj)
+
+    wrapperTableRemove(&_exportedFunctions, <void *>exported.jsFunction,
+                       <void *>exported)
+    Py_DECREF(exported)
+
+# Class definition structure for PythonExport.
+cdef JSClassDefinition pyExportClassDef = kJSClassDefinitionEmpty
+pyExportClassDef.className = 'PythonExport'
+pyExportClassDef.finalize = exportHolderFinalize
+
+# PythonExport class.
+cdef JSClassRef pyExportClass = JSClassCreate(&pyExportClassDef)
+
+cdef JSObjectRef makeExportedFunction(JSContextRef jsCtx, object pyName,
+                                      object pyFunction,
+                                      object argConverters) except NULL:
+    """Create a native JavaScript function calling ``pyFunction``."""
+    cdef _ExportedFunction exported = _ExportedFunction()
+    cdef JSStringRef jsName = NULL
+    cdef JSObjectRef jsFunction
+    cdef JSObjectRef jsHolder
+
+    if not callable(pyFunction):
+        raise TypeError, "exported object must be callable"
+    exported.pyFunction = pyFunction
+    if argConverters is not None:
+        converters = []
+        for converter in argConverters:
+            if converter is None or \
+                    isinstance(converter, types.StringTypes):
+                try:
+                    converter = _preparedArgTypes[converter]
+                except KeyError:
+                    raise ValueError, "invalid argument type %r" % \
+                        (converter,)
+            elif not callable(converter):
+                raise ValueError, "invalid argument converter %r" % \
+                    (converter,)
+            converters.append(converter)
+        exported.converters = tuple(converters)
+
+    if pyName is not None:
+        jsName = createJSNameFromPython(pyName)
+    try:
+        jsFunction = JSObjectMakeFunctionWithCallback(jsCtx, jsName,
+                                                      exportedFunctionCall)
+    finally:
+        if jsName != NULL:
+            JSStringRelease(jsName)
+    exported.jsFunction = jsFunction
+    wrapperTablePut(&_exportedFunctions, <void *>jsFunction,
+                    <void *>exported)
+
+    # The holder owns a reference to the exported function record,
+    # released by its finalizer.
+    Py_INCREF(exported)
+    jsHolder = JSObjectMake(jsCtx, pyExportClass, <void *>exported)
+    JSObjectSetProperty(jsCtx, jsFunction, jsExportName, jsHolder,
+                        kJSPropertyAttributeReadOnly |
+                        kJSPropertyAttributeDontEnum |
+                        kJSPropertyAttributeDontDelete, NULL)
+    return jsFunction
+
+
+#
+# Asynchronous execution
+#
+
+class JSFutureTimeout(Exception):
+    """Raised when the result of a ``JSFuture`` is not available
+    within the requested time."""
+
+
+class JSFuture(object):
+    """The result of a JavaScript operation running asynchronously.
+
+    Objects of this class are returned by ``JSContext.evaluateAsync``
+    and by the ``callAsync`` method of JavaScript functions. If the
+    operation returns a JavaScript promise (an object with a ``then``
+    method) the future is settled when the promise is, with the value
+    it is fulfilled with, or with a ``JSException`` for the reason it
+    is rejected with.
+
+    Callbacks registered with ``addDoneCallback`` are called with the
+    future as only argument in the thread that settles it. An event
+    loop can be notified from them, e.g. with the
+    ``call_soon_threadsafe`` method of asyncio loops.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._done = threading.Event()
+        self._result = None
+        self._exception = None
+        self._callbacks = []
+
+    def done(self):
+        """Return whether the operation has finished."""
+        return self._done.is_set()
+
+    def result(self, timeout=None):
+        """Wait for the operation to finish and return its result, or
+        raise its exception. ``JSFutureTimeout`` is raised if it
+        doesn't finish in ``timeout`` seconds."""
+        if not self._done.wait(timeout):
+            raise JSFutureTimeout, "operation not finished"
+        if self._exception is not None:
+            raise self._exception
+        return self._result
+
+    def exception(self, timeout=None):
+        """Wait for the operation to finish and return the exception
+        it raised, or ``None``."""
+        if not self._done.wait(timeout):
+            raise JSFutureTimeout, "operation not finished"
+        return self._exception
+
+    def addDoneCallback(self, callback):
+        """Call ``callback`` with this future when the operation
+        finishes, or immediately if it is already finished."""
+        with self._lock:
+            if not self._done.is_set():
+                self._callbacks.append(callback)
+                return
+        callback(self)
+
+    def _settle(self, result, exception):
+        with self._lock:
+            if self._done.is_set():
+                return
+            self._result = result
+            self._exception = exception
+            self._done.set()
+            callbacks = self._callbacks
+            self._callbacks = []
+        for callback in callbacks:
+            try:
+                callback(self)
+            except Exception:
+                sys.excepthook(*sys.exc_info())
+
+    def _setResult(self, result):
+        self._settle(result, None)
+
+    def _setException(self, exception):
+        self._settle(None, exception)
+
+    def _reject(self, reason):
+        self._settle(None, JSException(reason))
+
+
+def _settleFuture(future, func, args):
+    try:
+        result = func(*args)
+    except Exception, e:
+        future._setException(e)
+        return
+
+    if isinstance(result, _JSObject):
+        then = getattr(result, 'then', None)
+        if isinstance(then, _JSBoundMethod):
+            # Settle the future from the promise reactions, which run
+            # as soon as the promise settles.
+            then(future._setResult, future._reject)
+            return
+    future._setResult(result)
+
+
+def _runJobs(jobs):
+    while True:
+        job = jobs.get()
+        if job is None:
+            return
+        _settleFuture(*job[1:])
+        job = None
+
+
+class _GroupExecutor(object):
+    """A thread running asynchronous operations for the contexts in a
+    context group.
+
+    The thread stops when the executor is garbage collected. Pending
+    jobs keep a reference to it."""
+
+    def __init__(self):
+        self.jobs = Queue.Queue()
+        thread = threading.Thread(target=_runJobs, args=(self.jobs,),
+                                  name='JSGroupExecutor')
+        thread.daemon = True
+        thread.start()
+
+    def submit(self, func, *args):
+        future = JSFuture()
+        self.jobs.put((self, future, func, args))
+        return future
+
+    def __del__(self):
+        self.jobs.put(None)
+
+
+# Executors of the context groups, indexed by group (cast to long).
+cdef object _groupExecutors = weakref.WeakValueDictionary()
+cdef object _groupExecutorsLock = threading.Lock()
+
+cdef object groupExecutor(JSContextRef jsCtx):
+    """Return the executor for the group of context ``jsCtx``."""
+    key = <long>JSContextGetGroup(jsCtx)
+    with _groupExecutorsLock:
+        executor = _groupExecutors.get(key)
+        if executor is None:
+            executor = _GroupExecutor()
+            _groupExecutors[key] = executor
+    return executor
+
+
+#
+# Context pools
+#
+
+class ContextPoolTimeout(Exception):
+    """Raised when no context could be checked out of a
+    ``ContextPool`` within the requested time."""
+
+
+class ContextPool(object):
+    """A pool of pre-initialized JavaScript contexts.
+
+    Creating a context and evaluating bootstrap scripts in it can be
+    much more expensive than the actual work done with it. A pool
+    keeps up to ``size`` initialized contexts around and hands them
+    out with ``checkout`` (and takes them back with ``checkin``), or
+    more conveniently through the ``context`` method::
+
+        pool = ContextPool(4, init=[libSource, appSource])
+        with pool.context() as ctx:
+            ctx.evaluateScript(...)
+
+    ``init`` is either a callable, invoked with every new context as
+    argument, or a script or sequence of scripts to evaluate in every
+    new context. ``reset``, if given, is called with a context every
+    time it is checked in; a context for which it raises an exception
+    is discarded. Contexts are also discarded after being checked out
+    ``maxUses`` times, and when they stay idle for more than
+    ``maxIdle`` seconds. Discarded contexts are replaced on demand.
+
+    The pool is thread safe. Contexts are created when the pool is
+    created unless ``prewarm`` is false.
+    """
+
+    def __init__(self, size, init=None, reset=None, maxUses=None,
+                 maxIdle=None, prewarm=True):
+        if size < 1:
+            raise ValueError, "pool size must be positive"
+
+        self.size = size
+        self.init = init
+        self.reset = reset
+        self.maxUses = maxUses
+        self.maxIdle = maxIdle
+
+        self._cond = threading.Condition()
+
+        # Idle contexts as (context, time of checkin) pairs, most
+        # recently used last.
+        self._idle = []
+        # Number of contexts checked out so far, indexed by context.
+        self._uses = {}
+        # Checkout times of busy contexts, indexed by context.
+        self._busySince = {}
+        # Number of contexts in existence (or being created).
+        self._count = 0
+        self._closed = False
+
+        self._startTime = time.time()
+        self._resetStats()
+
+        if prewarm:
+            for i in xrange(size):
+                self._count += 1
+                ctx = self._create()
+                self._idle.append((ctx, time.time()))
+
+    def _resetStats(self):
+        self._checkouts = 0
+        self._waits = 0
+        self._waitTime = 0.0
+        self._maxWaitTime = 0.0
+        self._busyTime = 0.0
+        self._created = 0
+        self._retired = 0
+        self._evicted = 0
+        self._resetFailures = 0
+        self._statsStart = time.time()
+
+    def _create(self):
+        """Create and initialize a new context. ``_count`` must have
+        been incremented by the caller, and is decremented here if the
+        creation fails."""
+        try:
+            ctx = JSContext()
+            if callable(self.init):
+                self.init(ctx)
+            elif isinstance(self.init, types.StringTypes):
+                ctx.evaluateScript(self.init)
+            elif self.init is not None:
+                for script in self.init:
+                    ctx.evaluateScript(script)
+        except:
+            with self._cond:
+                self._count -= 1
+                self._cond.notify()
+            raise
+
+        with self._cond:
+            self._created += 1
+            self._uses[ctx] = 0
+        return ctx
+
+    def _discard(self, ctx):
+        # Must be called with the lock held.
+        del self._uses[ctx]
+        self._count -= 1
+        self._cond.notify()
+
+    def _evictIdle(self, now):
+        # Must be called with the lock held.
+        if self.maxIdle is None:
+            return
+        while self._idle and now - self._idle[0][1] > self.maxIdle:
+            ctx, since = self._idle.pop(0)
+            self._discard(ctx)
+            self._evicted += 1
+
+    def evictIdle(self):
+        """Discard the contexts that have been idle for more than
+        ``maxIdle`` seconds."""
+        with self._cond:
+            self._evictIdle(time.time())
+
+    def checkout(self, timeout=None):
+        """Take a context out of the pool.
+
+        If all contexts are busy, wait for at most ``timeout`` seconds
+        (forever if ``timeout`` is ``None``) for one to be checked in,
+        and raise ``ContextPoolTimeout`` if none is available by
+        then."""
+        start = time.time()
+        waited = False
+        create = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise ValueError, "context pool is closed"
+                self._evictIdle(time.time())
+                if self._idle:
+                    ctx, since = self._idle.pop()
+                    break
+                if self._count < self.size:
+                    self._count += 1
+                    create = True
+                    break
+
+                if timeout is not None:
+                    remaining = start + timeout - time.time()
+                    if remaining <= 0:
+                        raise ContextPoolTimeout, \
+                            "no context available after %s seconds" % timeout
+                else:
+                    remaining = None
+                waited = True
+                self._cond.wait(remaining)
+
+        if create:
+            ctx = self._create()
+
+        with self._cond:
+            now = time.time()
+            self._checkouts += 1
+            if waited:
+                self._waits += 1
+            self._waitTime += now - start
+            self._maxWaitTime = max(self._maxWaitTime, now - start)
+            self._uses[ctx] += 1
+            self._busySince[ctx] = now
+
+        return ctx
+
+    def checkin(self, ctx):
+        """Return a context obtained through ``checkout`` to the pool.
+        """
+        with self._cond:
+            try:
+                since = self._busySince.pop(ctx)
+            except KeyError:
+                raise ValueError, "context was not checked out of this pool"
+            self._busyTime += time.time() - since
+
+            if self._closed:
+                self._discard(ctx)
+                return
+            if self.maxUses is not None and self._uses[ctx] >= self.maxUses:
+                self._retired += 1
+                self._discard(ctx)
+                return
+
+        if self.reset is not None:
+            try:
+                self.reset(ctx)
+            except Exception:
+                with self._cond:
+                    self._resetFailures += 1
+                    self._discard(ctx)
+                return
+
+        with self._cond:
+            self._idle.append((ctx, time.time()))
+            self._cond.notify()
+
+    def context(self, timeout=None):
+        """Return a context manager that checks out a context on entry
+        and checks it back in on exit."""
+        return _PooledContext(self, timeout)
+
+    def close(self):
+        """Discard all idle contexts. Contexts still checked out are
+        discarded when checked in."""
+        with self._cond:
+            while self._idle:
+                ctx, since = self._idle.pop()
+                self._discard(ctx)
+            self._closed = True
+
+    def stats(self, reset=False):
+        """Return usage statistics for this pool.
+
+        Times are in seconds. ``utilization`` is the fraction of the
+        pool capacity (``size`` contexts over the time since the last
+        statistics reset) spent with contexts checked out. If ``reset``
+        is true, the counters are set back to zero after reading
+        them."""
+        with self._cond:
+            now = time.time()
+            busyTime = self._busyTime + \
+                sum([now - since for since in self._busySince.values()])
+            elapsed = now - self._statsStart
+            if self._checkouts:
+                avgWaitTime = self._waitTime / self._checkouts
+            else:
+                avgWaitTime = 0.0
+            if elapsed > 0:
+                utilization = busyTime / (elapsed * self.size)
+            else:
+                utilization = 0.0
+            result = {'size': self.size,
+                      'count': self._count,
+                      'idle': len(self._idle),
+                      'busy': len(self._busySince),
+                      'checkouts': self._checkouts,
+                      'waits': self._waits,
+                      'avgWaitTime': avgWaitTime,
+                      'maxWaitTime': self._maxWaitTime,
+                      'busyTime': busyTime,
+                      'utilization': utilization,
+                      'created': self._created,
+                      'retired': self._retired,
+                      'evicted': self._evicted,
+                      'resetFailures': self._resetFailures,
+                      }
+            if reset:
+                self._resetStats()
+                # Only count from now on the time of the contexts that
+                # are currently busy.
+                self._busyTime = -sum([now - since for since
+                                       in self._busySince.values()])
+            return result
+
+
+class _PooledContext(object):
+    """Context manager returned by ``ContextPool.context``."""
+
+    def __init__(self, pool, timeout):
+        self.pool = pool
+        self.timeout = timeout
+        self.ctx = None
+
+    def __enter__(self):
+        self.ctx = self.pool.checkout(self.timeout)
+        return self.ctx
+
+    def __exit__(self, excType, excValue, traceback):
+        ctx, self.ctx = self.ctx, None
+        self.pool.checkin(ctx)
+        return False
+
+
+#
+# Process pools
+#
+
+# Initialized contexts of the existing process pools, indexed by pool
+# id. Worker processes inherit this dictionary when forked.
+_processPoolContexts = {}
+
+
+def _processPoolJob(poolId, target, args):
+    """Run a job in a process pool worker. See ``ProcessPool``."""
+    ctx = _processPoolContexts[poolId]
+    if args is None:
+        result = ctx.evaluateScript(target)
+    else:
+        func = ctx.globalObject
+        for name in target.split('.'):
+            func = getattr(func, name)
+        result = func(*args)
+    return toPython(result, keepFunctions=False)
+
+
+class ProcessPool(object):
+    """A pool of worker processes running JavaScript.
+
+    A context is created and initialized once in the current process,
+    in the same way as for ``ContextPool`` (``init`` is a callable or
+    a script or sequence of scripts). Worker processes are then forked
+    from the current process, so that they inherit the initialized
+    context copy-on-write, and run jobs submitted through
+    ``evaluate`` and ``call`` in it. Results are converted by value
+    (see ``toPython``) and must be picklable. JavaScript exceptions
+    are raised in the caller as ``JSException`` objects preserving
+    the name and message of the original exception.
+
+    Workers are replaced by freshly forked ones after running
+    ``maxJobsPerWorker`` jobs (never if ``None``), which discards any
+    state jobs leave behind. Since forking a process while another
+    thread holds JavaScriptCore locks leaves the child blocked, the
+    JavaScript engine should not be used from other threads of the
+    current process while the pool is running.
+
+    This class requires the ``fork`` system call and uses the
+    ``multiprocessing`` module.
+    """
+
+    def __init__(self, processes=None, init=None, maxJobsPerWorker=None):
+        import multiprocessing
+
+        ctx = JSContext()
+        if callable(init):
+            init(ctx)
+        elif isinstance(init, types.StringTypes):
+            ctx.evaluateScript(init)
+        elif init is not None:
+            for script in init:
+                ctx.evaluateScript(script)
+
+        self._id = id(self)
+        _processPoolContexts[self._id] = ctx
+        self._pool = multiprocessing.Pool(processes,
+                                          maxtasksperchild=maxJobsPerWorker)
+
+    def evaluateAsync(self, script):
+        """Evaluate ``script`` in a worker. Return a
+        ``multiprocessing.pool.AsyncResult`` object."""
+        return self._pool.apply_async(_processPoolJob,
+                                      (self._id, script, None))
+
+    def evaluate(self, script):
+        """Evaluate ``script`` in a worker and return the result."""
+        return self.evaluateAsync(script).get()
+
+    def callAsync(self, funcName, *args):
+        """Call the function named ``funcName`` with arguments
+        ``args`` in a worker. Return a
+        ``multiprocessing.pool.AsyncResult`` object.
+
+        ``funcName`` is looked up in the global object and may be a
+        dotted name (e.g. ``'lib.util.format'``). Arguments must be
+        picklable."""
+        return self._pool.apply_async(_processPoolJob,
+                                      (self._id, funcName, args))
+
+    def call(self, funcName, *args):
+        """Call the function named ``funcName`` with arguments
+        ``args`` in a worker and return the result."""
+        return self.callAsync(funcName, *args).get()
+
+    def map(self, funcName, iterable):
+        """Call the function named ``funcName`` once for every
+        element of ``iterable``, distributing the calls among the
+        workers, and return the list of results."""
+        results = [self.callAsync(funcName, arg) for arg in iterable]
+        return [result.get() for result in results]
+
+    def close(self):
+        """Stop accepting jobs and wait for the workers to finish the
+        pending ones."""
+        self._pool.close()
+        self._pool.join()
+        _processPoolContexts.pop(self._id, None)
+
+    def terminate(self):
+        """Stop the workers immediately."""
+        self._pool.terminate()
+        self._pool.join()
+        _processPoolContexts.pop(self._id, None)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, excType, excValue, traceback):
+        self.close()
+        return False
+
+
 #
 # Debugging and testing operations
 #
 
 def _cachedStats():
     """Returns statistics about the wrappers cached in this moduel."""
-    return {'wrappedJSObjsCount': len(_pyWrappedJSObjs),
-            'wrappedPyObjsCount': len(_pyWrappedPyObjs),
+    cdef _GroupWrappers wrappers
+    cdef size_t jsObjsCount = 0
+    cdef size_t pyObjsCount = 0
+
+    for wrappers in _groupWrappers.itervalues():
+        jsObjsCount += wrappers.jsObjs.count
+        pyObjsCount += wrappers.pyObjs.count
+    return {'wrappedJSObjsCount': jsObjsCount,
+            'wrappedPyObjsCount': pyObjsCount,
+            'wrapperGroupsCount': len(_groupWrappers),
             }
@@ -50,6 +50,8 @@ cdef extern from "JavaScriptCore/JSBase.h":
     ctypedef OpaqueJSValue* JSValueRef
     ctypedef OpaqueJSValue* JSObjectRef
     
-    JSValueRef JSEvaluateScript(JSContextRef ctx, JSStringRef script, JSObjectRef thisObject, JSStringRef sourceURL, int startingLineNumber, JSValueRef* exception)
-    bool JSCheckScriptSyntax(JSContextRef ctx, JSStringRef script, JSStringRef sourceURL, int startingLineNumber, JSValueRef* exception)
-    void JSGarbageCollect(JSContextRef ctx)
+    # Functions that may run JavaScript code are declared nogil, so
+    # that they can be called with the GIL released.
+    JSValueRef JSEvaluateScript(JSContextRef ctx, JSStringRef script, JSObjectRef thisObject, JSStringRef sourceURL, int startingLineNumber, JSValueRef* exception) nogil
+    bool JSCheckScriptSyntax(JSContextRef ctx, JSStringRef script, JSStringRef sourceURL, int startingLineNumber, JSValueRef* exception) nogil
+    void JSGarbageCollect(JSContextRef ctx) nogil
@@ -1,9 +1,11 @@
 cdef extern from "JavaScriptCore/JSContextRef.h":
     JSObjectRef JSContextGetGlobalObject(JSContextRef ctx)
 
+    JSContextGroupRef JSContextGetGroup(JSContextRef ctx)
+
     JSContextGroupRef JSContextGroupCreate()
 
-    void JSContextGroupRelease(JSContextGroupRef group)
+    void JSContextGroupRelease(JSContextGroupRef group) nogil
 
     JSContextGroupRef JSContextGroupRetain(
         JSContextGroupRef group)
@@ -16,7 +18,7 @@ cdef extern from "JavaScriptCore/JSContextRef.h":
         JSClassRef globalObjectClass)
 
     void JSGlobalContextRelease(
-        JSGlobalContextRef ctx)
+        JSGlobalContextRef ctx) nogil
 
     JSGlobalContextRef JSGlobalContextRetain(
-        JSGlobalContextRef ctx)
+        JSGlobalContextRef ctx) nogil
@@ -109,12 +109,13 @@ cdef extern from "JavaScriptCore/JSObjectRef.h":
         JSObjectConvertToTypeCallback convertToType
 
     JSClassRef JSClassCreate(JSClassDefinition* definition)
+    void JSClassRelease(JSClassRef jsClass)
 
     JSValueRef JSObjectCallAsFunction(JSContextRef ctx, JSObjectRef object,
                                       JSObjectRef thisObject,
                                       size_t argumentCount,
                                       JSValueRef arguments[],
-                                      JSValueRef* exception)
+                                      JSValueRef* exception) nogil
 
     JSPropertyNameArrayRef JSObjectCopyPropertyNames(JSContextRef ctx,
                                                      JSObjectRef object)
@@ -144,6 +145,10 @@ cdef extern from "JavaScriptCore/JSObjectRef.h":
     JSObjectRef JSObjectMake(JSContextRef ctx, JSClassRef jsClass,
                              void *data)
 
+    JSObjectRef JSObjectMakeArray(JSContextRef ctx, size_t argumentCount,
+                                  JSValueRef arguments[],
+                                  JSValueRef* exception)
+
     JSObjectRef JSObjectMakeError(JSContextRef ctx, size_t argumentCount,
                                   JSValueRef arguments[],
                                   JSValueRef* exception)
@@ -0,0 +1,110 @@
+/* This file is part of PyJavaScriptCore, a binding between CPython and
+ * WebKit's JavaScriptCore.
+ *
+ * PyJavaScriptCore is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public License
+ * as published by the Free Software Foundation; either version 2 of
+ * the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the
+ * Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+ * Boston, MA 02111-1307, USA.
+ */
+
+/* Some useful JavaScriptCore functions are only part of its private
+ * API, whose headers are not installed. This header looks them up at
+ * run time, so that the module works (with reduced functionality)
+ * when the library doesn't export them. The PyJSC_ wrappers return
+ * failure values when the corresponding function is missing. */
+
+#ifndef PYJSC_JSPRIVATE_H
+#define PYJSC_JSPRIVATE_H
+
+#include <stddef.h>
+#include <dlfcn.h>
+#include <JavaScriptCore/JSBase.h>
+#include <JavaScriptCore/JSValueRef.h>
+
+static void *
+PyJSC_LookupPrivate(const char *name)
+{
+    return dlsym(RTLD_DEFAULT, name);
+}
+
+/* From JSBasePrivate.h. Returns an object with the heap statistics of
+ * the context group (heapSize, objectCount, etc.). */
+
+typedef JSObjectRef (*PyJSC_GetMemoryUsageStatisticsFunc)(JSContextRef ctx);
+
+static JSObjectRef
+PyJSC_GetMemoryUsageStatistics(JSContextRef ctx)
+{
+    static int resolved = 0;
+    static PyJSC_GetMemoryUsageStatisticsFunc func = NULL;
+
+    if (!resolved) {
+        func = (PyJSC_GetMemoryUsageStatisticsFunc)
+            PyJSC_LookupPrivate("JSGetMemoryUsageStatistics");
+        resolved = 1;
+    }
+    return func != NULL ? func(ctx) : NULL;
+}
+
+/* From JSContextRefPrivate.h. The callback is invoked on the thread
+ * running JavaScript every time the group has been executing for the
+ * given number of seconds, and the script is terminated if it returns
+ * true. PyJSC_HaveExecutionTimeLimit tells whether these functions
+ * are available. */
+
+typedef bool (*PyJSC_ShouldTerminateCallback)(JSContextRef ctx,
+                                              void *context);
+typedef void (*PyJSC_SetExecutionTimeLimitFunc)(
+    JSContextGroupRef group, double limit,
+    PyJSC_ShouldTerminateCallback callback, void *context);
+typedef void (*PyJSC_ClearExecutionTimeLimitFunc)(JSContextGroupRef group);
+
+static PyJSC_SetExecutionTimeLimitFunc PyJSC_setExecutionTimeLimit = NULL;
+static PyJSC_ClearExecutionTimeLimitFunc PyJSC_clearExecutionTimeLimit =
+    NULL;
+
+static int
+PyJSC_HaveExecutionTimeLimit(void)
+{
+    static int resolved = 0;
+
+    if (!resolved) {
+        PyJSC_setExecutionTimeLimit = (PyJSC_SetExecutionTimeLimitFunc)
+            PyJSC_LookupPrivate("JSContextGroupSetExecutionTimeLimit");
+        PyJSC_clearExecutionTimeLimit = (PyJSC_ClearExecutionTimeLimitFunc)
+            PyJSC_LookupPrivate("JSContextGroupClearExecutionTimeLimit");
+        resolved = 1;
+    }
+    return PyJSC_setExecutionTimeLimit != NULL &&
+        PyJSC_clearExecutionTimeLimit != NULL;
+}
+
+static void
+PyJSC_ContextGroupSetExecutionTimeLimit(JSContextGroupRef group,
+                                        double limit,
+                                        PyJSC_ShouldTerminateCallback
+                                        callback,
+                                        void *context)
+{
+    if (PyJSC_HaveExecutionTimeLimit())
+        PyJSC_setExecutionTimeLimit(group, limit, callback, context);
+}
+
+static void
+PyJSC_ContextGroupClearExecutionTimeLimit(JSContextGroupRef group)
+{
+    if (PyJSC_HaveExecutionTimeLimit())
+        PyJSC_clearExecutionTimeLimit(group);
+}
+
+#endif /* PYJSC_JSPRIVATE_H */
@@ -0,0 +1,36 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA.
+
+# Functions from the private JavaScriptCore API, looked up at run
+# time. See jsprivate.h.
+
+cdef extern from "jsprivate.h":
+
+    JSObjectRef PyJSC_GetMemoryUsageStatistics(JSContextRef ctx)
+
+    ctypedef bool (*PyJSC_ShouldTerminateCallback)(JSContextRef ctx,
+                                                   void *context)
+
+    int PyJSC_HaveExecutionTimeLimit()
+
+    void PyJSC_ContextGroupSetExecutionTimeLimit(
+        JSContextGroupRef group, double limit,
+        PyJSC_ShouldTerminateCallback callback, void *context) nogil
+
+    void PyJSC_ContextGroupClearExecutionTimeLimit(
+        JSContextGroupRef group) nogil
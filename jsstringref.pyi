@@ -22,6 +22,8 @@
 cdef extern from "JavaScriptCore/JSStringRef.h":
     ctypedef unsigned short JSChar
     void JSStringRelease(JSStringRef string)
+    JSStringRef JSStringRetain(JSStringRef string)
+    bool JSStringIsEqual(JSStringRef a, JSStringRef b)
     JSStringRef JSStringCreateWithUTF8CString(char* string)
     JSStringRef JSStringCreateWithCharacters(JSChar* chars, size_t numChars)
     size_t JSStringGetLength(JSStringRef string)
@@ -0,0 +1,138 @@
+/* This file is part of PyJavaScriptCore, a binding between CPython and
+ * WebKit's JavaScriptCore.
+ *
+ * PyJavaScriptCore is free software; you can redistribute it and/or
+ * modify it under the terms of the GNU Lesser General Public License
+ * as published by the Free Software Foundation; either version 2 of
+ * the License, or (at your option) any later version.
+ *
+ * This library is distributed in the hope that it will be useful,
+ * but WITHOUT ANY WARRANTY; without even the implied warranty of
+ * MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+ * Lesser General Public License for more details.
+ *
+ * You should have received a copy of the GNU Lesser General Public
+ * License along with this library; if not, write to the
+ * Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+ * Boston, MA 02111-1307, USA.
+ */
+
+/* The typed array API (JavaScriptCore/JSTypedArray.h) is only
+ * available in recent versions of JavaScriptCore. When it is missing,
+ * this header provides stand-ins that always fail, so that the module
+ * can still be built. PYJSC_HAVE_TYPED_ARRAYS tells which is the
+ * case. */
+
+#ifndef PYJSC_JSTYPEDARRAY_H
+#define PYJSC_JSTYPEDARRAY_H
+
+#include <stddef.h>
+#include <JavaScriptCore/JSBase.h>
+#include <JavaScriptCore/JSValueRef.h>
+
+#if defined(__has_include)
+#  if __has_include(<JavaScriptCore/JSTypedArray.h>)
+#    include <JavaScriptCore/JSTypedArray.h>
+#    define PYJSC_HAVE_TYPED_ARRAYS 1
+#  endif
+#endif
+
+#ifndef PYJSC_HAVE_TYPED_ARRAYS
+#define PYJSC_HAVE_TYPED_ARRAYS 0
+
+typedef enum {
+    kJSTypedArrayTypeInt8Array,
+    kJSTypedArrayTypeInt16Array,
+    kJSTypedArrayTypeInt32Array,
+    kJSTypedArrayTypeUint8Array,
+    kJSTypedArrayTypeUint8ClampedArray,
+    kJSTypedArrayTypeUint16Array,
+    kJSTypedArrayTypeUint32Array,
+    kJSTypedArrayTypeFloat32Array,
+    kJSTypedArrayTypeFloat64Array,
+    kJSTypedArrayTypeArrayBuffer,
+    kJSTypedArrayTypeNone
+} JSTypedArrayType;
+
+typedef void (*JSTypedArrayBytesDeallocator)(void *bytes,
+                                             void *deallocatorContext);
+
+static JSTypedArrayType
+JSValueGetTypedArrayType(JSContextRef ctx, JSValueRef value,
+                         JSValueRef *exception)
+{
+    return kJSTypedArrayTypeNone;
+}
+
+static JSObjectRef
+JSObjectMakeTypedArray(JSContextRef ctx, JSTypedArrayType arrayType,
+                       size_t length, JSValueRef *exception)
+{
+    return NULL;
+}
+
+static JSObjectRef
+JSObjectMakeArrayBufferWithBytesNoCopy(JSContextRef ctx, void *bytes,
+                                       size_t byteLength,
+                                       JSTypedArrayBytesDeallocator
+                                       bytesDeallocator,
+                                       void *deallocatorContext,
+                                       JSValueRef *exception)
+{
+    return NULL;
+}
+
+static JSObjectRef
+JSObjectMakeTypedArrayWithArrayBuffer(JSContextRef ctx,
+                                      JSTypedArrayType arrayType,
+                                      JSObjectRef buffer,
+                                      JSValueRef *exception)
+{
+    return NULL;
+}
+
+static void *
+JSObjectGetTypedArrayBytesPtr(JSContextRef ctx, JSObjectRef object,
+                              JSValueRef *exception)
+{
+    return NULL;
+}
+
+static size_t
+JSObjectGetTypedArrayByteLength(JSContextRef ctx, JSObjectRef object,
+                                JSValueRef *exception)
+{
+    return 0;
+}
+
+static size_t
+JSObjectGetTypedArrayByteOffset(JSContextRef ctx, JSObjectRef object,
+                                JSValueRef *exception)
+{
+    return 0;
+}
+
+static JSObjectRef
+JSObjectGetTypedArrayBuffer(JSContextRef ctx, JSObjectRef object,
+                            JSValueRef *exception)
+{
+    return NULL;
+}
+
+static void *
+JSObjectGetArrayBufferBytesPtr(JSContextRef ctx, JSObjectRef object,
+                               JSValueRef *exception)
+{
+    return NULL;
+}
+
+static size_t
+JSObjectGetArrayBufferByteLength(JSContextRef ctx, JSObjectRef object,
+                                 JSValueRef *exception)
+{
+    return 0;
+}
+
+#endif /* !PYJSC_HAVE_TYPED_ARRAYS */
+
+#endif /* PYJSC_JSTYPEDARRAY_H */
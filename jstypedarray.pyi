@@ -0,0 +1,78 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# Copyright (C) 2009, Martin Soto <soto@freedesktop.org>
+# Copyright (C) 2009, john paul janecek (see README file)
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA. 
+
+# Typed arrays are only supported by recent versions of
+# JavaScriptCore. See jstypedarray.h.
+
+cdef extern from "jstypedarray.h":
+
+    int PYJSC_HAVE_TYPED_ARRAYS
+
+    ctypedef enum JSTypedArrayType:
+        kJSTypedArrayTypeInt8Array, kJSTypedArrayTypeInt16Array,
+        kJSTypedArrayTypeInt32Array, kJSTypedArrayTypeUint8Array,
+        kJSTypedArrayTypeUint8ClampedArray, kJSTypedArrayTypeUint16Array,
+        kJSTypedArrayTypeUint32Array, kJSTypedArrayTypeFloat32Array,
+        kJSTypedArrayTypeFloat64Array, kJSTypedArrayTypeArrayBuffer,
+        kJSTypedArrayTypeNone
+
+    ctypedef void (*JSTypedArrayBytesDeallocator) (
+        void* bytes, void* deallocatorContext)
+
+    JSTypedArrayType JSValueGetTypedArrayType(JSContextRef ctx,
+                                              JSValueRef value,
+                                              JSValueRef* exception)
+
+    JSObjectRef JSObjectMakeTypedArray(JSContextRef ctx,
+                                       JSTypedArrayType arrayType,
+                                       size_t length,
+                                       JSValueRef* exception)
+
+    JSObjectRef JSObjectMakeArrayBufferWithBytesNoCopy(
+        JSContextRef ctx, void* bytes, size_t byteLength,
+        JSTypedArrayBytesDeallocator bytesDeallocator,
+        void* deallocatorContext, JSValueRef* exception)
+
+    JSObjectRef JSObjectMakeTypedArrayWithArrayBuffer(
+        JSContextRef ctx, JSTypedArrayType arrayType, JSObjectRef buffer,
+        JSValueRef* exception)
+
+    void* JSObjectGetTypedArrayBytesPtr(JSContextRef ctx, JSObjectRef object,
+                                        JSValueRef* exception)
+
+    size_t JSObjectGetTypedArrayByteLength(JSContextRef ctx,
+                                           JSObjectRef object,
+                                           JSValueRef* exception)
+
+    size_t JSObjectGetTypedArrayByteOffset(JSContextRef ctx,
+                                           JSObjectRef object,
+                                           JSValueRef* exception)
+
+    JSObjectRef JSObjectGetTypedArrayBuffer(JSContextRef ctx,
+                                            JSObjectRef object,
+                                            JSValueRef* exception)
+
+    void* JSObjectGetArrayBufferBytesPtr(JSContextRef ctx, JSObjectRef object,
+                                         JSValueRef* exception)
+
+    size_t JSObjectGetArrayBufferByteLength(JSContextRef ctx,
+                                            JSObjectRef object,
+                                            JSValueRef* exception)
@@ -32,6 +32,10 @@ cdef extern from "JavaScriptCore/JSValueRef.h":
     
     bool JSValueIsObject(JSContextRef ctx, JSValueRef value)
 
+    bool JSValueIsInstanceOfConstructor(JSContextRef ctx, JSValueRef value,
+                                        JSObjectRef constructor,
+                                        JSValueRef* exception)
+
     bool JSValueIsStrictEqual(JSContextRef ctx, JSValueRef a, JSValueRef b)
 
     bool JSValueIsUndefined(JSContextRef ctx, JSValueRef value)
@@ -40,18 +44,24 @@ cdef extern from "JavaScriptCore/JSValueRef.h":
 
     JSValueRef JSValueMakeNull(JSContextRef ctx)
 
-    JSValueRef JSValueMakeNumber(JSContextRef ctx, double number)
+    JSValueRef JSValueMakeNumber(JSContextRef ctx, double number) nogil
 
     JSValueRef JSValueMakeString(JSContextRef ctx, JSStringRef string)
 
+    JSValueRef JSValueMakeFromJSONString(JSContextRef ctx, JSStringRef string)
+
+    JSStringRef JSValueCreateJSONString(JSContextRef ctx, JSValueRef value,
+                                        unsigned indent,
+                                        JSValueRef* exception)
+
     JSValueRef JSValueMakeUndefined(JSContextRef ctx)
 
     bool JSValueToBoolean(JSContextRef ctx, JSValueRef value)
 
-    void JSValueProtect(JSContextRef ctx, JSValueRef value)
+    void JSValueProtect(JSContextRef ctx, JSValueRef value) nogil
 
     double JSValueToNumber(JSContextRef ctx, JSValueRef value,
-                           JSValueRef* exception)
+                           JSValueRef* exception) nogil
 
     JSObjectRef JSValueToObject(JSContextRef ctx, JSValueRef value,
                                 JSValueRef* exception)
@@ -59,4 +69,4 @@ cdef extern from "JavaScriptCore/JSValueRef.h":
     JSStringRef JSValueToStringCopy(JSContextRef ctx, JSValueRef value,
                                     JSValueRef* exception)
 
-    void JSValueUnprotect(JSContextRef ctx, JSValueRef value)
+    void JSValueUnprotect(JSContextRef ctx, JSValueRef value) nogil
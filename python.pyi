@@ -31,5 +31,31 @@ cdef extern from "Python.h":
 
     char* PyString_AsString(object o)
 
+    object PyTuple_New(Py_ssize_t size)
+    void PyTuple_SET_ITEM(object p, Py_ssize_t pos, object o)
+
     object PyUnicode_DecodeUTF16(Py_UNICODE *u, Py_ssize_t size,
                                  char *errors, int byteorder)
+
+    enum:
+        PyBUF_SIMPLE, PyBUF_WRITABLE, PyBUF_FORMAT, PyBUF_ND,
+        PyBUF_STRIDES, PyBUF_C_CONTIGUOUS
+
+    int PyObject_GetBuffer(object obj, Py_buffer *view,
+                           int flags) except -1
+    void PyBuffer_Release(Py_buffer *view)
+    int PyBuffer_FillInfo(Py_buffer *view, object obj, void *buf,
+                          Py_ssize_t len, int readonly, int flags) except -1
+    int PyObject_CheckBuffer(object obj)
+
+    # Old buffer protocol.
+    int PyObject_AsReadBuffer(object obj, void **buffer,
+                              Py_ssize_t *buffer_len) except -1
+    int PyObject_AsWriteBuffer(object obj, void **buffer,
+                               Py_ssize_t *buffer_len) except -1
+
+cdef extern from "pythread.h":
+    int PyThread_create_key()
+    int PyThread_set_key_value(int key, void *value)
+    void *PyThread_get_key_value(int key) nogil
+    void PyThread_delete_key_value(int key)
@@ -0,0 +1,677 @@
+# This file is part of PyJavaScriptCore, a binding between CPython and
+# WebKit's JavaScriptCore.
+#
+# Copyright (C) 2009, Martin Soto <soto@freedesktop.org>
+#
+# PyJavaScriptCore is free software; you can redistribute it and/or
+# modify it under the terms of the GNU Lesser General Public License
+# as published by the Free Software Foundation; either version 2 of
+# the License, or (at your option) any later version.
+#
+# This library is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE. See the GNU
+# Lesser General Public License for more details.
+#
+# You should have received a copy of the GNU Lesser General Public
+# License along with this library; if not, write to the
+# Free Software Foundation, Inc., 59 Temple Place - Suite 330,
+# Boston, MA 02111-1307, USA. 
+
+import unittest
+import threading
+import time
+import gc
+
+import javascriptcore as jscore
+
+
+class ContextPoolTestCase(unittest.TestCase):
+    """Test pools of pre-initialized contexts."""
+
+    def testInitScripts(self):
+        pool = jscore.ContextPool(2, init=['a = 1', 'b = a + 1'])
+        with pool.context() as ctx:
+            self.assertEqual(ctx.evaluateScript('b'), 2)
+        self.assertEqual(pool.stats()['created'], 2)
+
+    def testInitCallable(self):
+        def init(ctx):
+            ctx.globalObject.x = 5
+        pool = jscore.ContextPool(1, init=init)
+        with pool.context() as ctx:
+            self.assertEqual(ctx.evaluateScript('x'), 5)
+
+    def testReuse(self):
+        pool = jscore.ContextPool(1)
+        ctx1 = pool.checkout()
+        pool.checkin(ctx1)
+        ctx2 = pool.checkout()
+        self.assertTrue(ctx1 is ctx2)
+        pool.checkin(ctx2)
+
+    def testTimeout(self):
+        pool = jscore.ContextPool(1)
+        ctx = pool.checkout()
+        self.assertRaises(jscore.ContextPoolTimeout, pool.checkout, 0.01)
+        pool.checkin(ctx)
+
+    def testWait(self):
+        pool = jscore.ContextPool(1)
+        ctx = pool.checkout()
+        timer = threading.Timer(0.05, pool.checkin, [ctx])
+        timer.start()
+        ctx2 = pool.checkout(5)
+        self.assertTrue(ctx2 is ctx)
+        pool.checkin(ctx2)
+        timer.join()
+        self.assertEqual(pool.stats()['waits'], 1)
+
+    def testMaxUses(self):
+        pool = jscore.ContextPool(1, maxUses=2)
+        ctx1 = pool.checkout()
+        pool.checkin(ctx1)
+        self.assertTrue(pool.checkout() is ctx1)
+        pool.checkin(ctx1)
+        ctx2 = pool.checkout()
+        self.assertFalse(ctx2 is ctx1)
+        pool.checkin(ctx2)
+        self.assertEqual(pool.stats()['retired'], 1)
+
+    def testReset(self):
+        def reset(ctx):
+            if ctx.evaluateScript('typeof dirty') != 'undefined':
+                raise ValueError
+        pool = jscore.ContextPool(1, reset=reset)
+        with pool.context() as ctx1:
+            pass
+        with pool.context() as ctx2:
+            self.assertTrue(ctx2 is ctx1)
+            ctx2.evaluateScript('dirty = 1')
+        with pool.context() as ctx3:
+            self.assertFalse(ctx3 is ctx1)
+        self.assertEqual(pool.stats()['resetFailures'], 1)
+
+    def testEvictIdle(self):
+        pool = jscore.ContextPool(2, maxIdle=0.001)
+        time.sleep(0.01)
+        pool.evictIdle()
+        stats = pool.stats()
+        self.assertEqual(stats['idle'], 0)
+        self.assertEqual(stats['evicted'], 2)
+
+    def testStats(self):
+        pool = jscore.ContextPool(2, prewarm=False)
+        self.assertEqual(pool.stats()['count'], 0)
+        with pool.context():
+            stats = pool.stats()
+            self.assertEqual(stats['busy'], 1)
+            self.assertEqual(stats['checkouts'], 1)
+        self.assertTrue(pool.stats(reset=True)['utilization'] > 0)
+        self.assertEqual(pool.stats()['checkouts'], 0)
+
+    def testClose(self):
+        pool = jscore.ContextPool(1)
+        pool.close()
+        self.assertRaises(ValueError, pool.checkout)
+
+
+class ContextGroupTestCase(unittest.TestCase):
+    """Test contexts sharing a context group."""
+
+    def setUp(self):
+        self.group = jscore.JSContextGroup()
+        self.ctx1 = jscore.JSContext(group=self.group)
+        self.ctx2 = jscore.JSContext(group=self.group)
+
+    def tearDown(self):
+        del self.ctx1
+        del self.ctx2
+        del self.group
+
+    def testGroup(self):
+        self.assertTrue(self.ctx1.group is self.group)
+        self.assertTrue(self.ctx1.sameGroup(self.ctx2))
+        self.assertTrue(jscore.JSContext().group is None)
+        self.assertFalse(self.ctx1.sameGroup(jscore.JSContext()))
+
+    def testShareObject(self):
+        obj = self.ctx1.evaluateScript('({a: 1})')
+        self.ctx2.globalObject.obj = obj
+        self.assertEqual(self.ctx2.evaluateScript('obj.a'), 1)
+        self.ctx2.evaluateScript('obj.a = 2')
+        self.assertEqual(obj.a, 2)
+        self.assertTrue(self.ctx2.evaluateScript('obj') is obj)
+
+    def testShareFunction(self):
+        f = self.ctx1.evaluateScript('(function (x) {return x * 2})')
+        self.ctx2.globalObject.f = f
+        self.assertEqual(self.ctx2.evaluateScript('f(4)'), 8)
+
+    def testOtherGroup(self):
+        ctx3 = jscore.JSContext()
+        obj = self.ctx1.evaluateScript('({a: 1})')
+        def code(): ctx3.globalObject.obj = obj
+        self.assertRaises(ValueError, code)
+
+    def testPythonObject(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 3
+        ctx3 = jscore.JSContext()
+        self.ctx1.globalObject.a = a
+        self.ctx2.globalObject.a = a
+        ctx3.globalObject.a = a
+        self.assertTrue(self.ctx1.evaluateScript('a') is a)
+        self.assertTrue(ctx3.evaluateScript('a') is a)
+        self.assertEqual(ctx3.evaluateScript('a.x'), 3)
+        self.ctx1.globalObject.b = self.ctx2.globalObject.a
+        self.assertTrue(self.ctx1.evaluateScript('a === b'))
+
+    def testBadGroup(self):
+        self.assertRaises(TypeError, jscore.JSContext, group=1)
+
+
+class ThreadingTestCase(unittest.TestCase):
+    """Run JavaScript in several threads."""
+
+    def testGILReleased(self):
+        ctx = jscore.JSContext()
+        started = threading.Event()
+        done = threading.Event()
+        count = [0]
+        samples = []
+
+        def start():
+            samples.append(count[0])
+            started.set()
+
+        ctx.globalObject.started = start
+        ctx.globalObject.sample = lambda: samples.append(count[0])
+
+        def run():
+            ctx.evaluateScript("""
+              started();
+              var t = Date.now();
+              while (Date.now() - t < 300) {}
+              sample();
+              """)
+            done.set()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        started.wait()
+        while not done.is_set():
+            count[0] += 1
+        thread.join()
+        # The main thread must have made progress while the script
+        # was running, not only after it returned.
+        self.assertTrue(samples[1] - samples[0] > 1000)
+
+    def testStress(self):
+        results = {}
+        errors = []
+
+        def run(n):
+            try:
+                ctx = jscore.JSContext()
+                ctx.globalObject.pyAdd = lambda x, y: x + y
+                f = ctx.evaluateScript("""
+                  (function (n) {
+                    var s = 0;
+                    for (var i = 0; i < n; i++) {
+                      s = pyAdd(s, i);
+                    }
+                    return s;
+                  })""")
+                for i in xrange(20):
+                    results[n] = f(n)
+                    obj = ctx.evaluateScript('({a: %d})' % n)
+                    if obj.a != n:
+                        errors.append(n)
+            except Exception, e:
+                errors.append(e)
+
+        threads = [threading.Thread(target=run, args=(100 + i,))
+                   for i in xrange(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        for n, result in results.items():
+            self.assertEqual(result, n * (n - 1) / 2)
+
+
+class ProcessPoolTestCase(unittest.TestCase):
+    """Test pools of worker processes."""
+
+    def testEvaluate(self):
+        with jscore.ProcessPool(2, init='var base = 10;') as pool:
+            self.assertEqual(pool.evaluate('base + 1'), 11)
+            self.assertEqual(pool.evaluate('({a: [1, base], b: null})'),
+                             {'a': [1, 10], 'b': jscore.Null})
+
+    def testCall(self):
+        init = ['var lib = {}',
+                'lib.add = function (x, y) { return x + y; }']
+        with jscore.ProcessPool(2, init=init) as pool:
+            self.assertEqual(pool.call('lib.add', 2, 3), 5)
+            self.assertEqual(pool.call('lib.add', 'a', 'b'), 'ab')
+
+    def testMap(self):
+        init = 'function square(x) { return x * x; }'
+        with jscore.ProcessPool(3, init=init) as pool:
+            self.assertEqual(pool.map('square', range(10)),
+                             [x * x for x in range(10)])
+
+    def testException(self):
+        with jscore.ProcessPool(1) as pool:
+            try:
+                pool.evaluate('throw new TypeError("bad value")')
+            except jscore.JSException, e:
+                self.assertEqual(e.name, 'TypeError')
+                self.assertEqual(e.message, 'bad value')
+            else:
+                self.fail('JSException not raised')
+
+    def testRecycle(self):
+        init = 'var count = 0; function next() { return ++count; }'
+        with jscore.ProcessPool(1, init=init, maxJobsPerWorker=1) as pool:
+            self.assertEqual([pool.call('next') for i in xrange(3)],
+                             [1, 1, 1])
+
+        with jscore.ProcessPool(1, init=init) as pool:
+            self.assertEqual([pool.call('next') for i in xrange(3)],
+                             [1, 2, 3])
+
+
+class AsyncTestCase(unittest.TestCase):
+    """Test asynchronous evaluation and calls."""
+
+    def setUp(self):
+        self.ctx = jscore.JSContext()
+
+    def tearDown(self):
+        del self.ctx
+
+    def testEvaluateAsync(self):
+        future = self.ctx.evaluateAsync('1 + 2')
+        self.assertEqual(future.result(5), 3)
+        self.assertTrue(future.done())
+        self.assertEqual(future.exception(), None)
+
+    def testCallAsync(self):
+        f = self.ctx.evaluateScript('(function (x, y) { return x * y; })')
+        futures = [f.callAsync(i, 2) for i in xrange(10)]
+        self.assertEqual([future.result(5) for future in futures],
+                         [i * 2 for i in xrange(10)])
+
+        obj = self.ctx.evaluateScript(
+            '({a: 5, f: function (x) { return this.a + x; }})')
+        self.assertEqual(obj.f.callAsync(1).result(5), 6)
+
+    def testException(self):
+        future = self.ctx.evaluateAsync('throw new TypeError("bad")')
+        self.assertRaises(jscore.JSException, future.result, 5)
+        self.assertEqual(future.exception().name, 'TypeError')
+
+    def testDoneCallback(self):
+        done = threading.Event()
+        results = []
+
+        def callback(future):
+            results.append(future.result())
+            done.set()
+
+        future = self.ctx.evaluateAsync('"abc"')
+        future.addDoneCallback(callback)
+        done.wait(5)
+        self.assertEqual(results, ['abc'])
+
+        # Callbacks added to settled futures are called immediately.
+        future.addDoneCallback(callback)
+        self.assertEqual(results, ['abc', 'abc'])
+
+    def testPromise(self):
+        future = self.ctx.evaluateAsync('Promise.resolve(42)')
+        self.assertEqual(future.result(5), 42)
+
+        future = self.ctx.evaluateAsync(
+            'Promise.reject(new RangeError("out of range"))')
+        self.assertRaises(jscore.JSException, future.result, 5)
+        self.assertEqual(future.exception().name, 'RangeError')
+        self.assertEqual(future.exception().message, 'out of range')
+
+    def testPendingPromise(self):
+        ready = threading.Event()
+        resolvers = []
+
+        def keep(resolve):
+            resolvers.append(resolve)
+            ready.set()
+
+        self.ctx.globalObject.keep = keep
+        future = self.ctx.evaluateAsync(
+            'new Promise(function (resolve) { keep(resolve); })')
+        ready.wait(5)
+        self.assertRaises(jscore.JSFutureTimeout, future.result, 0.1)
+        self.assertFalse(future.done())
+
+        resolvers[0]('resolved')
+        self.assertEqual(future.result(5), 'resolved')
+        del resolvers[:]
+
+
+class BoundaryStatsTestCase(unittest.TestCase):
+    """Test boundary crossing statistics."""
+
+    def setUp(self):
+        self.ctx = jscore.JSContext()
+        jscore.setBoundaryStats(True)
+        jscore.boundaryStats(reset=True)
+
+    def tearDown(self):
+        jscore.setBoundaryStats(False)
+        del self.ctx
+
+    def testCalls(self):
+        f = self.ctx.evaluateScript('(function (x) { return x + 1; })')
+        for i in xrange(3):
+            f(i)
+        stats = self.ctx.boundaryStats()
+        self.assertEqual(stats['calls'], 3)
+        self.assertEqual(stats['evaluations'], 1)
+        self.assertEqual(stats['toJS']['number'], 3)
+        self.assertEqual(stats['toPython']['number'], 3)
+        self.assertEqual(jscore.boundaryStats()['calls'], 3)
+
+    def testCallbacks(self):
+        class A(object):
+            pass
+        a = A()
+        a.x = 1
+        self.ctx.globalObject.a = a
+        self.ctx.globalObject.f = lambda: None
+        self.ctx.evaluateScript('a.x; a.y = 2; delete a.y; f(); f()')
+        callbacks = self.ctx.boundaryStats()['callbacks']
+        self.assertEqual(callbacks['set'], 1)
+        self.assertEqual(callbacks['delete'], 1)
+        self.assertEqual(callbacks['call'], 2)
+        self.assertTrue(callbacks['get'] >= 1)
+
+    def testWrappers(self):
+        obj = self.ctx.evaluateScript('o = {}')
+        self.ctx.evaluateScript('o')
+        stats = self.ctx.boundaryStats()
+        self.assertEqual(stats['wrappersCreated'], 1)
+        self.assertEqual(stats['wrapperHits'], 1)
+
+    def testExceptions(self):
+        def f(): raise ValueError
+        self.ctx.globalObject.f = f
+        self.assertRaises(jscore.JSException,
+                          self.ctx.evaluateScript, 'f()')
+        stats = self.ctx.boundaryStats()
+        self.assertEqual(stats['exceptionsToJS'], 1)
+        self.assertEqual(stats['exceptionsToPython'], 1)
+
+    def testPerContext(self):
+        ctx2 = jscore.JSContext()
+        ctx2.evaluateScript('1')
+        self.assertEqual(self.ctx.boundaryStats()['evaluations'], 0)
+        self.assertEqual(ctx2.boundaryStats()['evaluations'], 1)
+        self.assertEqual(jscore.boundaryStats()['evaluations'], 1)
+
+    def testTiming(self):
+        jscore.setBoundaryStats(True, timing=True)
+        self.ctx.globalObject.f = lambda: time.sleep(0.01)
+        self.ctx.evaluateScript('f()')
+        self.assertTrue(self.ctx.boundaryStats()['callbackTimes']['call']
+                        >= 0.005)
+
+    def testResetAndDisable(self):
+        self.ctx.evaluateScript('1')
+        self.assertEqual(self.ctx.boundaryStats(reset=True)['evaluations'], 1)
+        self.assertEqual(self.ctx.boundaryStats()['evaluations'], 0)
+        jscore.setBoundaryStats(False)
+        self.ctx.evaluateScript('1')
+        self.assertEqual(self.ctx.boundaryStats()['evaluations'], 0)
+
+
+class ScopeTestCase(unittest.TestCase):
+    """Test handle scopes."""
+
+    def setUp(self):
+        self.ctx = jscore.JSContext()
+
+    def tearDown(self):
+        del self.ctx
+
+    def testRelease(self):
+        with self.ctx.scope() as scope:
+            objs = [self.ctx.evaluateScript('({a: %d})' % i)
+                    for i in xrange(100)]
+            self.assertEqual(len(scope), 100)
+            self.assertEqual(objs[5].a, 5)
+        self.assertEqual(len(scope), 0)
+        self.assertRaises(jscore.JSException, getattr, objs[5], 'a')
+
+    def testReleasedFunction(self):
+        with self.ctx.scope():
+            f = self.ctx.evaluateScript('(function () { return 1; })')
+            call = f.prepare([])
+        self.assertRaises(jscore.JSException, f)
+        self.assertRaises(ReferenceError, call)
+
+    def testPromote(self):
+        with self.ctx.scope() as scope:
+            obj = scope.promote(self.ctx.evaluateScript('({a: 1})'))
+            tmp = self.ctx.evaluateScript('({a: 2})')
+            self.assertEqual(scope.promote(5), 5)
+        self.assertEqual(obj.a, 1)
+        self.assertRaises(jscore.JSException, getattr, tmp, 'a')
+
+    def testNested(self):
+        with self.ctx.scope() as outer:
+            with self.ctx.scope() as inner:
+                obj = inner.promote(self.ctx.evaluateScript('({a: 1})'))
+                tmp = self.ctx.evaluateScript('({a: 2})')
+            self.assertEqual(obj.a, 1)
+            self.assertRaises(jscore.JSException, getattr, tmp, 'a')
+            self.assertEqual(len(outer), 1)
+        self.assertRaises(jscore.JSException, getattr, obj, 'a')
+
+    def testExistingWrappers(self):
+        obj = self.ctx.evaluateScript('o = {a: 1}')
+        with self.ctx.scope() as scope:
+            self.assertTrue(self.ctx.evaluateScript('o') is obj)
+            self.assertEqual(len(scope), 0)
+        self.assertEqual(obj.a, 1)
+
+    def testOtherGroup(self):
+        ctx2 = jscore.JSContext()
+        with self.ctx.scope() as scope:
+            obj = ctx2.evaluateScript('({a: 1})')
+            self.assertEqual(len(scope), 0)
+        self.assertEqual(obj.a, 1)
+
+    def testExportedBuffer(self):
+        with self.ctx.scope():
+            arr = self.ctx.evaluateScript('new Int32Array([1, 2])')
+            view = memoryview(arr)
+        self.assertEqual(view.tolist(), [1, 2])
+        self.assertEqual(arr[1], 2)
+        del view
+
+    def testReleasedArgument(self):
+        f = self.ctx.evaluateScript('(function (o) { return typeof o; })')
+        with self.ctx.scope():
+            obj = self.ctx.evaluateScript('({a: 1})')
+        self.assertRaises(ReferenceError, f, obj)
+
+    def testReuse(self):
+        scope = self.ctx.scope()
+        with scope:
+            self.assertRaises(ValueError, scope.__enter__)
+        with scope:
+            obj = self.ctx.evaluateScript('({})')
+            self.assertEqual(len(scope), 1)
+
+
+class GarbageCollectionTestCase(unittest.TestCase):
+    """Test garbage collection control and heap statistics."""
+
+    def setUp(self):
+        self.ctx = jscore.JSContext()
+
+    def tearDown(self):
+        jscore.setGCPolicy()
+        del self.ctx
+
+    def testCollectGarbage(self):
+        before = self.ctx.heapStats()['collections']
+        self.ctx.collectGarbage()
+        self.assertEqual(self.ctx.heapStats()['collections'], before + 1)
+
+    def testHeapStats(self):
+        obj = self.ctx.evaluateScript('({})')
+        stats = self.ctx.heapStats()
+        self.assertEqual(stats['wrappedJSObjects'], 1)
+        self.assertEqual(stats['wrappedPyObjects'], 0)
+        if 'objectCount' in stats:
+            self.assertTrue(stats['objectCount'] > 0)
+
+    def testReleasePolicy(self):
+        jscore.setGCPolicy(releases=10)
+        self.assertEqual(jscore.getGCPolicy(), (10, None))
+        before = self.ctx.heapStats()['collections']
+        for i in xrange(25):
+            self.ctx.evaluateScript('({})')
+        self.assertEqual(self.ctx.heapStats()['collections'], before + 2)
+
+    def testReleasePolicyGroups(self):
+        jscore.setGCPolicy(releases=10)
+        other = jscore.JSContext()
+        before = self.ctx.heapStats()['collections']
+        for i in xrange(5):
+            self.ctx.evaluateScript('({})')
+            other.evaluateScript('({})')
+        # Both groups had releases, both are collected when the next
+        # call returns.
+        self.ctx.evaluateScript('1')
+        self.assertEqual(self.ctx.heapStats()['collections'], before + 2)
+
+    def testGenerationPolicy(self):
+        jscore.setGCPolicy(generation=0)
+        self.assertEqual(jscore.getGCPolicy(), (None, 0))
+        before = self.ctx.heapStats()['collections']
+        gc.collect()
+        # The collection runs when the next call returns.
+        self.ctx.evaluateScript('1')
+        self.assertTrue(self.ctx.heapStats()['collections'] > before)
+
+    def testBadPolicy(self):
+        self.assertRaises(ValueError, jscore.setGCPolicy, releases=0)
+        self.assertRaises(ValueError, jscore.setGCPolicy, generation=3)
+
+
+class TimeoutTestCase(unittest.TestCase):
+    """Test execution time limits and script interruption."""
+
+    def setUp(self):
+        self.ctx = jscore.JSContext()
+        try:
+            self.ctx.interruptible = True
+        except NotImplementedError:
+            self.skipTest('execution time limits not supported')
+        self.ctx.interruptible = False
+
+    def tearDown(self):
+        del self.ctx
+
+    def testEvaluateTimeout(self):
+        start = time.time()
+        self.assertRaises(jscore.JSTimeoutError, self.ctx.evaluateScript,
+                          'while (true) {}', timeout=0.1)
+        self.assertTrue(time.time() - start < 5)
+        self.assertEqual(self.ctx.evaluateScript('1 + 1', timeout=0.1), 2)
+
+    def testDefaultTimeout(self):
+        self.assertEqual(self.ctx.timeout, None)
+        self.ctx.timeout = 0.1
+        self.assertEqual(self.ctx.timeout, 0.1)
+        f = self.ctx.evaluateScript('(function () { while (true) {} })')
+        self.assertRaises(jscore.JSTimeoutError, f)
+        self.ctx.timeout = None
+        self.assertEqual(self.ctx.timeout, None)
+
+    def testCallWithTimeout(self):
+        f = self.ctx.evaluateScript('(function (x) {'
+                                    '  while (x) {} return 1; })')
+        self.assertEqual(f.callWithTimeout(0.1, False), 1)
+        try:
+            f.callWithTimeout(0.1, True)
+        except jscore.JSTimeoutError, e:
+            self.assertFalse(e.interrupted)
+        else:
+            self.fail('JSTimeoutError not raised')
+
+    def testInterrupt(self):
+        self.ctx.interruptible = True
+        self.assertTrue(self.ctx.interruptible)
+        timer = threading.Timer(0.1, self.ctx.interrupt)
+        timer.start()
+        try:
+            self.ctx.evaluateScript('while (true) {}')
+        except jscore.JSTimeoutError, e:
+            self.assertTrue(e.interrupted)
+        else:
+            self.fail('JSTimeoutError not raised')
+        timer.join()
+        self.ctx.interruptible = False
+        self.assertFalse(self.ctx.interruptible)
+
+    def testInterruptNotInterruptible(self):
+        self.assertRaises(ValueError, self.ctx.interrupt)
+        self.ctx.interruptible = True
+        self.ctx.interrupt()
+
+    def testInterruptNested(self):
+        # Interrupting a call made from a callback doesn't terminate
+        # the call it runs in, which only sees a Python exception.
+        other = jscore.JSContext()
+        other.interruptible = True
+        self.ctx.interruptible = True
+
+        def callback():
+            timer = threading.Timer(0.1, other.interrupt)
+            timer.start()
+            try:
+                other.evaluateScript('while (true) {}')
+            finally:
+                timer.join()
+
+        self.ctx.globalObject.callback = callback
+        self.assertEqual(self.ctx.evaluateScript("""
+          try { callback(); 'no error' } catch (e) { 'caught' }
+          """), 'caught')
+
+    def testExceptionAfterTimeout(self):
+        self.assertRaises(jscore.JSTimeoutError, self.ctx.evaluateScript,
+                          'while (true) {}', timeout=0.1)
+        try:
+            self.ctx.evaluateScript('throw new Error("x")', timeout=1)
+        except jscore.JSTimeoutError:
+            self.fail('JSTimeoutError raised')
+        except jscore.JSException, e:
+            self.assertEqual(e.message, 'x')
+
+    def testBadTimeout(self):
+        self.assertRaises(ValueError, self.ctx.evaluateScript, '1',
+                          timeout=0)
+        def setTimeout():
+            self.ctx.timeout = -1
+        self.assertRaises(ValueError, setTimeout)
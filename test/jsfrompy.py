@@ -110,6 +110,55 @@ class EvaluateScriptTestCase(TestCaseWithContext):
         self.assertRaises(jscore.JSException, code)
 
 
+class CompileTestCase(TestCaseWithContext):
+    """Compile scripts and cache parameterized expressions."""
+
+    def testCompile1(self):
+        script = self.ctx.compile('a = (typeof a == "number") ? a + 1 : 1')
+        self.assertEqual(script(), 1)
+        self.assertEqual(script(), 2)
+        self.assertEqualJS('a', 2)
+
+    def testCompile2(self):
+        obj = self.ctx.evaluateScript('({x: 5})')
+        script = self.ctx.compile('this.x * 2')
+        self.assertEqual(script(obj), 10)
+
+    def testCompileError(self):
+        def code():
+            self.ctx.compile('(function(x){return x+2 return})(3)')
+
+        self.assertRaises(jscore.JSException, code)
+
+    def testFunction1(self):
+        f = self.ctx.function(['x', 'y'], 'return x * y;')
+        self.assertEqual(f(3, 4), 12)
+
+    def testFunction2(self):
+        f1 = self.ctx.function('x, y', 'return x * y;')
+        f2 = self.ctx.function(['x', 'y'], 'return x * y;')
+        self.assertTrue(f1 is f2)
+        self.assertEqual(self.ctx.functionCacheStats()['hits'], 1)
+
+    def testEvaluate1(self):
+        self.assertEqual(self.ctx.evaluate('a + b', a=1, b=2), 3)
+        self.assertEqual(self.ctx.evaluate('a + b', a='x', b='y'), 'xy')
+        stats = self.ctx.functionCacheStats()
+        self.assertEqual(stats['misses'], 1)
+        self.assertEqual(stats['hits'], 1)
+
+    def testEvaluate2(self):
+        self.assertEqual(self.ctx.evaluate('"a\'b"'), "a'b")
+        self.assertEqual(self.ctx.evaluate('a * 2 // twice', a=3), 6)
+
+    def testCacheSize(self):
+        self.ctx.functionCacheSize = 2
+        self.ctx.evaluate('1')
+        self.ctx.evaluate('2')
+        self.ctx.evaluate('3')
+        self.assertEqual(self.ctx.functionCacheStats()['count'], 2)
+
+
 class ContextLifeTestCase(unittest.TestCase):
     """Check that the context remains alive when Python still
     references some of its objects.
@@ -164,6 +213,22 @@ class WrapUnwrapTestCase(TestCaseWithContext):
         del obj2
         self.assertTrue(jscore._cachedStats()['wrappedJSObjsCount'] == l1)
 
+    def testCachedWrappers2(self):
+        l1 = jscore._cachedStats()['wrappedJSObjsCount']
+        objs = [self.ctx.evaluateScript("({c: %d})" % i)
+                for i in xrange(1000)]
+        self.assertEqual(jscore._cachedStats()['wrappedJSObjsCount'],
+                         l1 + 1000)
+        self.ctx.globalObject.arr = jscore.toJS(objs)
+        for i, obj in enumerate(asSeq(self.ctx.globalObject.arr).tolist()):
+            self.assertTrue(obj is objs[i])
+        self.ctx.evaluateScript("delete arr")
+        del objs[::2]
+        self.assertEqual(jscore._cachedStats()['wrappedJSObjsCount'],
+                         l1 + 500)
+        for i, obj in enumerate(objs):
+            self.assertEqual(obj.c, 2 * i + 1)
+
 
 class NullUndefTestCase(TestCaseWithContext):
     """Access JavaScript's null and undefined values."""
@@ -274,6 +339,73 @@ class FunctionCallTestCase(TestCaseWithContext):
         f = self.ctx.evaluateScript('(function() {throw Error("Message");})')
         self.assertRaises(jscore.JSException, f)
 
+    def testManyParams(self):
+        f = self.ctx.evaluateScript('(function() {return arguments.length})')
+        self.assertEqual(f(*range(8)), 8)
+        self.assertEqual(f(*range(9)), 9)
+        self.assertEqual(f(*range(100)), 100)
+
+    def testPrepare(self):
+        f = self.ctx.evaluateScript(
+            '(function(x, s, b) {return typeof x + typeof s + typeof b})')
+        p = f.prepare(['number', 'string', 'boolean'])
+        self.assertEqual(p(1, 2, 0), 'numberstringboolean')
+        p = f.prepare([float, unicode, bool])
+        self.assertEqual(p(1.5, u'x', True), 'numberstringboolean')
+
+    def testPrepareAny(self):
+        f = self.ctx.evaluateScript('(function(x, y) {return x === y})')
+        obj = self.ctx.evaluateScript('({})')
+        p = f.prepare(['object', 'any'])
+        self.assertTrue(p(obj, obj))
+        self.assertFalse(p(obj, 1))
+
+    def testCallMany(self):
+        f = self.ctx.evaluateScript('(function(x, y) {return x * y})')
+        rows = [(i, 2) for i in xrange(10)]
+        self.assertEqual(f.callMany(rows), [i * 2 for i in xrange(10)])
+        self.assertEqual(f.callMany([]), [])
+
+    def testCallManyChunk(self):
+        f = self.ctx.evaluateScript('(function(x, y) {return x * y})')
+        results = f.callMany(((i, 3) for i in xrange(10)), chunk=4)
+        self.assertEqual(results.next(), 0)
+        self.assertEqual(list(results), [i * 3 for i in xrange(1, 10)])
+        self.assertRaises(ValueError, f.callMany, [], chunk=0)
+
+    def testMap(self):
+        f = self.ctx.evaluateScript('(function(x) {return x + 1})')
+        self.assertEqual(f.map(xrange(5)), [1, 2, 3, 4, 5])
+        self.assertEqual(list(f.map('abc', chunk=2)), ['a1', 'b1', 'c1'])
+
+    def testCallManyError(self):
+        f = self.ctx.evaluateScript(
+            '(function(x) {if (x == 3) throw Error("three"); return x})')
+        try:
+            f.map(xrange(5))
+        except jscore.JSException, e:
+            self.assertEqual(e.rowIndex, 3)
+        else:
+            self.fail('JSException not raised')
+
+        try:
+            f.callMany([(1,), 2])
+        except TypeError, e:
+            self.assertEqual(e.rowIndex, 1)
+        else:
+            self.fail('TypeError not raised')
+
+    def testPrepareErrors(self):
+        f = self.ctx.evaluateScript('(function(x) {return x * 2})')
+        self.assertRaises(ValueError, f.prepare, ['complex'])
+        self.assertRaises(ValueError, f.prepare, ['any'] * 17)
+        p = f.prepare(['number'])
+        self.assertEqual(p(4), 8)
+        self.assertRaises(TypeError, p)
+        self.assertRaises(TypeError, p, 1, 2)
+        self.assertRaises(TypeError, p, 'x')
+        self.assertRaises(TypeError, f.prepare(['object']), 1)
+
 
 class MethodCallTestCase(TestCaseWithContext):
     """Call JavaScript methods from Python."""
@@ -311,6 +443,15 @@ class MethodCallTestCase(TestCaseWithContext):
         self.assertEqual(self.obj.i(), 1)
         self.assertEqual(self.obj.j(), 'x')
 
+    def testCallMany(self):
+        self.assertEqual(self.obj.f.callMany([(1, 2), (3, 4)]), [3, 7])
+        self.assertEqual(self.obj.g.map(['a', 'b']), ['a', 'b'])
+
+    def testPrepare(self):
+        p = self.obj.f.prepare(['number', 'number'])
+        self.assertEqual(p(7, 9), 16)
+        self.assertEqual(self.obj.i.prepare([])(), 1)
+
     def testBound(self):
         boundI = self.obj.i
         self.assertEqual(boundI(), 1)
@@ -321,6 +462,104 @@ class MethodCallTestCase(TestCaseWithContext):
         self.assertRaises(jscore.JSException, self.obj.k)
 
 
+class DeepConversionTestCase(TestCaseWithContext):
+    """Convert JavaScript object graphs into native Python values."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        self.obj = self.ctx.evaluateScript("""
+          ({a: 1,
+            b: [1, 'x', {c: null}],
+            d: {e: {f: 2.5}},
+            g: function () {}})
+          """)
+
+    def testDeep1(self):
+        res = jscore.toPython(self.obj)
+        self.assertTrue(isinstance(res, dict))
+        self.assertEqual(res['a'], 1)
+        self.assertEqual(res['b'], [1, 'x', {'c': jscore.Null}])
+        self.assertEqual(res['d'], {'e': {'f': 2.5}})
+        self.assertTrue(isinstance(res['g'], jscore.JSFunction))
+
+    def testShallow(self):
+        res = jscore.toPython(self.obj, deep=False)
+        self.assertEqual(res['a'], 1)
+        self.assertTrue(isinstance(res['d'], jscore.JSObject))
+
+    def testMaxDepth(self):
+        res = jscore.toPython(self.obj, maxDepth=2)
+        self.assertEqual(res['d'].keys(), ['e'])
+        self.assertTrue(isinstance(res['d']['e'], jscore.JSObject))
+
+    def testTuples(self):
+        res = jscore.toPython(self.obj, arrays='tuple')
+        self.assertEqual(res['b'], (1, 'x', {'c': jscore.Null}))
+
+    def testNoFunctions(self):
+        res = jscore.toPython(self.obj, keepFunctions=False)
+        self.assertFalse('g' in res)
+        res = jscore.toPython(self.ctx.evaluateScript(
+                "[1, function () {}]"), keepFunctions=False)
+        self.assertEqual(res, [1, None])
+
+    def testCycle(self):
+        obj = self.ctx.evaluateScript("var o = {a: 1}; o.self = o; o")
+        def code(): jscore.toPython(obj)
+        self.assertRaises(ValueError, code)
+        self.assertTrue(isinstance(jscore.toPython(obj, maxDepth=1)['self'],
+                                   jscore.JSObject))
+
+    def testShared(self):
+        res = jscore.toPython(self.ctx.evaluateScript(
+                "var o = {a: 1}; [o, o]"))
+        self.assertEqual(res, [{'a': 1}, {'a': 1}])
+
+    def testPrimitive(self):
+        self.assertEqual(jscore.toPython(5), 5)
+
+
+class JSONTestCase(TestCaseWithContext):
+    """Move JSON documents between Python and JavaScript."""
+
+    def testLoads1(self):
+        obj = self.ctx.loadsJSON('{"a": [1, 2, {"b": "x"}], "c": null}')
+        self.assertEqual(obj.a[2].b, 'x')
+        self.assertTrue(obj.c is jscore.Null)
+
+    def testLoads2(self):
+        self.assertEqual(self.ctx.loadsJSON('3'), 3)
+        self.assertEqual(self.ctx.loadsJSON('"x"'), 'x')
+
+    def testLoadsError(self):
+        def code(): self.ctx.loadsJSON('{a: 1')
+        self.assertRaises(ValueError, code)
+
+    def testDumps1(self):
+        obj = self.ctx.evaluateScript('({a: [1, 2]})')
+        self.assertEqual(self.ctx.dumpsJSON(obj), '{"a":[1,2]}')
+
+    def testDumps2(self):
+        self.assertEqual(self.ctx.dumpsJSON(jscore.toJS({'a': [1, 2]})),
+                         '{"a":[1,2]}')
+        self.assertTrue(self.ctx.dumpsJSON(None) is None)
+
+    def testRoundTrip(self):
+        text = '{"a":[1,2.5,"x",true,null],"b":{"c":{}}}'
+        self.assertEqual(self.ctx.dumpsJSON(self.ctx.loadsJSON(text)), text)
+
+    def testCallJSON1(self):
+        f = self.ctx.evaluateScript(
+            '(function (o, n) {return {sum: o.a + n, list: [n]}})')
+        self.assertEqual(f.callJSON('[{"a": 1}, 2]'), '{"sum":3,"list":[2]}')
+
+    def testCallJSON2(self):
+        f = self.ctx.evaluateScript('(function () {throw Error("x")})')
+        self.assertRaises(jscore.JSException, f.callJSON, '[]')
+        self.assertRaises(ValueError, f.callJSON, '3')
+        self.assertRaises(ValueError, f.callJSON, '{}')
+
+
 class MappingTestCase(TestCaseWithContext):
     """Test mapping behavior for wrapped JavaScript objects.
 
@@ -440,6 +679,49 @@ class MappingTestCase(TestCaseWithContext):
         def f(o): o.setdefault('a', 111); o.setdefault('x', 777)
         self.evalPy(f)
 
+    def testSetDefault2(self):
+        self.assertEqualFunc(lambda o: o.setdefault('c', 111), None)
+        self.assertEqualFunc(lambda o: o.setdefault('y', 888), 888)
+
+    def testGet2(self):
+        self.assertEqualFunc(lambda o: o.get('c', 3), None)
+        self.assertEqualFunc(lambda o: o.get('x'), None)
+
+    def testPop3(self):
+        self.assertEqualFunc(lambda o: o.pop('x', 3), 3)
+        self.assertEqualFunc(lambda o: o.pop('c', 3), None)
+
+    def testItems1(self):
+        self.assertEqualFunc(lambda o: sorted(o.items()))
+        self.assertEqualFunc(lambda o: sorted(o.values()))
+        self.assertEqualFunc(lambda o: sorted(o.keys()))
+
+    def testUpdate2(self):
+        def f(o): o.update([('a', 1), ('y', 2)], z=3)
+        self.evalPy(f)
+
+    def testUpdate3(self):
+        other = self.ctx.evaluateScript('({a: 5, y: 6})')
+        def f(o): o.update(other)
+        self.evalPy(f)
+
+    def testClear1(self):
+        def f(o): o.clear()
+        self.evalPy(f)
+        self.assertEqualFunc(lambda o: bool(o), False)
+
+    def testBool1(self):
+        self.assertEqualFunc(lambda o: bool(o), True)
+
+    def testGetMany1(self):
+        self.assertEqual(self.obj.getMany(['a', 'x', 'c', '2'], 0),
+                         [11, 0, None, 55])
+
+    def testSetMany1(self):
+        self.obj.setMany({'a': 1, 'd': 4})
+        self.obj.setMany([('e', 5)])
+        self.objPython.update({'a': 1, 'd': 4, 'e': 5})
+
 
 class AsSeqTestCase(TestCaseWithContext):
     """Basic test of the asSeq operation."""
@@ -662,6 +944,28 @@ class ArrayTestCase(TestCaseWithContext):
         self.assertEqual(next2(), 5)
         self.assertRaises(StopIteration, next2)
 
+    def testToList1(self):
+        self.assertEqual(self.obj.tolist(), [1, 2, 3, 4, 5])
+
+    def testToList2(self):
+        obj = asSeq(self.ctx.evaluateScript("""[]"""))
+        self.assertEqual(obj.tolist(), [])
+
+    def testIterSnapshot1(self):
+        self.assertEqual(list(self.obj.iterSnapshot()), [1, 2, 3, 4, 5])
+        self.assertEqual(list(self.obj.iterSnapshot(2)), [1, 2, 3, 4, 5])
+        self.assertEqual(list(self.obj.iterSnapshot(1)), [1, 2, 3, 4, 5])
+
+    def testIterSnapshot2(self):
+        itr = self.obj.iterSnapshot(2)
+        self.assertEqual(itr.next(), 1)
+        self.obj.append(6)
+        self.assertEqual(list(itr), [2, 3, 4, 5])
+
+    def testIterSnapshot3(self):
+        def code(): self.obj.iterSnapshot(0)
+        self.assertRaises(ValueError, code)
+
     def testContains1(self):
         self.assertTrue(1 in self.obj)
         self.assertTrue(3 in self.obj)
@@ -728,6 +1032,16 @@ class ArrayTestCase(TestCaseWithContext):
         self.assertEqual(list(self.obj), [1, 2, 3, 4, 5, 10])
 
 
+class ArrayLikeTestCase(ArrayTestCase):
+    """Work with JavaScript array-like objects that are not arrays."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        self.obj = asSeq(self.ctx.evaluateScript("""
+          ({0: 1, 1: 2, 2: 3, 3: 4, 4: 5, length: 5})
+          """))
+
+
 class MutableSequenceTest(TestCaseWithContext):
     """Test mutable sequence behavior on wrapped JavaScript arrays."""
 
@@ -756,3 +1070,150 @@ class MutableSequenceTest(TestCaseWithContext):
     def testCount(self):
         self.assertEqual(self.obj.count(3), 1)
         self.assertEqual(self.obj.count(7), 0)
+
+    def testIndex(self):
+        self.assertEqual(self.obj.index(1), 0)
+        self.assertEqual(self.obj.index(5), 4)
+        self.assertEqual(self.obj.index(3, 1, 4), 2)
+        self.assertEqual(self.obj.index(4, -2), 3)
+        self.assertRaises(ValueError, self.obj.index, 7)
+        self.assertRaises(ValueError, self.obj.index, 1, 1)
+        self.assertRaises(ValueError, self.obj.index, 5, 0, 4)
+
+    def testCountMany(self):
+        self.obj.extend([3, 3, '3'])
+        self.assertEqual(self.obj.count(3), 3)
+        self.assertEqual(self.obj.count('3'), 1)
+
+    def testReverseEven(self):
+        self.obj.append(6)
+        self.obj.reverse()
+        self.assertEqual(list(self.obj), [6, 5, 4, 3, 2, 1])
+
+    def testSortNumbers(self):
+        self.obj[:] = [3, 10, -1, 2.5, 1]
+        self.obj.sort()
+        self.assertEqual(list(self.obj), [-1, 1, 2.5, 3, 10])
+        self.obj.sort(reverse=True)
+        self.assertEqual(list(self.obj), [10, 3, 2.5, 1, -1])
+
+    def testSortStrings(self):
+        self.obj[:] = ['b', 'c', 'a', 'ab']
+        self.obj.sort()
+        self.assertEqual(list(self.obj), ['a', 'ab', 'b', 'c'])
+
+    def testSortKey(self):
+        self.obj[:] = ['bb', 'c', 'aaa']
+        self.obj.sort(key=len)
+        self.assertEqual(list(self.obj), ['c', 'bb', 'aaa'])
+        self.obj.sort(key=len, reverse=True)
+        self.assertEqual(list(self.obj), ['aaa', 'bb', 'c'])
+
+    def testSortMixed(self):
+        self.obj[:] = [3, 'a', 1]
+        self.obj.sort()
+        self.assertEqual(list(self.obj), sorted([3, 'a', 1]))
+
+    def testPythonObjects(self):
+        class A(object):
+            def __init__(self, v): self.v = v
+            def __eq__(self, other): return self.v == other.v
+        a1 = A(1)
+        self.obj.append(a1)
+        self.assertTrue(A(1) in self.obj)
+        self.assertFalse(A(2) in self.obj)
+        self.assertEqual(self.obj.index(A(1)), 5)
+        self.assertEqual(self.obj.count(A(1)), 1)
+
+    def testWrappedNumbers(self):
+        # Longs are wrapped, and compared according to Python rules.
+        self.obj.append(5L)
+        self.assertTrue(5 in self.obj)
+        self.assertEqual(self.obj.count(5), 2)
+        self.obj[0] = 7L
+        self.assertEqual(self.obj.index(7), 0)
+
+    def testHoles(self):
+        obj = asSeq(self.ctx.evaluateScript('[, 1]'))
+        self.assertTrue(None in obj)
+        self.assertEqual(obj.index(None), 0)
+        self.assertEqual(obj.count(None), 1)
+
+    def testPop(self):
+        self.assertEqual(self.obj.pop(), 5)
+        self.assertEqual(self.obj.pop(0), 1)
+        self.assertEqual(self.obj.pop(-2), 3)
+        self.assertEqual(list(self.obj), [2, 4])
+        self.assertRaises(IndexError, self.obj.pop, 2)
+
+    def testPopEmpty(self):
+        obj = asSeq(self.ctx.evaluateScript('[]'))
+        self.assertRaises(IndexError, obj.pop)
+
+    def testExtendSelf(self):
+        self.obj.extend(self.obj)
+        self.assertEqual(list(self.obj), [1, 2, 3, 4, 5, 1, 2, 3, 4, 5])
+
+    def testLarge(self):
+        obj = asSeq(self.ctx.evaluateScript('[]'))
+        obj.extend(xrange(10000))
+        self.assertEqual(len(obj), 10000)
+        del obj[:5000]
+        self.assertEqual(obj[0], 5000)
+        obj[0:0] = range(6000)
+        self.assertEqual(len(obj), 11000)
+        self.assertEqual(obj[5999:6001], [5999, 5000])
+
+
+class ArrayLikeMutableSequenceTest(MutableSequenceTest):
+    """Test mutable sequence behavior on array-like objects that are
+    not JavaScript arrays."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        self.obj = asSeq(self.ctx.evaluateScript("""
+          ({0: 1, 1: 2, 2: 3, 3: 4, 4: 5, length: 5})
+          """))
+
+
+class NameCacheTestCase(TestCaseWithContext):
+    """Test the property name intern table."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        self.obj = self.ctx.evaluateScript("""({a: 1, b: 'x'})""")
+        jscore.nameCacheStats(reset=True)
+
+    def tearDown(self):
+        jscore.setNameCacheSize(1024)
+        TestCaseWithContext.tearDown(self)
+
+    def testToJSHit(self):
+        self.obj.a
+        self.obj.a
+        stats = jscore.nameCacheStats()
+        self.assertTrue(stats['toJSHits'] >= 1)
+
+    def testFromJSHit(self):
+        class A(object):
+            pass
+        a = A()
+        a.xyz = 5
+        self.ctx.globalObject.a = a
+        self.assertEqualJS('a.xyz + a.xyz', 10)
+        self.assertTrue(jscore.nameCacheStats()['fromJSHits'] >= 1)
+
+    def testEviction(self):
+        jscore.setNameCacheSize(1)
+        self.assertEqual(self.obj.a, 1)
+        self.assertEqual(self.obj.b, 'x')
+        self.assertEqual(self.obj['a'], 1)
+        stats = jscore.nameCacheStats()
+        self.assertEqual(stats['count'], 1)
+        self.assertTrue(stats['evictions'] >= 1)
+
+    def testDisabled(self):
+        jscore.setNameCacheSize(0)
+        self.assertEqual(self.obj.a, 1)
+        self.assertEqual(self.obj['b'], 'x')
+        self.assertEqual(jscore.nameCacheStats()['count'], 0)
@@ -316,6 +316,134 @@ class ListAccessTestCase(TestCaseWithContext):
         self.evalJS('delete obj[8]')
 
 
+class CopyByValueTestCase(TestCaseWithContext):
+    """Pass Python containers to JavaScript by value."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        self.data = {'a': [1, 2, (3, 4)], 'b': {'c': 'x'}}
+
+    def testToJS1(self):
+        self.ctx.globalObject.data = jscore.toJS(self.data)
+        self.assertTrueJS('data.a instanceof Array')
+        self.assertTrueJS('data.a[2] instanceof Array')
+        self.assertEqualJS('data.a.length', 3)
+        self.assertEqualJS('data.a[2][1]', 4)
+        self.assertEqualJS('data.b.c', 'x')
+        self.assertTrueJS('data.b.constructor === Object')
+
+    def testToJS2(self):
+        self.ctx.globalObject.data = jscore.toJS(self.data)
+        self.ctx.evaluateScript('data.a.push(5)')
+        self.assertEqual(self.data['a'], [1, 2, (3, 4)])
+
+    def testNoCopy(self):
+        self.ctx.globalObject.data = jscore.toJS(self.data, copy=False)
+        self.assertTrue(self.ctx.globalObject.data is self.data)
+
+    def testMaxDepth(self):
+        self.ctx.globalObject.data = jscore.toJS(self.data, maxDepth=1)
+        self.assertTrueJS('!(data.a instanceof Array)')
+        self.assertTrue(self.ctx.evaluateScript('data.a') is self.data['a'])
+
+    def testCycle(self):
+        l = [1]
+        l.append(l)
+        def code(): self.ctx.globalObject.data = jscore.toJS(l)
+        self.assertRaises(ValueError, code)
+
+    def testArgument(self):
+        f = self.ctx.evaluateScript(
+            '(function (l) {return Array.isArray(l) && l.length})')
+        self.assertEqual(f(jscore.toJS([1, 2, 3])), 3)
+
+    def testContextPolicy(self):
+        self.assertFalse(self.ctx.copyContainers)
+        self.ctx.copyContainers = True
+        self.assertTrue(self.ctx.copyContainers)
+        self.ctx.globalObject.data = self.data
+        self.assertTrueJS('data.a instanceof Array')
+        self.ctx.copyContainers = False
+        self.ctx.globalObject.data = self.data
+        self.assertTrueJS('!(data.a instanceof Array)')
+
+
+class TypedArrayTestCase(TestCaseWithContext):
+    """Share memory between Python buffers and JavaScript typed arrays.
+    """
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        try:
+            jscore.asTypedArray(bytearray(1))
+        except NotImplementedError:
+            self.skipTest('typed arrays not supported')
+
+    def testBytearray(self):
+        data = bytearray('abc')
+        self.ctx.globalObject.data = jscore.asTypedArray(data)
+        self.assertTrueJS('data instanceof Uint8Array')
+        self.assertEqualJS('data[1]', ord('b'))
+        self.ctx.evaluateScript('data[0] = 65')
+        self.assertEqual(data, bytearray('Abc'))
+
+    def testArray(self):
+        import array
+        data = array.array('d', [1.5, 2.5])
+        self.ctx.globalObject.data = jscore.asTypedArray(data)
+        self.assertTrueJS('data instanceof Float64Array')
+        self.ctx.evaluateScript('data[1] *= 2')
+        self.assertEqual(data[1], 5.0)
+
+    def testIntArray(self):
+        import array
+        data = array.array('h', [1, -2])
+        self.ctx.globalObject.data = jscore.asTypedArray(data)
+        self.assertTrueJS('data instanceof Int16Array')
+        self.assertEqualJS('data[1]', -2)
+        del data
+        self.ctx.evaluateScript('data[0] = 3')
+
+    def testExplicitType(self):
+        data = bytearray(8)
+        self.ctx.globalObject.data = jscore.asTypedArray(data, 'Int32Array')
+        self.assertEqualJS('data.length', 2)
+        self.ctx.globalObject.data = jscore.asTypedArray(data, 'ArrayBuffer')
+        self.assertEqualJS('data.byteLength', 8)
+
+    def testReadOnly(self):
+        data = 'abc'
+        self.ctx.globalObject.data = jscore.asTypedArray(data)
+        self.ctx.evaluateScript('data[0] = 65')
+        self.assertEqualJS('data[0]', 65)
+        self.assertEqual(data, 'abc')
+
+    def testBadType(self):
+        self.assertRaises(ValueError, jscore.asTypedArray, bytearray(3),
+                          'Int16Array')
+        self.assertRaises(ValueError, jscore.asTypedArray, bytearray(3),
+                          'Foo')
+
+    def testMemoryView(self):
+        arr = self.ctx.evaluateScript('arr = new Int16Array([1, 2, 3]); arr')
+        view = memoryview(arr)
+        self.assertEqual(view.format, 'h')
+        self.assertEqual(view.itemsize, 2)
+        self.assertEqual(len(view), 3)
+        self.assertEqual(view.tolist(), [1, 2, 3])
+        view[0] = 10
+        self.assertEqualJS('arr[0]', 10)
+
+    def testMemoryViewOffset(self):
+        arr = self.ctx.evaluateScript(
+            'new Uint8Array(new Uint8Array([1, 2, 3, 4]).buffer, 2)')
+        self.assertEqual(memoryview(arr).tolist(), [3, 4])
+
+    def testMemoryViewError(self):
+        obj = self.ctx.evaluateScript('({})')
+        self.assertRaises(TypeError, memoryview, obj)
+
+
 class FunctionCallTestCase(TestCaseWithContext):
     """Call Python functions from JavaScript."""
 
@@ -361,3 +489,141 @@ class FunctionCallTestCase(TestCaseWithContext):
             self.fail("No exception raised")
         except jscore.JSException as e:
             self.assertEqual(str(e), '-*Message*-')
+
+
+class ExportFunctionTestCase(TestCaseWithContext):
+    """Call Python functions exported as native JavaScript functions."""
+
+    def testCalculate(self):
+        def f(x, y): return x + y
+        self.ctx.exportFunction('f', f)
+        self.assertEqualJS('f(7, 9)', 16)
+        self.assertEqualJS("f('a', 'b')", 'ab')
+
+    def testNative(self):
+        self.ctx.exportFunction('f', lambda *args: len(args))
+        self.assertTrueJS('f instanceof Function')
+        self.assertEqualJS('f.call(null, 1, 2)', 2)
+        self.assertEqualJS('f.apply(null, [1, 2, 3])', 3)
+        self.assertEqualJS('Object.keys(f).length', 0)
+
+    def testReturn(self):
+        def f(): return 5
+        g = self.ctx.exportFunction(None, f)
+        self.assertEqual(g(), 5)
+        self.assertEqualJS('typeof f', 'undefined')
+
+    def testConverters(self):
+        def f(*args): return repr(args)
+        self.ctx.exportFunction('f', f, ['number', 'string', 'boolean',
+                                         int, None])
+        self.assertEqualJS("f('3', 4, 1, 5.5, 'x', 'y')",
+                           repr((3.0, u'4', True, 5, u'x', u'y')))
+
+    def testConverterErrors(self):
+        def f(x): return x
+        self.assertRaises(ValueError, self.ctx.exportFunction, 'f', f,
+                          ['complex'])
+        self.assertRaises(ValueError, self.ctx.exportFunction, 'f', f, [1])
+        self.assertRaises(TypeError, self.ctx.exportFunction, 'f', 1)
+        self.ctx.exportFunction('f', f, ['object'])
+        self.assertRaisesJS('f(1)')
+
+    def testException(self):
+        def f(): raise Exception('-*Message*-')
+        self.ctx.exportFunction('f', f)
+        msg = self.ctx.evaluateScript("""
+            try {
+                f();
+                msg = '';
+            } catch (e) {
+                msg = e.message;
+            }
+            msg;
+            """)
+        self.assertEqual(msg, '-*Message*-')
+
+    def testCollect(self):
+        before = self.ctx.heapStats()['exportedFunctions']
+        for i in xrange(100):
+            self.ctx.exportFunction('f', lambda x, i=i: x + i)
+        self.assertEqualJS('f(1)', 100)
+        self.ctx.collectGarbage()
+        self.assertTrue(
+            self.ctx.heapStats()['exportedFunctions'] < before + 100)
+        self.assertEqualJS('f(1)', 100)
+
+
+class Point(object):
+    def __init__(self, x, y):
+        self.x = x
+        self.y = y
+
+    def norm2(self):
+        return self.x * self.x + self.y * self.y
+
+    def moved(self, dx, dy):
+        return Point(self.x + dx, self.y + dy)
+
+    def fail(self):
+        raise ValueError('-*Message*-')
+
+
+class ExportClassTestCase(TestCaseWithContext):
+    """Access instances of Python classes exported to JavaScript."""
+
+    def setUp(self):
+        TestCaseWithContext.setUp(self)
+        jscore.exportClass(Point, attrs=['x', 'y'],
+                           methods=['norm2', 'moved', 'fail'])
+        self.p = Point(3, 4)
+        self.ctx.globalObject.p = self.p
+
+    def tearDown(self):
+        jscore.exportClass(Point, None)
+        del self.p
+        TestCaseWithContext.tearDown(self)
+
+    def testWrapUnwrap(self):
+        self.assertTrue(self.ctx.evaluateScript('p') is self.p)
+        self.assertEqualJS('String(p)', '[object Point]')
+
+    def testAttributes(self):
+        self.assertEqualJS('p.x + p.y', 7)
+        self.ctx.evaluateScript('p.x = 6')
+        self.assertEqual(self.p.x, 6)
+        self.assertEqualJS('delete p.x', False)
+        self.assertEqual(self.p.x, 6)
+
+    def testMethods(self):
+        self.assertEqualJS('p.norm2()', 25)
+        self.assertEqualJS('p.moved(1, 1).norm2()', 41)
+        self.assertTrueJS('p.moved(0, 0) !== p')
+        self.assertEqualJS('Object.keys(p).sort().join()', 'x,y')
+
+    def testUnexported(self):
+        self.p.z = 5
+        self.assertEqualJS('typeof p.z', 'undefined')
+        self.ctx.evaluateScript('p.z = 1')
+        self.assertEqual(self.p.z, 5)
+
+    def testException(self):
+        self.assertRaisesJS('p.fail()')
+        self.assertRaisesJS('p.norm2.call({})')
+        # Wrapped Python objects of other classes are rejected too,
+        # even if they have a method with the same name.
+        class Other(object):
+            def norm2(self):
+                return 1
+        self.ctx.globalObject.q = Other()
+        self.assertRaisesJS('p.norm2.call(q)')
+
+    def testSubclass(self):
+        class Point3(Point):
+            pass
+        self.ctx.globalObject.q = Point3(1, 2)
+        self.assertEqualJS('q.x', 1)
+        self.assertEqualJS('String(q)', '[object PythonObject]')
+
+    def testBadClass(self):
+        self.assertRaises(TypeError, jscore.exportClass, 1)
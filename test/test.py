@@ -30,11 +30,13 @@ import javascriptcore as jscore
 
 import jsfrompy
 import pyfromjs
+import contexts
 
 
 _moduleSuites = [
     unittest.defaultTestLoader.loadTestsFromModule(jsfrompy),
     unittest.defaultTestLoader.loadTestsFromModule(pyfromjs),
+    unittest.defaultTestLoader.loadTestsFromModule(contexts),
     ]
 
 mainSuite = unittest.TestSuite(_moduleSuites)